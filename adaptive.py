@@ -0,0 +1,157 @@
+import numpy as np
+
+# Samples per weight update: the Python loop runs once per block
+BLOCK = 32
+
+# NLMS step size (stable for 0 < mu < 2) and regularizer of its normalization
+NLMS_MU = 0.5
+NLMS_EPS = 1e-8
+
+# RLS initialization P = I / RLS_DELTA (small delta: fast initial convergence)
+RLS_DELTA = 1e-2
+
+
+def _regressors(history, x_block, M):
+    """
+    (ext, X) for one block, where ext is the history followed by the block
+    and X[j, k] = x[n_j - k] is the (L, M) regressor matrix (a strided view).
+    """
+    ext = np.concatenate((history, x_block))
+    X = np.lib.stride_tricks.sliding_window_view(ext, M)[:, ::-1]
+    return ext, X
+
+
+class BlockNLMS:
+    """
+    Normalized LMS, vectorized per block: the a priori outputs of a block
+    come from one matrix-vector product with the block-start weights, then
+    the weights take the averaged per-sample NLMS step
+        h += mu/L * sum_j e[j] * x_j / (eps + ||x_j||^2).
+    O(M) per sample; block = 1 is exact sample-by-sample NLMS.
+    """
+
+    def __init__(self, M, mu=NLMS_MU, eps=NLMS_EPS):
+        if not 0.0 < mu < 2.0:
+            raise ValueError(f"NLMS step size must be in (0, 2), got {mu}")
+        self.M = M
+        self.mu = mu
+        self.eps = eps
+        self.h = np.zeros(M)
+        self.history = np.zeros(M - 1)
+        self.samples = 0
+        self.squared_error = 0.0
+
+    @property
+    def mmse(self):
+        """Mean squared a priori error of all samples so far."""
+        return self.squared_error / self.samples if self.samples else 0.0
+
+    def update(self, x_block, d_block):
+        """Consumes one block, returns its a priori output y."""
+        if x_block.shape != d_block.shape:
+            raise ValueError("input and desired blocks differ in length")
+        L = x_block.shape[0]
+        ext, X = _regressors(self.history, x_block, self.M)
+
+        y = X @ self.h
+        e = d_block - y
+        power = np.einsum('jk,jk->j', X, X)
+        self.h += (self.mu / L) * (X.T @ (e / (self.eps + power)))
+
+        self.history = ext[ext.shape[0] - (self.M - 1):].copy()
+        self.samples += L
+        self.squared_error += float(np.dot(e, e))
+        return y
+
+
+class BlockRLS:
+    """
+    Exponentially weighted recursive least squares, updated once per block
+    with the matrix inversion lemma. With Lambda = diag(lambda^(L-1-j)) the
+    block adds X^T Lambda X to lambda^L * R, so
+        g = P X^T,  S = X g + lambda^L Lambda^-1,  K = g S^-1
+        h += K (d - X h),  P = (P - K g^T) / lambda^L
+    and after every block h is the exact weighted least-squares solution.
+    O(M^2 + L*M + L^2) per sample; block = 1 is exact sample-by-sample RLS.
+    """
+
+    def __init__(self, M, forgetting=1.0, delta=RLS_DELTA):
+        if not 0.0 < forgetting <= 1.0:
+            raise ValueError(f"forgetting factor must be in (0, 1], got {forgetting}")
+        self.M = M
+        self.forgetting = forgetting
+        self.h = np.zeros(M)
+        self.P = np.eye(M) / delta
+        self.history = np.zeros(M - 1)
+        self.samples = 0
+        self.squared_error = 0.0
+
+    @property
+    def mmse(self):
+        """Mean squared a priori error of all samples so far."""
+        return self.squared_error / self.samples if self.samples else 0.0
+
+    def update(self, x_block, d_block):
+        """Consumes one block, returns its a priori output y."""
+        if x_block.shape != d_block.shape:
+            raise ValueError("input and desired blocks differ in length")
+        L = x_block.shape[0]
+        ext, X = _regressors(self.history, x_block, self.M)
+
+        y = X @ self.h
+        e = d_block - y
+
+        decay = self.forgetting ** L
+        g = self.P @ X.T
+        S = X @ g
+        S[np.diag_indices(L)] += decay * self.forgetting ** -np.arange(L - 1, -1, -1.0)
+        K = np.linalg.solve(S, g.T).T
+        self.h += K @ e
+        self.P = (self.P - K @ g.T) / decay
+        # Keep P symmetric against round-off drift
+        self.P = 0.5 * (self.P + self.P.T)
+
+        self.history = ext[ext.shape[0] - (self.M - 1):].copy()
+        self.samples += L
+        self.squared_error += float(np.dot(e, e))
+        return y
+
+
+ALGORITHMS = {'nlms': BlockNLMS, 'rls': BlockRLS}
+
+
+def adaptive_filter(input_signal, desired_signal, M, algorithm='nlms', block=BLOCK, **params):
+    """
+    Runs a block-adaptive filter ('nlms' or 'rls', params go to its
+    constructor) over a whole signal pair.
+    Returns (output signal, a priori error per sample, filter): the
+    errors are the learning curve (see learning_curve) and filter.h
+    holds the final weights.
+    """
+    if input_signal.shape != desired_signal.shape:
+        raise ValueError("size not match")
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown adaptive algorithm: {algorithm}")
+    filt = ALGORITHMS[algorithm](M, **params)
+
+    N = input_signal.shape[0]
+    output_signal = np.empty(N)
+    for start in range(0, N, block):
+        stop = min(start + block, N)
+        output_signal[start:stop] = filt.update(np.asarray(input_signal[start:stop], dtype=float),
+                                                np.asarray(desired_signal[start:stop], dtype=float))
+    return output_signal, desired_signal - output_signal, filt
+
+
+def learning_curve(errors, window=1):
+    """
+    Squared a priori error per sample, smoothed with a trailing moving
+    average over `window` samples (shorter at the start).
+    """
+    squared = np.asarray(errors, dtype=float) ** 2
+    if window <= 1:
+        return squared
+    csum = np.concatenate(([0.0], np.cumsum(squared)))
+    n = np.arange(1, squared.shape[0] + 1)
+    lo = np.maximum(n - window, 0)
+    return (csum[n] - csum[lo]) / (n - lo)
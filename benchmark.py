@@ -0,0 +1,287 @@
+import numpy as np
+import os
+import sys
+import csv
+import json
+import time
+import platform
+import argparse
+import tempfile
+
+from signal_io import load_signal
+from wiener import (autocorrelation, cross_correlation, fir_filter, levinson_durbin,
+                    toeplitz_matrix)
+
+# Pipeline stages, in order, timed separately for every engine
+STAGES = ["load", "autocorrelation", "cross_correlation", "build_R_M", "solve",
+          "convolution", "mmse"]
+
+# Grids: the quick one runs in seconds, --full covers production sizes
+QUICK_N = [10, 1000, 100000]
+QUICK_M = [1, 10, 64, 256]
+FULL_N = [10, 100, 1000, 10000, 100000, 1000000, 10000000]
+FULL_M = [1, 4, 16, 64, 256, 1024, 4096]
+
+# Skip engine/size combinations whose estimated cost exceeds this many ops
+MAX_OPS = 5e10
+
+# Timings below this are treated as noise when comparing against a baseline
+NOISE_FLOOR = 1e-4
+
+
+def make_signals(N, seed=0):
+    """Seeded AR(1) desired signal and a noisy input copy."""
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal(N)
+    # AR(1) with phi=0.9 as its (truncated) impulse response, filtered
+    # through fir_filter so generation stays fast for large N
+    desired = fir_filter(noise, 0.9 ** np.arange(min(N, 256)))
+    input_signal = desired + 0.5 * rng.standard_normal(N)
+    return input_signal, desired
+
+
+# --- Engines ---
+# Every stage takes the shared context dict and stores its result in it.
+
+def _ref_load(ctx):
+    ctx['x'] = np.loadtxt(ctx['x_txt'])
+    ctx['d'] = np.loadtxt(ctx['d_txt'])
+
+def _ref_autocorrelation(ctx):
+    ctx['rxx_full'] = np.correlate(ctx['x'], ctx['x'], mode='full')
+
+def _ref_cross_correlation(ctx):
+    N = ctx['x'].shape[0]
+    rdx_full = np.correlate(ctx['d'], ctx['x'], mode='full')
+    ctx['gamma_d'] = rdx_full[N - 1 : N - 1 + ctx['M']]
+
+def _ref_build_R_M(ctx):
+    M = ctx['M']
+    N = ctx['x'].shape[0]
+    rxx_full = ctx['rxx_full']
+    R_M = np.zeros((M, M))
+    for l in range(M):
+        for k in range(M):
+            R_M[l, k] = rxx_full[N - 1 + l - k]
+    ctx['R_M'] = R_M
+
+def _ref_solve(ctx):
+    ctx['h'] = np.linalg.solve(ctx['R_M'], ctx['gamma_d'])
+
+def _ref_convolution(ctx):
+    N = ctx['x'].shape[0]
+    ctx['y'] = np.convolve(ctx['x'], ctx['h'], mode='full')[:N]
+
+def _mmse(ctx):
+    ctx['mmse'] = np.mean((ctx['d'] - ctx['y']) ** 2)
+
+
+def _npy_load(ctx):
+    # Materialize the memory map so later stages do not pay for page faults
+    ctx['x'] = np.array(load_signal(ctx['x_npy']))
+    ctx['d'] = np.array(load_signal(ctx['d_npy']))
+
+def _lev_autocorrelation(ctx):
+    ctx['rxx'] = autocorrelation(ctx['x'], ctx['M'])
+
+def _lev_cross_correlation(ctx):
+    ctx['gamma_d'] = cross_correlation(ctx['d'], ctx['x'], ctx['M'])
+
+def _dense_build_R_M(ctx):
+    ctx['R_M'] = toeplitz_matrix(ctx['rxx'])
+
+def _lev_solve(ctx):
+    ctx['h'] = levinson_durbin(ctx['rxx'], ctx['gamma_d'])
+
+def _lev_convolution(ctx):
+    ctx['y'] = fir_filter(ctx['x'], ctx['h'])
+
+
+# Stage functions per engine; None marks a stage the engine does not have
+ENGINES = {
+    # The original test.py pipeline: text load, full correlations,
+    # Python-loop R_M and a dense O(M^3) solve
+    'reference': {
+        'load': _ref_load, 'autocorrelation': _ref_autocorrelation,
+        'cross_correlation': _ref_cross_correlation, 'build_R_M': _ref_build_R_M,
+        'solve': _ref_solve, 'convolution': _ref_convolution, 'mmse': _mmse,
+    },
+    # wiener.py lags and filtering with a vectorized R_M and dense solve
+    'dense': {
+        'load': _npy_load, 'autocorrelation': _lev_autocorrelation,
+        'cross_correlation': _lev_cross_correlation, 'build_R_M': _dense_build_R_M,
+        'solve': _ref_solve, 'convolution': _lev_convolution, 'mmse': _mmse,
+    },
+    # wiener.py end to end: .npy load, O(M^2) Levinson, never builds R_M
+    'levinson': {
+        'load': _npy_load, 'autocorrelation': _lev_autocorrelation,
+        'cross_correlation': _lev_cross_correlation, 'build_R_M': None,
+        'solve': _lev_solve, 'convolution': _lev_convolution, 'mmse': _mmse,
+    },
+}
+
+
+def estimated_ops(engine, N, M):
+    """Rough operation count used to skip hopeless grid points."""
+    if engine == 'reference':
+        # Full correlations are O(N^2), the dense solve O(M^3)
+        return 2.0 * N * N + M ** 3 + 50.0 * M * M
+    if engine == 'dense':
+        return N * np.log2(max(N, 2)) * 20 + M ** 3
+    return N * np.log2(max(N, 2)) * 20 + M * M
+
+
+def time_stage(func, ctx, min_time=0.05, max_repeat=20):
+    """Best-of timing of one stage; repeats short stages until min_time."""
+    best = None
+    total = 0.0
+    for _ in range(max_repeat):
+        start = time.perf_counter()
+        func(ctx)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        total += elapsed
+        if total >= min_time:
+            break
+    return best
+
+
+def run_benchmark(N_values, M_values, engines, workdir, min_time=0.05, max_ops=MAX_OPS, log=print):
+    """
+    Times every stage of every engine over the N x M grid.
+    Returns a list of records {engine, N, M, stage, seconds}.
+    """
+    records = []
+    for N in N_values:
+        x, d = make_signals(N)
+        paths = {
+            'x_txt': os.path.join(workdir, f"input_{N}.txt"),
+            'd_txt': os.path.join(workdir, f"desired_{N}.txt"),
+            'x_npy': os.path.join(workdir, f"input_{N}.npy"),
+            'd_npy': os.path.join(workdir, f"desired_{N}.npy"),
+        }
+        np.savetxt(paths['x_txt'], x[None], fmt="%.6f")
+        np.savetxt(paths['d_txt'], d[None], fmt="%.6f")
+        np.save(paths['x_npy'], x)
+        np.save(paths['d_npy'], d)
+
+        for M in M_values:
+            if M > N:
+                continue
+            for engine in engines:
+                if estimated_ops(engine, N, M) > max_ops:
+                    log(f" skip {engine:<10} N={N:<9} M={M:<5} (too slow)")
+                    continue
+                ctx = dict(paths, M=M)
+                stage_times = []
+                for stage in STAGES:
+                    func = ENGINES[engine][stage]
+                    if func is None:
+                        continue
+                    seconds = time_stage(func, ctx, min_time)
+                    records.append({'engine': engine, 'N': N, 'M': M, 'stage': stage,
+                                    'seconds': seconds})
+                    stage_times.append(seconds)
+                log(f" {engine:<10} N={N:<9} M={M:<5} total={sum(stage_times)*1000:10.3f} ms")
+
+        for path in paths.values():
+            os.remove(path)
+    return records
+
+
+def write_results(records, json_path=None, csv_path=None):
+    """Writes the records as JSON (with run metadata) and/or CSV."""
+    if json_path:
+        meta = {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with open(json_path, 'w') as f:
+            json.dump({'meta': meta, 'results': records}, f, indent=1)
+        print(f"Results saved to: {json_path}")
+    if csv_path:
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['engine', 'N', 'M', 'stage', 'seconds'])
+            writer.writeheader()
+            writer.writerows(records)
+        print(f"Results saved to: {csv_path}")
+
+
+def compare(records, baseline_path, tolerance=1.25):
+    """
+    Compares records with a stored baseline JSON and prints every stage
+    that got slower than tolerance x its baseline time.
+    Returns the list of regressions.
+    """
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)['results']
+    old = {(r['engine'], r['N'], r['M'], r['stage']): r['seconds'] for r in baseline}
+
+    regressions = []
+    for r in records:
+        key = (r['engine'], r['N'], r['M'], r['stage'])
+        if key not in old:
+            continue
+        before = old[key]
+        if r['seconds'] > NOISE_FLOOR and r['seconds'] > tolerance * max(before, NOISE_FLOOR):
+            regressions.append((key, before, r['seconds']))
+
+    print(f"\n Compared {len(records)} timings against {baseline_path} (tolerance {tolerance:.2f}x)")
+    for (engine, N, M, stage), before, after in regressions:
+        print(f" [REGRESSION] {engine} N={N} M={M} {stage}: "
+              f"{before*1000:.3f} ms -> {after*1000:.3f} ms ({after/before:.2f}x)")
+    if not regressions:
+        print(" No regressions.")
+    return regressions
+
+
+def print_stage_table(records):
+    """Prints, per engine, the total time of each stage over the grid."""
+    engines = sorted({r['engine'] for r in records})
+    print(f"\n{'Stage':<18}" + "".join(f"{e:>14}" for e in engines))
+    for stage in STAGES:
+        row = f"{stage:<18}"
+        for engine in engines:
+            t = sum(r['seconds'] for r in records if r['engine'] == engine and r['stage'] == stage)
+            has = any(r['engine'] == engine and r['stage'] == stage for r in records)
+            row += f"{t*1000:>11.2f} ms" if has else f"{'n/a':>14}"
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Wiener pipeline stages across N and M.")
+    parser.add_argument("--full", action="store_true",
+                        help="Full grid (N up to 1e7, M up to 4096) instead of the quick one")
+    parser.add_argument("-N", type=int, nargs='+', help="Signal lengths to benchmark")
+    parser.add_argument("-M", type=int, nargs='+', help="Filter lengths to benchmark")
+    parser.add_argument("--engines", nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES),
+                        help="Engines to compare (default: all)")
+    parser.add_argument("--json", default="benchmark_results.json", help="JSON output file")
+    parser.add_argument("--csv", help="Optional CSV output file")
+    parser.add_argument("--baseline", help="Baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="Slowdown factor over the baseline counted as a regression")
+    parser.add_argument("--max-ops", type=float, default=MAX_OPS,
+                        help="Skip grid points estimated above this many operations")
+    args = parser.parse_args()
+
+    N_values = args.N or (FULL_N if args.full else QUICK_N)
+    M_values = args.M or (FULL_M if args.full else QUICK_M)
+
+    print(f"Benchmarking engines {', '.join(args.engines)} over N={N_values}, M={M_values}")
+    with tempfile.TemporaryDirectory() as workdir:
+        records = run_benchmark(N_values, M_values, args.engines, workdir, max_ops=args.max_ops)
+
+    print_stage_table(records)
+    write_results(records, args.json, args.csv)
+
+    if args.baseline:
+        if compare(records, args.baseline, args.tolerance):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+import numpy as np
+import os
+import sys
+import glob
+import json
+import struct
+import fnmatch
+import hashlib
+import argparse
+from functools import lru_cache
+
+from signal_io import (SIGNAL_NAMES, expected_path, load_expected, load_signal, parse_expected_text,
+                       signal_path)
+
+# Pack layout (little endian):
+#   header  magic (8) | version u32 | reserved u32 | index offset u64 | index length u64
+#   payload every array at an ALIGN-byte boundary from HEADER_SIZE on
+#   index   UTF-8 JSON list of cases, after the payload:
+#           {"name", "digest", "arrays": {"input"|"desired"|"expected":
+#            [offset, length, dtype]}, "mmse", "expected_text"}
+# The index sits at the end so a pack is written in one streaming pass;
+# the fixed header tells readers where it is.
+PACK_MAGIC = b'WIENPACK'
+PACK_VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")
+HEADER_SIZE = 64
+ALIGN = 64
+
+# Extension of pack files (the format is detected from the magic)
+PACK_EXT = ".wpk"
+
+# Text expected files up to this size are stored verbatim, so a packed case
+# verifies exactly like its folder; larger ones are stored as arrays
+EXPECTED_TEXT_LIMIT = 64 * 1024
+
+
+def is_pack(path):
+    """True if path is a corpus pack file."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(PACK_MAGIC)) == PACK_MAGIC
+    except OSError:
+        return False
+
+
+class PackedCase:
+    """
+    One case of a pack. Signals are read-only views into the pack's memory
+    map, so nothing is copied until they are used.
+    """
+
+    def __init__(self, pack, entry):
+        self.pack = pack
+        self.name = entry['name']
+        self.digest = entry['digest']
+        self._entry = entry
+
+    def has(self, name):
+        return name in self._entry['arrays']
+
+    def parts(self):
+        """{array name: (length, dtype)} of the stored arrays."""
+        return {k: (v[1], np.dtype(v[2])) for k, v in self._entry['arrays'].items()}
+
+    def signal(self, name):
+        """The array `name` ('input', 'desired' or 'expected')."""
+        offset, length, dtype = self._entry['arrays'][name]
+        dtype = np.dtype(dtype)
+        return self.pack.data[offset:offset + length * dtype.itemsize].view(dtype)
+
+    def has_expected(self):
+        return self._entry.get('expected_text') is not None or self.has('expected')
+
+    def expected_text(self):
+        """Verbatim expected.txt content, or None if it was stored as arrays."""
+        return self._entry.get('expected_text')
+
+    def expected(self):
+        """Expected results as (output array, mmse) like signal_io.load_expected."""
+        text = self.expected_text()
+        if text is not None:
+            return parse_expected_text(text)
+        if self.has('expected'):
+            return np.array(self.signal('expected')), self._entry['mmse']
+        return np.array([]), None
+
+
+class CorpusPack:
+    """
+    Read access to a pack: random access by name (pack[name]) and in-order
+    iteration over every case, all served from one read-only memory map.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, _, index_offset, index_length = HEADER.unpack(f.read(HEADER.size))
+            if magic != PACK_MAGIC:
+                raise ValueError(f"{path} is not a corpus pack")
+            if version != PACK_VERSION:
+                raise ValueError(f"{path}: unsupported pack version {version}")
+            f.seek(index_offset)
+            entries = json.loads(f.read(index_length).decode('utf-8'))
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        self.names = [e['name'] for e in entries]
+        self._entries = {e['name']: e for e in entries}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __getitem__(self, name):
+        return PackedCase(self, self._entries[name])
+
+    def __iter__(self):
+        for name in self.names:
+            yield self[name]
+
+    def select(self, pattern):
+        """Case names matching a glob pattern (on the name only, e.g. 'test_00*')."""
+        pattern = os.path.basename(os.path.normpath(pattern))
+        return [n for n in self.names if fnmatch.fnmatchcase(n, pattern)]
+
+
+@lru_cache(maxsize=8)
+def open_pack(path):
+    """CorpusPack for path, opened once per process (worker pools reuse it)."""
+    return CorpusPack(os.path.abspath(path))
+
+
+# ---------------------------------------------------------
+# Writing
+# ---------------------------------------------------------
+
+class PackWriter:
+    """
+    Streams cases into a new pack: payloads are appended as they come and
+    the index is written on close(). Use as a context manager.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._tmp = f"{path}.{os.getpid()}.tmp"
+        self._f = open(self._tmp, 'wb')
+        self._f.write(b'\0' * HEADER_SIZE)
+        self._entries = []
+        self._names = set()
+
+    def _append(self, array):
+        pos = self._f.tell()
+        pad = -pos % ALIGN
+        if pad:
+            self._f.write(b'\0' * pad)
+            pos += pad
+        array = np.ascontiguousarray(array)
+        self._f.write(array.tobytes())
+        return [pos, int(array.shape[0]), array.dtype.str]
+
+    def add(self, name, input_signal=None, desired_signal=None, expected_output=None, mmse=None,
+            expected_text=None):
+        """Appends one case; any part may be missing (as in a test folder)."""
+        if name in self._names:
+            raise ValueError(f"duplicate case name: {name}")
+        self._names.add(name)
+        digest = hashlib.sha256()
+        arrays = {}
+        for key, array in (("input", input_signal), ("desired", desired_signal),
+                           ("expected", expected_output)):
+            if array is None:
+                continue
+            array = np.asarray(array)
+            if array.ndim != 1:
+                raise ValueError(f"{name}/{key}: signals must be 1-D")
+            arrays[key] = self._append(array)
+            digest.update(f"{key}:{array.dtype.str}:{array.shape[0]}:".encode())
+            digest.update(np.ascontiguousarray(array).tobytes())
+        if expected_text is not None:
+            digest.update(b"expected_text:" + expected_text.encode('utf-8'))
+        if mmse is not None:
+            digest.update(f"mmse:{mmse!r}".encode())
+        self._entries.append({'name': name, 'digest': digest.hexdigest(), 'arrays': arrays,
+                              'mmse': mmse, 'expected_text': expected_text})
+
+    def close(self):
+        index = json.dumps(self._entries, separators=(',', ':')).encode('utf-8')
+        index_offset = self._f.tell()
+        self._f.write(index)
+        self._f.seek(0)
+        self._f.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, index_offset, len(index)))
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+            os.remove(self._tmp)
+
+
+def read_folder(folder, dtype=None):
+    """
+    The parts of one test folder as PackWriter.add keyword arguments.
+    Small text expected files are kept verbatim, others become arrays.
+    """
+    parts = {}
+    for name in SIGNAL_NAMES:
+        path = signal_path(folder, name)
+        if os.path.exists(path):
+            signal = load_signal(path, mmap=False)
+            parts[name + "_signal"] = signal if dtype is None else signal.astype(dtype)
+
+    path = expected_path(folder)
+    if os.path.exists(path):
+        if path.endswith(".txt") and os.path.getsize(path) <= EXPECTED_TEXT_LIMIT:
+            with open(path, 'r') as f:
+                parts['expected_text'] = f.read()
+        else:
+            output_signal, mmse = load_expected(path)
+            if output_signal.size:
+                parts['expected_output'] = output_signal if dtype is None else output_signal.astype(dtype)
+                parts['mmse'] = mmse
+    return parts
+
+
+def pack_folders(folders, path, dtype=None):
+    """Packs test folders (named by their basename) into one file. Returns the case count."""
+    with PackWriter(path) as writer:
+        for folder in folders:
+            writer.add(os.path.basename(os.path.normpath(folder)), **read_folder(folder, dtype))
+    return len(folders)
+
+
+def unpack(pack, directory, names=None, binary=True):
+    """
+    Writes cases back to test folders under directory: .npy/.npz files, or
+    with binary=False the text layout (verbatim expected.txt when stored).
+    Returns the folders written.
+    """
+    written = []
+    for name in (pack.names if names is None else names):
+        case = pack[name]
+        folder = os.path.join(directory, name)
+        os.makedirs(folder, exist_ok=True)
+        for key in SIGNAL_NAMES:
+            if not case.has(key):
+                continue
+            if binary:
+                np.save(os.path.join(folder, key + ".npy"), case.signal(key))
+            else:
+                # Shortest repr of each float64, which reads back exactly
+                with open(os.path.join(folder, key + ".txt"), 'w') as f:
+                    f.write(" ".join(map(repr, case.signal(key).tolist())))
+        text = case.expected_text()
+        if text is not None:
+            with open(os.path.join(folder, "expected.txt"), 'w') as f:
+                f.write(text)
+        elif case.has('expected'):
+            output_signal, mmse = case.expected()
+            if binary:
+                np.savez(os.path.join(folder, "expected.npz"), output=output_signal, mmse=mmse)
+            else:
+                with open(os.path.join(folder, "expected.txt"), 'w') as f:
+                    f.write("Filtered output: " + " ".join(f"{v:.1f}" for v in output_signal))
+                    f.write(f"\nMMSE: {mmse:.1f}")
+        written.append(folder)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack test folders into one indexed corpus file, or unpack it.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("pack", help="Pack test folders into PACK")
+    p.add_argument("pack", help=f"Output pack file (e.g. tests{PACK_EXT})")
+    p.add_argument("folders", nargs='*', default=[os.path.join("tests", "test_*")],
+                   help="Test folders or folder globs (default: tests/test_*)")
+    p.add_argument("--dtype", choices=["float64", "float32"], default=None,
+                   help="Store signals with this sample type (default: as loaded)")
+
+    u = sub.add_parser("unpack", help="Write the cases of PACK back to test folders")
+    u.add_argument("pack")
+    u.add_argument("directory", help="Directory receiving one folder per case")
+    u.add_argument("--cases", default="*", help="Glob on case names (default: all)")
+    u.add_argument("--text", action="store_true", help="Write .txt files instead of .npy/.npz")
+
+    l = sub.add_parser("list", help="List the cases of PACK")
+    l.add_argument("pack")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        folders = []
+        for pattern in args.folders:
+            folders.extend(f for f in sorted(glob.glob(pattern)) if os.path.isdir(f))
+        if not folders:
+            print("Error: no test folders to pack.")
+            return 1
+        count = pack_folders(folders, args.pack, args.dtype)
+        print(f"Packed {count} cases into {args.pack} ({os.path.getsize(args.pack) / 2**20:.2f} MiB)")
+        return 0
+
+    if not is_pack(args.pack):
+        print(f"Error: '{args.pack}' is not a corpus pack.")
+        return 1
+    pack = CorpusPack(args.pack)
+    if args.command == "unpack":
+        written = unpack(pack, args.directory, pack.select(args.cases), binary=not args.text)
+        print(f"Unpacked {len(written)} cases into {args.directory}")
+    else:
+        for case in pack:
+            parts = ", ".join(f"{k}[{n}] {dtype}" for k, (n, dtype) in case.parts().items())
+            extra = " + expected.txt" if case.expected_text() is not None else ""
+            print(f"{case.name}: {parts}{extra}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
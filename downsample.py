@@ -0,0 +1,214 @@
+import numpy as np
+
+# Samples processed per vectorized step, bounds the temporaries on
+# memory-mapped million-sample signals
+CHUNK = 1 << 20
+
+# Histogram resolution of box_stats on large arrays; quantiles are exact
+# to within (max - min) / STATS_BINS
+STATS_BINS = 1 << 16
+
+# Arrays up to this size get exact box statistics (np.percentile)
+EXACT_STATS_LIMIT = 1 << 16
+
+DOWNSAMPLE_METHODS = ("minmax", "lttb", "none")
+
+
+# ---------------------------------------------------------
+# Trace downsampling
+# ---------------------------------------------------------
+
+def minmax_envelope(y, n_out):
+    """
+    Indices of the min and max of each of n_out // 2 equal buckets, in
+    sample order, so every peak and trough survives at plot resolution.
+    Returns all indices when y already has at most n_out samples.
+    """
+    N = y.shape[0]
+    buckets = max(n_out // 2, 1)
+    if N <= n_out:
+        return np.arange(N)
+    size = -(-N // buckets)
+
+    picks = []
+    rows_per_chunk = max(CHUNK // size, 1)
+    for start in range(0, N, rows_per_chunk * size):
+        stop = min(start + rows_per_chunk * size, N)
+        block = np.asarray(y[start:stop], dtype=float)
+        rows = -(-block.shape[0] // size)
+        # Pad the last bucket with its own last value: min/max unchanged
+        pad = rows * size - block.shape[0]
+        if pad:
+            block = np.concatenate((block, np.full(pad, block[-1])))
+        block = block.reshape(rows, size)
+        lo = block.argmin(axis=1)
+        hi = block.argmax(axis=1)
+        base = start + np.arange(rows) * size
+        pair = np.sort(np.stack((lo, hi), axis=1), axis=1) + base[:, None]
+        picks.append(np.minimum(pair.ravel(), N - 1))
+    # A bucket whose min and max coincide yields the same index twice
+    return np.unique(np.concatenate(picks))
+
+
+def lttb(y, n_out, x=None):
+    """
+    Largest-Triangle-Three-Buckets: keeps the first and last sample and,
+    from each of n_out - 2 buckets, the sample forming the largest
+    triangle with the previous pick and the next bucket's mean. The loop
+    runs once per output point; each bucket is scored vectorized.
+    Returns the indices of the kept samples.
+    """
+    N = y.shape[0]
+    if n_out >= N or n_out < 3:
+        return np.arange(N)
+    xs = np.arange(N, dtype=float) if x is None else np.asarray(x, dtype=float)
+    ys = np.asarray(y, dtype=float)
+
+    # Bucket b covers [edges[b], edges[b + 1]) of the interior samples
+    edges = (1 + np.arange(n_out - 1) * (N - 2) / (n_out - 2)).astype(int)
+    edges[-1] = N - 1
+    csum_x = np.concatenate(([0.0], np.cumsum(xs)))
+    csum_y = np.concatenate(([0.0], np.cumsum(ys)))
+    lo = edges[1:]
+    hi = np.append(edges[2:], N)
+    mean_x = (csum_x[hi] - csum_x[lo]) / (hi - lo)
+    mean_y = (csum_y[hi] - csum_y[lo]) / (hi - lo)
+
+    picks = np.empty(n_out, dtype=np.int64)
+    picks[0] = 0
+    picks[-1] = N - 1
+    a = 0
+    for b in range(n_out - 2):
+        s, e = edges[b], edges[b + 1]
+        area = np.abs((xs[a] - mean_x[b]) * (ys[s:e] - ys[a]) - (xs[a] - xs[s:e]) * (mean_y[b] - ys[a]))
+        a = s + int(area.argmax())
+        picks[b + 1] = a
+    return picks
+
+
+def downsample(y, n_out, method="minmax"):
+    """
+    (x, y) of a trace reduced to about n_out points with 'minmax' or
+    'lttb' ('none' keeps every sample). x holds the original indices.
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    N = y.shape[0]
+    if method == "none" or N <= n_out:
+        return np.arange(N), y
+    idx = minmax_envelope(y, n_out) if method == "minmax" else lttb(y, n_out)
+    return idx, np.asarray(y[idx], dtype=float)
+
+
+def axes_pixel_width(ax, dpi=None):
+    """Width of an axes in output pixels (at dpi, default the figure's)."""
+    fig = ax.get_figure()
+    dpi = fig.dpi if dpi is None else dpi
+    return max(int(ax.get_position().width * fig.get_figwidth() * dpi), 1)
+
+
+def plot_trace(ax, y, x=None, method="minmax", dpi=None, **kwargs):
+    """
+    ax.plot of y (against x, default the sample index) reduced to about
+    two points per output pixel of the axes. Markers are dropped once the
+    trace is reduced, since they would overlap into a solid band.
+    """
+    y = np.asarray(y)
+    n_out = 2 * axes_pixel_width(ax, dpi)
+    idx, values = downsample(y, n_out, method)
+    if values is not y:
+        kwargs.pop('marker', None)
+    xs = idx if x is None else np.asarray(x)[idx]
+    return ax.plot(xs, values, **kwargs)
+
+
+# ---------------------------------------------------------
+# Streaming statistics
+# ---------------------------------------------------------
+
+def value_range(values, chunk=CHUNK):
+    """(count, sum, min, max) of an array in one chunked pass."""
+    count, total = 0, 0.0
+    lo, hi = np.inf, -np.inf
+    for start in range(0, values.shape[0], chunk):
+        block = np.asarray(values[start:start + chunk], dtype=float)
+        count += block.shape[0]
+        total += float(block.sum())
+        lo = min(lo, float(block.min()))
+        hi = max(hi, float(block.max()))
+    return count, total, lo, hi
+
+
+def histogram(values, bins=20, limits=None, chunk=CHUNK):
+    """
+    (counts, edges) equal to np.histogram(values, bins), accumulated chunk
+    by chunk so no full-size temporary is built. limits is (min, max) if
+    already known.
+    """
+    if limits is None:
+        _, _, lo, hi = value_range(values, chunk)
+    else:
+        lo, hi = limits
+    counts = np.zeros(bins, dtype=np.int64)
+    edges = None
+    for start in range(0, values.shape[0], chunk):
+        c, edges = np.histogram(np.asarray(values[start:start + chunk], dtype=float), bins, range=(lo, hi))
+        counts += c
+    if edges is None:
+        edges = np.histogram(np.empty(0), bins, range=(lo, hi))[1]
+    return counts, edges
+
+
+def _exact_box_stats(v):
+    q1, med, q3 = np.percentile(v, [25, 50, 75])
+    iqr = q3 - q1
+    inside_hi = v[v <= q3 + 1.5 * iqr]
+    inside_lo = v[v >= q1 - 1.5 * iqr]
+    whishi = float(inside_hi.max()) if inside_hi.size else float(q3)
+    whislo = float(inside_lo.min()) if inside_lo.size else float(q1)
+    fliers = v[(v < whislo) | (v > whishi)]
+    return q1, med, q3, whislo, whishi, fliers
+
+
+def box_stats(values, label=None, bins=STATS_BINS, chunk=CHUNK):
+    """
+    Box-plot statistics of values as a matplotlib bxp() dict (med, q1,
+    q3, whislo, whishi, fliers, mean, label), same rules as
+    plt.boxplot: whiskers at the furthest samples within 1.5 IQR.
+    Small arrays are exact; large ones take two chunked passes (range,
+    then a `bins`-bin histogram) and report the fliers as the centres of
+    their non-empty bins, so the result size is bounded.
+    """
+    count, total, lo, hi = value_range(values, chunk)
+    if count == 0:
+        raise ValueError("no values")
+    stats = {'mean': total / count, 'label': label}
+
+    if count <= EXACT_STATS_LIMIT or lo == hi:
+        q1, med, q3, whislo, whishi, fliers = _exact_box_stats(np.asarray(values, dtype=float))
+        stats.update(q1=q1, med=med, q3=q3, whislo=whislo, whishi=whishi, fliers=fliers)
+        return stats
+
+    counts, edges = histogram(values, bins, (lo, hi), chunk)
+    cdf = np.cumsum(counts)
+
+    def quantile(q):
+        # Linear interpolation inside the bin holding rank q * (count - 1)
+        rank = q * (count - 1)
+        b = int(np.searchsorted(cdf, rank, side='right'))
+        before = cdf[b - 1] if b else 0
+        frac = (rank - before + 0.5) / counts[b]
+        return float(edges[b] + min(max(frac, 0.0), 1.0) * (edges[b + 1] - edges[b]))
+
+    q1, med, q3 = quantile(0.25), quantile(0.5), quantile(0.75)
+    iqr = q3 - q1
+    filled = np.flatnonzero(counts)
+    upper = filled[edges[filled + 1] <= q3 + 1.5 * iqr]
+    lower = filled[edges[filled] >= q1 - 1.5 * iqr]
+    whishi = min(float(edges[upper[-1] + 1]), hi) if upper.size else q3
+    whislo = max(float(edges[lower[0]]), lo) if lower.size else q1
+
+    centres = 0.5 * (edges[filled] + edges[filled + 1])
+    fliers = centres[(centres < whislo) | (centres > whishi)]
+    stats.update(q1=q1, med=med, q3=q3, whislo=whislo, whishi=whishi, fliers=fliers)
+    return stats
@@ -2,66 +2,29 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 
-def calculate_mmse_for_m(M, input_signal, desired_signal):
-    N = input_signal.shape[0]
-    
-    # --- Logic from test.py ---
-    # 1. Calculate Autocorrelation Matrix R_M
-    rxx_full = np.correlate(input_signal, input_signal, mode='full')
-    zero_lag_index = N - 1
-
-    R_M = np.zeros((M, M))
-    for l in range(M):
-        for k in range(M):
-            lag = l - k
-            idx = zero_lag_index + lag
-            if 0 <= idx < len(rxx_full):
-                R_M[l, k] = rxx_full[idx]
-
-    # 2. Calculate Cross-Correlation Vector gamma_d
-    rdx_full = np.correlate(desired_signal, input_signal, mode='full')
-    gamma_d = rdx_full[zero_lag_index : zero_lag_index + M]
-
-    # 3. Solve for optimized Filter Coefficients h_opt
-    try:
-        optimize_coefficient = np.linalg.solve(R_M, gamma_d)
-    except np.linalg.LinAlgError:
-        return None  # Handle singular matrices for large M
-
-    # 4. Apply the Filter
-    output_signal_full = np.convolve(input_signal, optimize_coefficient, mode='full')
-    output_signal = output_signal_full[:N]
-
-    # 5. Calculate MMSE
-    error = desired_signal - output_signal
-    mmse = np.mean(error ** 2)
-    return mmse
+from downsample import plot_trace
+from signal_io import load_signal, signal_path
+from wiener import mmse_sweep, solve_wiener_batch
 
 def main():
     # File paths (Test Mode 1)
-    input_file = "input.txt"
-    desired_file = "desired.txt"
+    input_file = signal_path(".", "input")
+    desired_file = signal_path(".", "desired")
 
     if os.path.exists(input_file) and os.path.exists(desired_file):
         print("Loading data...")
-        input_data = np.loadtxt(input_file)
-        desired_data = np.loadtxt(desired_file)
+        input_data = load_signal(input_file)
+        desired_data = load_signal(desired_file)
         
         # Define range of M to test (e.g., 1 to 15)
         # Ensure M doesn't exceed signal length
         max_M = min(15, len(input_data))
-        M_values = range(1, max_M + 1)
-        
-        mmse_values = []
-        valid_Ms = []
 
+        # One order-recursive Levinson pass gives every M at once
         print(f"Calculating MMSE for M = 1 to {max_M}...")
-        for m in M_values:
-            mmse = calculate_mmse_for_m(m, input_data, desired_data)
-            if mmse is not None:
-                mmse_values.append(mmse)
-                valid_Ms.append(m)
-                print(f" M={m}: MMSE={mmse:.4f}")
+        valid_Ms, mmse_values = mmse_sweep(input_data, desired_data, max_M)
+        for m, mmse in zip(valid_Ms, mmse_values):
+            print(f" M={m}: MMSE={mmse:.4f}")
         
         # Plotting
         plt.figure(figsize=(10, 6))
@@ -81,9 +44,9 @@ def main():
 
 def plot_signal_comparison():
     # File names
-    file_desired = "desired.txt"
-    file_input2 = "input_2.txt"
-    file_input3 = "input_3.txt"
+    file_desired = signal_path(".", "desired")
+    file_input2 = signal_path(".", "input_2")
+    file_input3 = signal_path(".", "input_3")
 
     # Check if files exist
     if not (os.path.exists(file_desired) and os.path.exists(file_input2) and os.path.exists(file_input3)):
@@ -93,21 +56,29 @@ def plot_signal_comparison():
     try:
         # Load data
         print("Loading data...")
-        desired = np.loadtxt(file_desired)
-        input2 = np.loadtxt(file_input2)
-        input3 = np.loadtxt(file_input3)
+        desired = load_signal(file_desired)
+        input2 = load_signal(file_input2)
+        input3 = load_signal(file_input3)
+
+        # MMSE of the M=10 Wiener filter for both inputs in one batched solve
+        labels = ['Input 2 (input_2.txt)', 'Input 3 (input_3.txt)']
+        if input2.shape == desired.shape and input3.shape == desired.shape:
+            _, _, mmse, _ = solve_wiener_batch(np.stack([input2, input3]),
+                                               np.stack([desired, desired]), 10)
+            labels = [f"{label}, MMSE={m:.4f}" for label, m in zip(labels, mmse)]
 
         # Create Plot
         plt.figure(figsize=(12, 6))
+        ax = plt.gca()
 
         # Plot 1: Desired Signal (Reference)
-        plt.plot(desired, label='Desired Signal (desired.txt)', color='black', linewidth=2, linestyle='--')
+        plot_trace(ax, desired, label='Desired Signal (desired.txt)', color='black', linewidth=2, linestyle='--')
 
         # Plot 2: Input 2
-        plt.plot(input2, label='Input 2 (input_2.txt)', color='blue', alpha=0.7)
+        plot_trace(ax, input2, label=labels[0], color='blue', alpha=0.7)
 
         # Plot 3: Input 3
-        plt.plot(input3, label='Input 3 (input_3.txt)', color='red', alpha=0.7)
+        plot_trace(ax, input3, label=labels[1], color='red', alpha=0.7)
 
         # Formatting
         plt.title('Desired vs Input 2 vs Input 3')
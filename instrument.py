@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import pstats
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+# Trace records (one JSON object per line of the trace file):
+#   {"case", "stage", "seconds", "peak_bytes", "arrays": {name: [shape, nbytes]},
+#    ...scalar sizes such as N and M}
+# peak_bytes is the tracemalloc peak above the stage's starting allocation,
+# or null when memory tracing is off.
+
+# Functions listed by the cProfile report
+PROFILE_TOP = 15
+
+
+class Tracer:
+    """
+    Collects per-stage wall time, peak allocation and array sizes.
+
+        with tracer.stage("solve", M=M) as info:
+            h = solve(...)
+            info['h'] = h           # arrays are recorded by shape and nbytes
+
+    Stages may nest; an outer stage's peak includes its inner stages.
+    memory=True turns on tracemalloc (which slows allocation-heavy code,
+    so it is opt-in).
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.records = []
+        self.context = {}
+        self._stack = []
+        self._started = False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+
+    @contextmanager
+    def stage(self, name, **sizes):
+        info = dict(sizes)
+        frame = {'peak': 0}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # Keep the enclosing stage's peak before reset_peak clears it
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['base'] = current
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            seconds = time.perf_counter() - start
+            self._stack.pop()
+            peak_bytes = None
+            if self.memory:
+                peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                peak_bytes = peak - frame['base']
+                if self._stack:
+                    self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            self.records.append(self._record(name, seconds, peak_bytes, info))
+
+    def _record(self, name, seconds, peak_bytes, info):
+        record = dict(self.context, stage=name, seconds=seconds, peak_bytes=peak_bytes)
+        arrays = {}
+        for key, value in info.items():
+            if hasattr(value, 'nbytes') and hasattr(value, 'shape'):
+                arrays[key] = [list(value.shape), int(value.nbytes)]
+            else:
+                record[key] = value
+        if arrays:
+            record['arrays'] = arrays
+        return record
+
+    def timed(self, name=None):
+        """Decorator form of stage(): times every call of the function."""
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name or func.__name__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    @contextmanager
+    def case(self, name):
+        """Tags the records of the enclosed stages with a case name."""
+        previous = self.context.get('case')
+        self.context['case'] = name
+        try:
+            yield
+        finally:
+            self.context['case'] = previous
+
+    def take(self):
+        """Returns and clears the collected records."""
+        records, self.records = self.records, []
+        return records
+
+    def close(self):
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+
+@contextmanager
+def _untraced():
+    yield {}
+
+
+def stage(tracer, name, **sizes):
+    """tracer.stage(name, ...), or a no-op context when tracer is None."""
+    return _untraced() if tracer is None else tracer.stage(name, **sizes)
+
+
+# ---------------------------------------------------------
+# Output
+# ---------------------------------------------------------
+
+def write_trace(records, path):
+    """Writes records to a JSON-lines file, one stage per line."""
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(',', ':')) + "\n")
+
+
+def read_trace(path):
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _stage_order(records):
+    return list(dict.fromkeys(r['stage'] for r in records))
+
+
+def _bucket(N):
+    """N rounded down to a power of ten, for the scaling table."""
+    return 10 ** (len(str(int(N))) - 1) if N else 0
+
+
+def print_trace_summary(records, log=print):
+    """
+    Compact per-stage table (calls, total, mean, max, share of the traced
+    time, largest peak allocation), plus the mean time of each stage per
+    decade of N when the batch mixes signal lengths.
+    """
+    if not records:
+        return
+    stages = _stage_order(records)
+    total = sum(r['seconds'] for r in records) or 1.0
+    log(f"\n{'Stage':<18}{'calls':>8}{'total s':>10}{'mean ms':>10}{'max ms':>10}{'share':>8}{'peak MiB':>10}")
+    for name in stages:
+        rows = [r for r in records if r['stage'] == name]
+        seconds = [r['seconds'] for r in rows]
+        peaks = [r['peak_bytes'] for r in rows if r.get('peak_bytes') is not None]
+        peak = f"{max(peaks) / 2**20:>10.2f}" if peaks else f"{'-':>10}"
+        log(f"{name:<18}{len(rows):>8}{sum(seconds):>10.3f}{1000 * sum(seconds) / len(rows):>10.3f}"
+            f"{1000 * max(seconds):>10.3f}{100 * sum(seconds) / total:>7.1f}%{peak}")
+
+    sizes = sorted({_bucket(r['N']) for r in records if r.get('N') is not None})
+    if len(sizes) < 2:
+        return
+    log(f"\n Mean ms per stage by N\n{'N >=':<12}" + "".join(f"{s[:11]:>12}" for s in stages))
+    for size in sizes:
+        row = f"{size:<12}"
+        for name in stages:
+            seconds = [r['seconds'] for r in records
+                       if r['stage'] == name and r.get('N') is not None and _bucket(r['N']) == size]
+            row += f"{1000 * sum(seconds) / len(seconds):>12.3f}" if seconds else f"{'-':>12}"
+        log(row)
+
+
+@contextmanager
+def profiled(path=None, top=PROFILE_TOP, log=print):
+    """
+    Runs the enclosed block under cProfile; saves the stats to path (for
+    pstats/snakeviz) and logs the top functions by cumulative time.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+            log(f"\n Profile saved to: {os.path.abspath(path)}")
+        stats = pstats.Stats(profiler)
+        stats.sort_stats('cumulative')
+        log(f"\n Top {top} functions by cumulative time:")
+        width = max((len(pstats.func_std_string(f)) for f in stats.fcn_list[:top]), default=0)
+        for func in stats.fcn_list[:top]:
+            calls, _, tottime, cumtime, _ = stats.stats[func]
+            log(f"  {pstats.func_std_string(func):<{min(width, 70)}} {calls:>9} calls {tottime:>8.3f} s "
+                f"{cumtime:>8.3f} s cum")
@@ -1,15 +1,16 @@
 #####################################################################
 # MIPS IMPLEMENTATION OF A WIENER FILTER
 #
-# Reads from stdin (e.g., '... < input.txt')
+# Reads from stdin (e.g., '... < input.txt'), one value per line:
+#   N, M (integers), then N desired and N input samples (floats)
 # Writes to stdout (e.g., '... > output.txt')
 
 #####################################################################
 
 .data
-    # --- Constants ---
-    N:              .word 10       # 10 sequences
-    M:              .word 10       # M = 10
+    # --- Sizes (read from the stdin header at start-up) ---
+    N:              .word 0        # signal length
+    M:              .word 0        # filter length
     FLOAT_SIZE:     .word 4         # 4 bytes per float
     
     # --- String Literals ---
@@ -17,54 +18,82 @@
     str_space:        .asciiz " "
     str_mmse_result:  .asciiz "\nMMSE: "
     str_newline:      .asciiz "\n"
+    str_bad_header:   .asciiz "Error: N and M must be positive\n"
     
     float_zero:     .float 0.0
     float_half:     .float 0.5
+    float_one:      .float 1.0
+    levinson_tol:   .float 1.0e-6  # relative prediction-error floor
     
-    .align 4  # Align buffers to 4-byte boundary
+    .align 2  # Align pointers to 4-byte boundary
 
-    # --- Buffers (N=10, M=10) ---
-    desired_signal_array: .space 40
-    input_signal_array:   .space 40
-    y_out_array:          .space 40
-    # Resized buffers below for M=10
-    gamma_d_vector:       .space 40  # M * 4 = 10 * 4 = 40
-    h_opt_vector:         .space 40  # M * 4 = 10 * 4 = 40
-    gamma_xx_temp:        .space 40  # M * 4 = 10 * 4 = 40
-    R_M_matrix:           .space 400 # M * M * 4 = 10 * 10 * 4 = 400
-    aug_matrix:           .space 440 # M * (M+1) * 4 = 10 * 11 * 4 = 440
+    # --- Buffers (allocated on the heap with sbrk, sized by N and M) ---
+    desired_signal_array: .word 0  # N floats
+    input_signal_array:   .word 0  # N floats
+    y_out_array:          .word 0  # N floats
+    gamma_d_vector:       .word 0  # M floats
+    h_opt_vector:         .word 0  # M floats
+    gamma_xx_vector:      .word 0  # M floats (first column of R_M)
+    levinson_a_vector:    .word 0  # M floats (Levinson scratchpad)
 
 .text
 .globl main
 main:
-    # Load constants
-    lw $s0, N             # $s0 = N = 10
-    lw $s1, M             # $s1 = M = 10
+    # --- Step 1: Read the header (N, M) ---
+    li $v0, 5             # syscall 5: read integer
+    syscall
+    move $s0, $v0         # $s0 = N
+    li $v0, 5
+    syscall
+    move $s1, $v0         # $s1 = M
+    blez $s0, bad_header
+    blez $s1, bad_header
+    sw $s0, N
+    sw $s1, M
     lw $s2, FLOAT_SIZE    # $s2 = 4 (bytes)
     
     l.s $f30, float_zero  # Load 0.0 into $f30
 
+    # --- Step 2: Allocate buffers ---
+    move $a0, $s0
+    jal proc_alloc_floats
+    sw $v0, desired_signal_array
+    move $a0, $s0
+    jal proc_alloc_floats
+    sw $v0, input_signal_array
+    move $a0, $s0
+    jal proc_alloc_floats
+    sw $v0, y_out_array
+    move $a0, $s1
+    jal proc_alloc_floats
+    sw $v0, gamma_d_vector
+    move $a0, $s1
+    jal proc_alloc_floats
+    sw $v0, h_opt_vector
+    move $a0, $s1
+    jal proc_alloc_floats
+    sw $v0, gamma_xx_vector
+    move $a0, $s1
+    jal proc_alloc_floats
+    sw $v0, levinson_a_vector
+
     # --- Step 3: Load Data from stdin ---
-    la $a0, desired_signal_array
-    la $a1, input_signal_array
+    lw $a0, desired_signal_array
+    lw $a1, input_signal_array
     move $a2, $s0         # N
     jal proc_read_stdin
 
-    # --- Step 4: Calculate R_M ---
-    la $a0, input_signal_array
-    la $a1, R_M_matrix
-    la $a2, gamma_xx_temp
-    move $a3, $s0         # a3 = N
-    
-    addi $sp, $sp, -4
-    sw $s1, 0($sp)        # Push M ($s1)
-    jal proc_build_R_M
-    addi $sp, $sp, 4      # Pop M
+    # --- Step 4: Calculate the autocorrelation lags (R_M is Toeplitz) ---
+    lw $a0, input_signal_array
+    lw $a1, gamma_xx_vector
+    move $a2, $s0         # a2 = N
+    move $a3, $s1         # a3 = M
+    jal proc_build_gamma_xx
 
     # --- Step 5: Calculate gamma_d ---
-    la $a0, desired_signal_array
-    la $a1, input_signal_array
-    la $a2, gamma_d_vector
+    lw $a0, desired_signal_array
+    lw $a1, input_signal_array
+    lw $a2, gamma_d_vector
     move $a3, $s0         # a3 = N
 
     addi $sp, $sp, -4
@@ -73,20 +102,20 @@ main:
     addi $sp, $sp, 4      # Pop M
 
     # --- Step 6: Solve for h_opt ---
-    la $a0, R_M_matrix
-    la $a1, gamma_d_vector
-    la $a2, h_opt_vector
-    la $a3, aug_matrix    # a3 = scratchpad
+    lw $a0, gamma_xx_vector
+    lw $a1, gamma_d_vector
+    lw $a2, h_opt_vector
+    lw $a3, levinson_a_vector # a3 = scratchpad
     
     addi $sp, $sp, -4
     sw $s1, 0($sp)        # Push M ($s1)
-    jal proc_solve_gaussian
+    jal proc_solve_levinson
     addi $sp, $sp, 4      # Pop M
 
     # --- Step 7: Apply Filter (Convolve) ---
-    la $a0, input_signal_array
-    la $a1, h_opt_vector
-    la $a2, y_out_array
+    lw $a0, input_signal_array
+    lw $a1, h_opt_vector
+    lw $a2, y_out_array
     move $a3, $s0         # a3 = N
     
     addi $sp, $sp, -4
@@ -95,79 +124,91 @@ main:
     addi $sp, $sp, 4      # Pop M
     
     # --- Step 8: Calculate MMSE ---
-    la $a0, desired_signal_array
-    la $a1, y_out_array
+    lw $a0, desired_signal_array
+    lw $a1, y_out_array
     move $a2, $s0         # a2 = N
     jal proc_calc_mmse
     # MMSE result is in $f0
 
     # --- Step 9: Write Output to stdout ---
-    la $a0, y_out_array
+    lw $a0, y_out_array
     move $a1, $s0         # N
     mov.s $f12, $f0       # $f12 = MMSE value
     jal proc_write_stdout
     
     jal proc_exit
 
+bad_header:
+    li $v0, 4
+    la $a0, str_bad_header
+    syscall
+    jal proc_exit
+
+#-------------------------------------------------------------------
+# PROCEDURE: proc_alloc_floats
+# Allocates a zeroed heap buffer with sbrk (syscall 9).
+# Args:
+#   $a0: number of floats
+# Returns:
+#   $v0: buffer address
+#-------------------------------------------------------------------
+proc_alloc_floats:
+    sll $a0, $a0, 2       # bytes = count * 4
+    li $v0, 9             # syscall 9: sbrk
+    syscall
+    jr $ra
+
+
 #-------------------------------------------------------------------
 # PROCEDURE: proc_read_stdin
 # Reads N*2 floats from stdin using syscall 6.
 #-------------------------------------------------------------------
 proc_read_stdin:
-    move $t0, $a0         # $t0 = &desired_signal_array
-    move $t1, $a1         # $t1 = &input_signal_array
-    move $t2, $a2         # $t2 = N
-    li $t3, 0             # $t3 = i = 0
-    li $t4, 4             # $t4 = 4 (bytes)
+    sll $t2, $a2, 2       # $t2 = N * 4 (bytes)
+    move $t0, $a0         # $t0 = &desired_signal_array[0]
+    add $t1, $a0, $t2     # $t1 = &desired_signal_array[N]
 
 read_loop_1: # Read first N floats for desired_signal
-    bge $t3, $t2, read_loop_2_start # if (i >= N), go to next loop
-    
     li $v0, 6             # syscall 6: read float
     syscall               # Result is in $f0
-    
-    mul $t5, $t3, $t4     # $t5 = i * 4
-    add $t6, $t0, $t5     # $t6 = &desired_signal_array[i]
-    s.s $f0, 0($t6)       # store float
-    
-    addi $t3, $t3, 1      # i++
-    j read_loop_1
+    s.s $f0, 0($t0)       # store float
+    addi $t0, $t0, 4      # next element
+    blt $t0, $t1, read_loop_1
 
-read_loop_2_start:
-    li $t3, 0             # $t3 = i = 0 (reset counter)
+    move $t0, $a1         # $t0 = &input_signal_array[0]
+    add $t1, $a1, $t2     # $t1 = &input_signal_array[N]
 
 read_loop_2: # Read next N floats for input_signal
-    bge $t3, $t2, read_end # if (i >= N), end
-    
     li $v0, 6             # syscall 6: read float
     syscall               # Result is in $f0
-    
-    mul $t5, $t3, $t4     # $t5 = i * 4
-    add $t6, $t1, $t5     # $t6 = &input_signal_array[i]
-    s.s $f0, 0($t6)       # store float
-    
-    addi $t3, $t3, 1      # i++
-    j read_loop_2
+    s.s $f0, 0($t0)       # store float
+    addi $t0, $t0, 4      # next element
+    blt $t0, $t1, read_loop_2
 
-read_end:
     jr $ra
     
 #-------------------------------------------------------------------
 # PROCEDURE: proc_write_stdout
-# Writes the 10-sequence output and MMSE to stdout.
+# Writes the N output values and the MMSE to stdout, one value at a
+# time, so the output length is bounded only by N.
+# Args:
+#   $a0: &y_out_array
+#   $a1: N
+#   $f12: MMSE
 #-------------------------------------------------------------------
 proc_write_stdout:
 	mov.s $f20, $f12
-    move $t0, $a0         # $t0 = &y_out_array
-    move $t1, $a1         # $t1 = N
-    li $t2, 0             # $t2 = i = 0
-    li $t3, 4             # $t3 = 4 (bytes)
+    move $t0, $a0         # $t0 = &y_out[0]
+    sll $t1, $a1, 2
+    add $t1, $t0, $t1
+    addi $t1, $t1, -4     # $t1 = &y_out[N-1] (no space after it)
 
     # Constants for rounding
     li $t6, 10            # multiplier for 1 decimal place
     mtc1 $t6, $f4
     cvt.s.w $f4, $f4      # $f4 = 10.0
     l.s $f5, float_half   # $f5 = 0.5 (for rounding)
+    l.s $f6, float_zero
 
     # Print "Filtered output:" string	
     li $v0, 4
@@ -175,17 +216,13 @@ proc_write_stdout:
     syscall
 
 write_loop:
-    bge $t2, $t1, write_mmse # if (i >= N), end loop
+    bgt $t0, $t1, write_mmse # if past y_out[N-1], end loop
     
-    # Get y_out[i]
-    mul $t4, $t2, $t3
-    add $t4, $t0, $t4     # $t4 = &y_out[i]
-    l.s $f1, 0($t4)
+    l.s $f1, 0($t0)       # Get y_out[i]
     
     # Round to 1 decimal place: value * 10, round, then / 10
     mul.s $f1, $f1, $f4   # Multiply by 10
     # Add 0.5 for rounding (if positive) or subtract 0.5 (if negative)
-    l.s $f6, float_zero
     c.lt.s $f1, $f6       # Check if negative
     bc1f positive_round
     # Negative number: subtract 0.5 then floor
@@ -207,26 +244,20 @@ do_round:
     mov.s $f12, $f1       # $f12 = rounded float to print
     syscall
     
-    # START - Only print space if NOT the last element
-    addi $t5, $t1, -1     # $t5 = N - 1
-    beq $t2, $t5, skip_space # if (i == N-1), skip printing space
-    
-    # Print a SPACE
+    # Only print a space if this was NOT the last element
+    beq $t0, $t1, skip_space
     li $v0, 4
     la $a0, str_space
     syscall
     
 skip_space:
-    # END
-    
-    addi $t2, $t2, 1      # i++
+    addi $t0, $t0, 4      # next element
     j write_loop
 
 write_mmse:
     # Round MMSE value to 1 decimal place
     mov.s $f1, $f20       # MMSE value
     mul.s $f1, $f1, $f4   # Multiply by 10
-    l.s $f6, float_zero
     c.lt.s $f1, $f6       # Check if negative
     bc1f positive_round_mmse
     sub.s $f1, $f1, $f5   # Negative: subtract 0.5
@@ -252,6 +283,7 @@ do_round_mmse:
 
 #-------------------------------------------------------------------
 # PROCEDURE: proc_calc_gamma_xx
+# Leaf procedure; walks &x[n] and &x[n+k] as pointers.
 # Args:
 #   $a0: &input_signal
 #   $a1: k (lag)
@@ -260,52 +292,31 @@ do_round_mmse:
 #   $f0: sum(x[n] * x[n+k])
 #-------------------------------------------------------------------
 proc_calc_gamma_xx:
-    # Save registers
-    addi $sp, $sp, -12
-    sw $ra, 0($sp)
-    sw $s0, 4($sp)        # Save base address
-    sw $s1, 8($sp)        # Save N
-    
-    move $s0, $a0         # $s0 = base address (preserved)
-    move $s1, $a2         # $s1 = N (preserved)
+    mtc1 $zero, $f0       # sum = 0.0
+    sub $t0, $a2, $a1     # $t0 = N - k (number of products)
+    blez $t0, gamma_xx_end
     
-    sub $t0, $s1, $a1     # $t0 = N - k
-    li $t1, 0             # n = 0
-    l.s $f0, float_zero   # sum = 0.0
+    move $t1, $a0         # $t1 = &x[0]
+    sll $t2, $a1, 2
+    add $t2, $a0, $t2     # $t2 = &x[k]
+    sll $t0, $t0, 2
+    add $t0, $a0, $t0     # $t0 = &x[N-k] (end)
     
 gamma_xx_loop:
-    bge $t1, $t0, gamma_xx_end
-    
-    add $t2, $t1, $a1     # n + k
-    
-    # Check bounds
-    bge $t2, $s1, skip_invalid_xx
-    
-    # Calculate addresses - use $s0 (preserved base)
-    mul $t3, $t1, 4
-    add $t3, $s0, $t3     # &x[n]
-    l.s $f1, 0($t3)
-    
-    mul $t4, $t2, 4
-    add $t4, $s0, $t4     # &x[n+k]
-    l.s $f2, 0($t4)
-    
+    l.s $f1, 0($t1)       # x[n]
+    l.s $f2, 0($t2)       # x[n+k]
     mul.s $f3, $f1, $f2
     add.s $f0, $f0, $f3
-    
-skip_invalid_xx:
-    addi $t1, $t1, 1
-    j gamma_xx_loop
+    addi $t1, $t1, 4
+    addi $t2, $t2, 4
+    blt $t1, $t0, gamma_xx_loop
 
 gamma_xx_end:
-    lw $ra, 0($sp)
-    lw $s0, 4($sp)
-    lw $s1, 8($sp)
-    addi $sp, $sp, 12
     jr $ra
     
 #-------------------------------------------------------------------
 # PROCEDURE: proc_calc_gamma_dx
+# Leaf procedure; walks &x[n] and &d[n+k] as pointers.
 # Args:
 #   $a0: &desired_signal
 #   $a1: &input_signal
@@ -315,148 +326,74 @@ gamma_xx_end:
 #   $f0: sum(d[n+k] * x[n])
 #-------------------------------------------------------------------
 proc_calc_gamma_dx:
-    # Save registers
-    addi $sp, $sp, -16
-    sw $ra, 0($sp)
-    sw $s0, 4($sp)        # desired base
-    sw $s1, 8($sp)        # input base  
-    sw $s2, 12($sp)       # N
-    
-    move $s0, $a0         # desired base
-    move $s1, $a1         # input base
-    move $s2, $a3         # N
+    mtc1 $zero, $f0       # sum = 0.0
+    sub $t0, $a3, $a2     # $t0 = N - k (number of products)
+    blez $t0, gamma_dx_end
     
-    sub $t0, $s2, $a2     # N - k
-    li $t1, 0             # n = 0
-    l.s $f0, float_zero   # sum = 0.0
+    move $t1, $a1         # $t1 = &x[0]
+    sll $t2, $a2, 2
+    add $t2, $a0, $t2     # $t2 = &d[k]
+    sll $t0, $t0, 2
+    add $t0, $a1, $t0     # $t0 = &x[N-k] (end)
     
 gamma_dx_loop:
-    bge $t1, $t0, gamma_dx_end
-    
-    add $t2, $t1, $a2     # n + k
-    
-    # Check bounds
-    bge $t2, $s2, skip_invalid_dx
-    
-    # x[n] from input array
-    mul $t3, $t1, 4
-    add $t3, $s1, $t3
-    l.s $f1, 0($t3)
-    
-    # d[n+k] from desired array
-    mul $t4, $t2, 4
-    add $t4, $s0, $t4
-    l.s $f2, 0($t4)
-    
+    l.s $f1, 0($t1)       # x[n]
+    l.s $f2, 0($t2)       # d[n+k]
     mul.s $f3, $f1, $f2
     add.s $f0, $f0, $f3
-    
-skip_invalid_dx:
-    addi $t1, $t1, 1
-    j gamma_dx_loop
+    addi $t1, $t1, 4
+    addi $t2, $t2, 4
+    blt $t1, $t0, gamma_dx_loop
 
 gamma_dx_end:
-    lw $ra, 0($sp)
-    lw $s0, 4($sp)
-    lw $s1, 8($sp)
-    lw $s2, 12($sp)
-    addi $sp, $sp, 16
     jr $ra
     
 #-------------------------------------------------------------------
-# PROCEDURE: proc_build_R_M
-# Builds the M x M auto-correlation Toeplitz matrix (R_M).
+# PROCEDURE: proc_build_gamma_xx
+# Builds the M x 1 autocorrelation lag vector. R_M is the symmetric
+# Toeplitz matrix with R_M[l][k] = gamma_xx[|l-k|], so the lags are
+# all proc_solve_levinson needs; the M x M matrix is never stored.
 # Effect:
-#   - Fills the `gamma_xx_temp` array by calling `proc_calc_gamma_xx`.
-#   - Fills the `R_M_matrix` with values from `gamma_xx_temp`.
+#   - Fills the `gamma_xx_vector` by calling `proc_calc_gamma_xx`.
 # Args:
 #   $a0: &input_signal
-#   $a1: &R_M_matrix (output)
-#   $a2: &gamma_xx_temp (scratchpad)
-#   $a3: N (signal length)
-#   0($sp): M (matrix dimension)
+#   $a1: &gamma_xx_vector (output)
+#   $a2: N (signal length)
+#   $a3: M (number of lags)
 #-------------------------------------------------------------------
-proc_build_R_M:
-    addi $sp, $sp, -28
+proc_build_gamma_xx:
+    addi $sp, $sp, -24
     sw $ra, 0($sp)
     sw $s0, 4($sp)
     sw $s1, 8($sp)
     sw $s2, 12($sp)
     sw $s3, 16($sp)
     sw $s4, 20($sp)
-    sw $s5, 24($sp)
     
-    move $s0, $a0
-    move $s1, $a1
-    move $s2, $a2
-    move $s3, $a3
-    
-    lw $s4, 28($sp)       # $s4 = M
-    
-    li $t0, 0
-build_R_M_loop1:
-    bge $t0, $s4, build_R_M_loop1_end
+    move $s0, $a0         # input base
+    move $s1, $a1         # output pointer
+    move $s2, $a2         # N
+    move $s4, $a3         # M
     
-    # SAVE $t0 before function call
-    addi $sp, $sp, -4
-    sw $t0, 0($sp)
+    li $s3, 0             # k = 0
+build_gamma_xx_loop:
     move $a0, $s0
-    move $a1, $t0    # This should be k = 0,1,2,3...M-1
-    move $a2, $s3
+    move $a1, $s3         # k = 0,1,2,3...M-1
+    move $a2, $s2
     jal proc_calc_gamma_xx
-    # RESTORE $t0 after function call
-    lw $t0, 0($sp)
-    addi $sp, $sp, 4
-    
-    mul $t1, $t0, 4
-    add $t1, $s2, $t1      # $s2 = gamma_xx_temp
-    s.s $f0, 0($t1)
-    
-    addi $t0, $t0, 1
-    j build_R_M_loop1
-    
-build_R_M_loop1_end:
-    # RESET LOOP COUNTER for building R matrix
-    li $t0, 0
-build_R_M_loop_l:
-    bge $t0, $s4, build_R_M_loop_end
-    li $t1, 0
-build_R_M_loop_k:
-    bge $t1, $s4, build_R_M_loop_l_inc
-    sub $t2, $t0, $t1
-    blt $t2, $zero, abs_neg
-    move $t3, $t2
-    j abs_done
-abs_neg:
-    sub $t3, $zero, $t2
-abs_done:
-    
-    mul $t4, $t3, 4
-    add $t4, $s2, $t4      # $s2 = gamma_xx_temp
-    l.s $f1, 0($t4)        # Load from gamma_xx_temp[|l-k|]
-    
-    mul $t5, $t0, $s4
-    add $t5, $t5, $t1
-    mul $t5, $t5, 4
-    add $t5, $s1, $t5      # Store to R_M_matrix[l][k]
-    
-    s.s $f1, 0($t5)        # Store in R_M_matrix
-    
-    addi $t1, $t1, 1
-    j build_R_M_loop_k
-
-build_R_M_loop_l_inc:
-    addi $t0, $t0, 1
-    j build_R_M_loop_l
-build_R_M_loop_end:
+    
+    s.s $f0, 0($s1)       # gamma_xx[k]
+    addi $s1, $s1, 4
+    addi $s3, $s3, 1
+    blt $s3, $s4, build_gamma_xx_loop
+    
     lw $ra, 0($sp)
     lw $s0, 4($sp)
     lw $s1, 8($sp)
     lw $s2, 12($sp)
     lw $s3, 16($sp)
     lw $s4, 20($sp)
-    lw $s5, 24($sp)
-    addi $sp, $sp, 28
+    addi $sp, $sp, 24
     jr $ra
 
 #-------------------------------------------------------------------
@@ -472,68 +409,68 @@ build_R_M_loop_end:
 #   0($sp): M (vector length)
 #-------------------------------------------------------------------
 proc_build_gamma_d:
-    addi $sp, $sp, -24
+    addi $sp, $sp, -28
     sw $ra, 0($sp)
     sw $s0, 4($sp)
     sw $s1, 8($sp)
     sw $s2, 12($sp)
     sw $s3, 16($sp)
     sw $s4, 20($sp)
+    sw $s5, 24($sp)
 
     move $s0, $a0
     move $s1, $a1
-    move $s2, $a2
+    move $s2, $a2         # output pointer
     move $s3, $a3
     
-    lw $s4, 24($sp)       # $s4 = M (Load 5th arg)
-    li $t0, 0
+    lw $s4, 28($sp)       # $s4 = M (Load 5th arg)
+    li $s5, 0             # k = 0
 build_gamma_d_loop:
-    bge $t0, $s4, build_gamma_d_end
-    
-    # SAVE $t0 before function call
-    addi $sp, $sp, -4
-    sw $t0, 0($sp)
-    
     move $a0, $s0
     move $a1, $s1
-    move $a2, $t0
+    move $a2, $s5
     move $a3, $s3
     jal proc_calc_gamma_dx
     
-    # RESTORE $t0 after function call
-    lw $t0, 0($sp)
-    addi $sp, $sp, 4
-    
-    mul $t1, $t0, 4
-    add $t1, $s2, $t1
-    s.s $f0, 0($t1)
-    addi $t0, $t0, 1
-    j build_gamma_d_loop
-build_gamma_d_end:
+    s.s $f0, 0($s2)       # gamma_d[k]
+    addi $s2, $s2, 4
+    addi $s5, $s5, 1
+    blt $s5, $s4, build_gamma_d_loop
+
     lw $ra, 0($sp)
     lw $s0, 4($sp)
     lw $s1, 8($sp)
     lw $s2, 12($sp)
     lw $s3, 16($sp)
     lw $s4, 20($sp)
-    addi $sp, $sp, 24
+    lw $s5, 24($sp)
+    addi $sp, $sp, 28
     jr $ra
 
 #-------------------------------------------------------------------
-# PROCEDURE: proc_solve_gaussian
-# Solves the linear system R_M * h = gamma_d for h (h_opt_vector)
-# using Gaussian elimination (forward elim + back substitution).
+# PROCEDURE: proc_solve_levinson
+# Solves R_M * h = gamma_d for h (h_opt_vector) with the Levinson-
+# Durbin recursion, O(M^2), working directly on the lag vector.
+# Order m keeps a forward predictor a = [1, a_1, ..., a_m] and its
+# prediction error err; h is extended with the reversed predictor:
+#   k   = -(sum_i r[m-i] * a[i]) / err
+#   a[i] += k * a[m-i]             (i = 0..m, updated in pairs)
+#   err *= 1 - k^2
+#   mu  = (gamma_d[m] - sum_i r[m-i] * h[i]) / err
+#   h[i] += mu * a[m-i]            (i = 0..m)
+# If err falls below levinson_tol * r[0] (singular R_M) the recursion
+# stops and the remaining taps stay 0; a zero-energy input gives h = 0.
 # Effect:
-#   - Fills the `aug_matrix` scratchpad.
+#   - Uses the scratchpad for a.
 #   - Fills the `h_opt_vector` with the solution.
 # Args:
-#   $a0: &R_M_matrix (input)
+#   $a0: &gamma_xx_vector (lags r[0..M-1])
 #   $a1: &gamma_d_vector (input)
 #   $a2: &h_opt_vector (output)
-#   $a3: &aug_matrix (scratchpad)
+#   $a3: &levinson_a_vector (scratchpad, M floats)
 #   0($sp): M (system dimension)
 #-------------------------------------------------------------------
-proc_solve_gaussian:
+proc_solve_levinson:
     addi $sp, $sp, -24
     sw $ra, 0($sp)
     sw $s0, 4($sp)
@@ -542,125 +479,114 @@ proc_solve_gaussian:
     sw $s3, 16($sp)
     sw $s4, 20($sp)
     
-    move $s0, $a0
-    move $s1, $a1
-    move $s2, $a2
-    move $s3, $a3
+    move $s0, $a0         # r
+    move $s1, $a1         # gamma_d
+    move $s2, $a2         # h
+    move $s3, $a3         # a
     
     lw $s4, 24($sp)       # $s4 = M (Load 5th arg)
     
-    # FIX: Changed 'li $t0, 5' to be dynamic (M+1)
-    addi $t0, $s4, 1      # $t0 = M + 1 (width of augmented matrix)
-    
-    li $t1, 0
-gauss_build_loop_i:
-    bge $t1, $s4, gauss_build_end
-    li $t2, 0
-gauss_build_loop_j:
-    bge $t2, $s4, gauss_build_col_M
-    mul $t3, $t1, $s4
-    add $t3, $t3, $t2
-    mul $t3, $t3, 4
-    add $t3, $s0, $t3
-    l.s $f1, 0($t3)
-    mul $t4, $t1, $t0
-    add $t4, $t4, $t2
-    mul $t4, $t4, 4
-    add $t4, $s3, $t4
-    s.s $f1, 0($t4)
-    addi $t2, $t2, 1
-    j gauss_build_loop_j
-gauss_build_col_M:
-    mul $t3, $t1, 4
-    add $t3, $s1, $t3
-    l.s $f1, 0($t3)
-    mul $t4, $t1, $t0
-    add $t4, $t4, $s4
-    mul $t4, $t4, 4
-    add $t4, $s3, $t4
-    s.s $f1, 0($t4)
-    addi $t1, $t1, 1
-    j gauss_build_loop_i
-gauss_build_end:
-    li $t1, 0
-gauss_fwd_loop_k:
-    sub $t2, $s4, 1
-    bge $t1, $t2, gauss_fwd_end
-    addi $t2, $t1, 1
-gauss_fwd_loop_i:
-    bge $t2, $s4, gauss_fwd_k_inc
-    mul $t3, $t2, $t0
-    add $t3, $t3, $t1
-    mul $t3, $t3, 4
-    add $t3, $s3, $t3
-    l.s $f1, 0($t3)
-    mul $t4, $t1, $t0
-    add $t4, $t4, $t1
-    mul $t4, $t4, 4
-    add $t4, $s3, $t4
-    l.s $f2, 0($t4)
-    div.s $f3, $f1, $f2
-    move $t5, $t1
-gauss_fwd_loop_j:
-    bge $t5, $t0, gauss_fwd_i_inc
-    mul $t6, $t1, $t0
-    add $t6, $t6, $t5
-    mul $t6, $t6, 4
-    add $t6, $s3, $t6
-    l.s $f4, 0($t6)
-    mul $t7, $t2, $t0
-    add $t7, $t7, $t5
-    mul $t7, $t7, 4
-    add $t7, $s3, $t7
-    l.s $f5, 0($t7)
-    mul.s $f6, $f3, $f4
-    sub.s $f7, $f5, $f6
-    s.s $f7, 0($t7)
-    addi $t5, $t5, 1
-    j gauss_fwd_loop_j
-gauss_fwd_i_inc:
-    addi $t2, $t2, 1
-    j gauss_fwd_loop_i
-gauss_fwd_k_inc:
-    addi $t1, $t1, 1
-    j gauss_fwd_loop_k
-gauss_fwd_end:
-    sub $t1, $s4, 1
-gauss_back_loop_i:
-    blt $t1, $zero, gauss_back_end
-    mul $t2, $t1, $t0
-    add $t2, $t2, $s4
-    mul $t2, $t2, 4
-    add $t2, $s3, $t2
-    l.s $f1, 0($t2)
-    addi $t3, $t1, 1
-gauss_back_loop_j:
-    bge $t3, $s4, gauss_back_calc_x
-    mul $t4, $t1, $t0
-    add $t4, $t4, $t3
-    mul $t4, $t4, 4
-    add $t4, $s3, $t4
-    l.s $f2, 0($t4)
-    mul $t5, $t3, 4
-    add $t5, $s2, $t5
-    l.s $f3, 0($t5)
-    mul.s $f4, $f2, $f3
-    sub.s $f1, $f1, $f4
-    addi $t3, $t3, 1
-    j gauss_back_loop_j
-gauss_back_calc_x:
-    mul $t6, $t1, $t0
-    add $t6, $t6, $t1
-    mul $t6, $t6, 4
-    add $t6, $s3, $t6
-    l.s $f5, 0($t6)
-    div.s $f6, $f1, $f5
-    mul $t7, $t1, 4
-    add $t7, $s2, $t7
-    s.s $f6, 0($t7)
-    addi $t1, $t1, -1
-    j gauss_back_loop_i
-gauss_back_end:
+    # Clear h and a
+    mtc1 $zero, $f10      # $f10 = 0.0
+    sll $t0, $s4, 2
+    add $t0, $s2, $t0     # $t0 = &h[M]
+    move $t1, $s2
+    move $t2, $s3
+lev_clear_loop:
+    s.s $f10, 0($t1)
+    s.s $f10, 0($t2)
+    addi $t1, $t1, 4
+    addi $t2, $t2, 4
+    blt $t1, $t0, lev_clear_loop
+    
+    l.s $f20, 0($s0)      # err = r[0]
+    c.le.s $f20, $f10     # zero-energy input: leave h = 0
+    bc1t lev_end
+    l.s $f22, float_one   # $f22 = 1.0
+    l.s $f21, levinson_tol
+    mul.s $f21, $f21, $f20 # $f21 = singular floor
+    
+    s.s $f22, 0($s3)      # a[0] = 1
+    l.s $f1, 0($s1)
+    div.s $f1, $f1, $f20
+    s.s $f1, 0($s2)       # h[0] = gamma_d[0] / r[0]
+    
+    li $t8, 1             # m = 1
+lev_order_loop:
+    bge $t8, $s4, lev_end
+    sll $t7, $t8, 2       # $t7 = 4m
+    
+    # delta = sum r[m-i] * a[i], eps = sum r[m-i] * h[i], i = 0..m-1
+    add $t0, $s0, $t7     # &r[m], walks down
+    move $t1, $s3         # &a[0], walks up
+    move $t2, $s2         # &h[0], walks up
+    add $t3, $s3, $t7     # &a[m] (end)
+    mov.s $f4, $f10       # delta = 0.0
+    mov.s $f5, $f10       # eps = 0.0
+lev_dot_loop:
+    l.s $f1, 0($t0)
+    l.s $f2, 0($t1)
+    l.s $f3, 0($t2)
+    mul.s $f2, $f1, $f2
+    add.s $f4, $f4, $f2
+    mul.s $f3, $f1, $f3
+    add.s $f5, $f5, $f3
+    addi $t0, $t0, -4
+    addi $t1, $t1, 4
+    addi $t2, $t2, 4
+    blt $t1, $t3, lev_dot_loop
+    
+    # Reflection coefficient k = -delta / err
+    div.s $f6, $f4, $f20
+    neg.s $f6, $f6
+    
+    # a[i], a[m-i] = a[i] + k*a[m-i], a[m-i] + k*a[i]
+    move $t0, $s3         # &a[i], walks up
+    add $t1, $s3, $t7     # &a[m-i], walks down
+lev_a_loop:
+    l.s $f1, 0($t0)
+    l.s $f2, 0($t1)
+    mul.s $f3, $f6, $f2
+    add.s $f3, $f1, $f3
+    mul.s $f7, $f6, $f1
+    add.s $f7, $f2, $f7
+    s.s $f3, 0($t0)
+    s.s $f7, 0($t1)       # same value when i == m-i
+    addi $t0, $t0, 4
+    addi $t1, $t1, -4
+    ble $t0, $t1, lev_a_loop
+    
+    # err *= 1 - k^2; stop if R_M is (numerically) singular
+    mul.s $f8, $f6, $f6
+    sub.s $f8, $f22, $f8
+    mul.s $f20, $f20, $f8
+    c.le.s $f20, $f21
+    bc1t lev_end
+    
+    # mu = (gamma_d[m] - eps) / err
+    add $t0, $s1, $t7
+    l.s $f1, 0($t0)
+    sub.s $f1, $f1, $f5
+    div.s $f9, $f1, $f20
+    
+    # h[i] += mu * a[m-i], i = 0..m
+    move $t0, $s2         # &h[i], walks up
+    add $t1, $s3, $t7     # &a[m-i], walks down
+    add $t2, $s2, $t7     # &h[m] (last)
+lev_h_loop:
+    l.s $f1, 0($t0)
+    l.s $f2, 0($t1)
+    mul.s $f2, $f9, $f2
+    add.s $f1, $f1, $f2
+    s.s $f1, 0($t0)
+    addi $t0, $t0, 4
+    addi $t1, $t1, -4
+    ble $t0, $t2, lev_h_loop
+    
+    addi $t8, $t8, 1
+    j lev_order_loop
+
+lev_end:
     lw $ra, 0($sp)
     lw $s0, 4($sp)
     lw $s1, 8($sp)
@@ -673,7 +599,8 @@ gauss_back_end:
 #-------------------------------------------------------------------
 # PROCEDURE: proc_convolve_same
 # Applies the FIR filter (h_opt) to the input signal.
-# y[n] = sum(h[k] * x[n-k] for k=0 to M-1)
+# y[n] = sum(h[k] * x[n-k] for k=0 to min(n, M-1))
+# &h[k] walks up and &x[n-k] walks down, so no index multiplies.
 # Side Effects:
 #   - Fills the `y_out_array` with the filtered signal.
 # Args:
@@ -698,33 +625,36 @@ proc_convolve_same:
     move $s3, $a3
     
     lw $s4, 24($sp)       # $s4 = M (Load 5th arg)
-    li $t0, 0
+    sll $t9, $s4, 2
+    add $t9, $s1, $t9     # $t9 = &h[M]
+    move $t0, $s0         # $t0 = &x[n]
+    move $t5, $s2         # $t5 = &y[n]
+    sll $t6, $s3, 2
+    add $t6, $s0, $t6     # $t6 = &x[N]
 conv_loop_n:
-    bge $t0, $s3, conv_end
-    l.s $f0, float_zero
-    li $t1, 0
+    mtc1 $zero, $f0       # acc = 0.0
+    move $t1, $s1         # $t1 = &h[k]
+    move $t2, $t0         # $t2 = &x[n-k]
+    # Taps end at &h[min(n+1, M)]
+    sub $t3, $t0, $s0
+    addi $t3, $t3, 4
+    add $t3, $s1, $t3     # &h[n+1]
+    ble $t3, $t9, conv_loop_k
+    move $t3, $t9
 conv_loop_k:
-    bge $t1, $s4, conv_n_store
-    sub $t2, $t0, $t1
-    blt $t2, $zero, conv_k_inc
-    mul $t3, $t1, 4
-    add $t3, $s1, $t3
-    l.s $f1, 0($t3)
-    mul $t4, $t2, 4
-    add $t4, $s0, $t4
-    l.s $f2, 0($t4)
+    l.s $f1, 0($t1)
+    l.s $f2, 0($t2)
     mul.s $f3, $f1, $f2
     add.s $f0, $f0, $f3
-conv_k_inc:
-    addi $t1, $t1, 1
-    j conv_loop_k
-conv_n_store:
-    mul $t5, $t0, 4
-    add $t5, $s2, $t5
+    addi $t1, $t1, 4
+    addi $t2, $t2, -4
+    blt $t1, $t3, conv_loop_k
+    
     s.s $f0, 0($t5)
-    addi $t0, $t0, 1
-    j conv_loop_n
-conv_end:
+    addi $t5, $t5, 4
+    addi $t0, $t0, 4
+    blt $t0, $t6, conv_loop_n
+    
     lw $ra, 0($sp)
     lw $s0, 4($sp)
     lw $s1, 8($sp)
@@ -736,41 +666,33 @@ conv_end:
 
 #-------------------------------------------------------------------
 # PROCEDURE: proc_calc_mmse
+# Leaf procedure.
+# Args:
+#   $a0: &desired_signal
+#   $a1: &y_out_array
+#   $a2: N
+# Returns:
+#   $f0: mean((d[n] - y[n])^2)
 #-------------------------------------------------------------------
 proc_calc_mmse:
-    addi $sp, $sp, -16
-    sw $ra, 0($sp)
-    sw $s0, 4($sp)
-    sw $s1, 8($sp)
-    sw $s2, 12($sp)
-
-    move $s0, $a0
-    move $s1, $a1
-    move $s2, $a2
-    
-    li $t0, 0
-    l.s $f0, float_zero
+    mtc1 $zero, $f0       # sum = 0.0
+    move $t0, $a0         # &d[n]
+    move $t1, $a1         # &y[n]
+    sll $t2, $a2, 2
+    add $t2, $a0, $t2     # &d[N] (end)
 mmse_loop:
-    bge $t0, $s2, mmse_calc_mean
-    mul $t1, $t0, 4
-    add $t2, $s0, $t1
-    add $t3, $s1, $t1
-    l.s $f1, 0($t2)
-    l.s $f2, 0($t3)
+    l.s $f1, 0($t0)
+    l.s $f2, 0($t1)
     sub.s $f3, $f1, $f2
     mul.s $f4, $f3, $f3
     add.s $f0, $f0, $f4
-    addi $t0, $t0, 1
-    j mmse_loop
-mmse_calc_mean:
-    mtc1 $s2, $f1
+    addi $t0, $t0, 4
+    addi $t1, $t1, 4
+    blt $t0, $t2, mmse_loop
+    
+    mtc1 $a2, $f1
     cvt.s.w $f1, $f1
     div.s $f0, $f0, $f1
-    lw $ra, 0($sp)
-    lw $s0, 4($sp)
-    lw $s1, 8($sp)
-    lw $s2, 12($sp)
-    addi $sp, $sp, 16
     jr $ra
     
 #-------------------------------------------------------------------
@@ -778,4 +700,4 @@ mmse_calc_mean:
 #-------------------------------------------------------------------
 proc_exit:
     li $v0, 10
-    syscall
\ No newline at end of file
+    syscall
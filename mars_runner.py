@@ -0,0 +1,219 @@
+import numpy as np
+import os
+import re
+import sys
+import glob
+import time
+import shutil
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from signal_io import load_signal, signal_path
+from test import M, compute_case, format_output
+from wiener32 import asm_round, wiener32
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+MARS_JAR = os.path.join(ROOT_DIR, "Mars4_5.jar")
+ASM_FILE = os.path.join(ROOT_DIR, "main.asm")
+
+# MARS command-line options:
+#   nc   no copyright banner        ic   print executed instruction count
+#   se1  exit 1 on simulation error ae1  exit 1 on assembly error
+MARS_OPTIONS = ["nc", "ic", "se1", "ae1"]
+
+# Upper bound on simulated instructions, guards against runaway loops
+MAX_STEPS = 100000000
+
+# Largest deviation of a 1-decimal output that is one rounding step off
+# (reported as ROUNDING, not PASS)
+OUTPUT_TOLERANCE = 0.1 + 1e-6
+
+# Statuses that make the run exit non-zero
+FAILED_STATUSES = ('FAIL', 'ROUNDING', 'ERROR')
+
+
+def mars_command(java="java", jar=MARS_JAR, asm=ASM_FILE, max_steps=MAX_STEPS):
+    """Command line that runs main.asm headless in MARS."""
+    return [java, "-jar", jar] + MARS_OPTIONS + [str(max_steps), asm]
+
+
+def mars_stdin(desired_signal, input_signal, M=M):
+    """
+    stdin for main.asm: a header of N and M (syscall 5, read_int), then
+    one line per value for syscall 6 (read_float), desired signal first,
+    then the input signal (see proc_read_stdin).
+    """
+    values = np.concatenate((desired_signal, input_signal))
+    header = f"{desired_signal.shape[0]}\n{M}\n"
+    return header + "\n".join(repr(float(v)) for v in values) + "\n"
+
+
+def parse_mars_output(stdout):
+    """
+    Parses 'Filtered output:', 'MMSE:' and the instruction count that the
+    'ic' option prints after the program output.
+    Returns (output array or None, mmse or None, instruction count or None).
+    """
+    output_signal = None
+    mmse = None
+    count = None
+    for line in stdout.splitlines():
+        line = line.strip()
+        if line.startswith("Filtered output:"):
+            output_signal = np.array(line.split(":", 1)[1].split(), dtype=float)
+        elif line.startswith("MMSE:"):
+            mmse = float(line.split(":", 1)[1])
+        elif re.fullmatch(r"\d+", line) and mmse is not None:
+            count = int(line)
+    return output_signal, mmse, count
+
+
+def run_mars_case(folder_path, command, M=M, timeout=600):
+    """
+    Runs main.asm on one test folder and compares its output with the
+    Python model. Returns a result dict.
+    """
+    result = {'name': os.path.basename(folder_path), 'status': 'ERROR', 'message': '',
+              'wall_time': None, 'instructions': None, 'max_diff': None}
+
+    try:
+        desired_signal = load_signal(signal_path(folder_path, "desired"))
+        input_signal = load_signal(signal_path(folder_path, "input"))
+    except (IOError, ValueError) as e:
+        result['message'] = f"Error loading files: {e}"
+        return result
+    if desired_signal.shape != input_signal.shape:
+        result['status'] = 'SKIP'
+        result['message'] = "size not match"
+        return result
+
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(command, input=mars_stdin(desired_signal, input_signal, M),
+                              capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        result['message'] = f"timed out after {timeout} s"
+        return result
+    except OSError as e:
+        result['message'] = f"cannot start MARS: {e}"
+        return result
+    result['wall_time'] = time.perf_counter() - start
+
+    result['instructions'] = parse_mars_output(proc.stdout)[2]
+    if proc.returncode != 0:
+        detail = (proc.stderr or proc.stdout).strip().splitlines()
+        result['message'] = f"MARS exit {proc.returncode}: {detail[-1] if detail else 'no output'}"
+        return result
+
+    result.update(check_output(desired_signal, input_signal, proc.stdout, M))
+    return result
+
+
+def check_output(desired_signal, input_signal, stdout, M=M):
+    """
+    Compares main.asm's stdout with the Python model, formatted the way
+    run_test_case does, and with the float32 model (wiener32), which
+    reproduces the program's arithmetic and rounding and so must print
+    the very same values. Output within one rounding step of the float64
+    model that still differs from the float32 one is 'ROUNDING'. Returns a
+    dict with 'status', 'message', 'max_diff' (largest deviation from the
+    model rounded to 1 decimal) and 'exact32'.
+    """
+    result = {'status': 'ERROR', 'message': '', 'max_diff': None, 'exact32': None}
+    program_out, program_mmse, _ = parse_mars_output(stdout)
+    if program_out is None or program_mmse is None:
+        lines = stdout.strip().splitlines()
+        result['message'] = f"no result printed: {lines[-1] if lines else 'no output'}"
+        return result
+
+    # Reference: the Python model
+    _, ref_out, ref_mmse = compute_case(desired_signal, input_signal, M, quiet=True,
+                                        log=lambda *args: None)
+    ref_str = format_output(ref_out)
+    program_str = format_output(program_out)
+
+    if program_out.shape != ref_out.shape:
+        result['status'] = 'FAIL'
+        result['message'] = f"printed {program_out.shape[0]} values, expected {ref_out.shape[0]}"
+        return result
+
+    _, out32, mmse32, _ = wiener32(desired_signal, input_signal, M)
+    result['exact32'] = bool(np.array_equal(asm_round(out32), program_out.astype(np.float32))
+                             and asm_round(np.array([mmse32]))[0] == np.float32(program_mmse))
+
+    result['max_diff'] = float(np.max(np.abs(program_out - np.round(ref_out, 1))))
+    mmse_match = f"{program_mmse:.1f}" == f"{ref_mmse:.1f}"
+    if program_str == ref_str and mmse_match:
+        result['status'] = 'PASS'
+    elif result['exact32']:
+        # float64 lands on the other side of a rounding edge, float32 agrees exactly
+        result['status'] = 'PASS'
+        result['message'] = "matches the float32 model exactly"
+    elif result['max_diff'] <= OUTPUT_TOLERANCE and abs(program_mmse - ref_mmse) <= OUTPUT_TOLERANCE:
+        # Close, but diverges from the float32 model that must match exactly
+        result['status'] = 'ROUNDING'
+        result['message'] = (f"one rounding step off: max diff {result['max_diff']:.1f}, "
+                             f"MMSE {program_mmse:.1f} vs {ref_mmse:.1f}")
+    else:
+        result['status'] = 'FAIL'
+        result['message'] = (f"\n  Python output: {ref_str}  MMSE: {ref_mmse:.1f}"
+                             f"\n  Program output: {program_str}  MMSE: {program_mmse:.1f}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run main.asm in MARS on every test case and compare with the Python model.")
+    parser.add_argument("--tests", default=os.path.join("tests", "test_*"),
+                        help="Glob for test folders (default: tests/test_*)")
+    parser.add_argument("-j", "--workers", type=int, default=0,
+                        help="Concurrent MARS processes (0 = all cores)")
+    parser.add_argument("-M", type=int, default=M, help=f"Filter length of the reference model (default: {M})")
+    parser.add_argument("--java", default="java", help="Java executable")
+    parser.add_argument("--jar", default=MARS_JAR, help="Path to Mars4_5.jar")
+    parser.add_argument("--asm", default=ASM_FILE, help="Assembly program to run")
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS,
+                        help="Instruction limit passed to MARS")
+    parser.add_argument("--timeout", type=float, default=600, help="Per-case timeout in seconds")
+    args = parser.parse_args()
+
+    if shutil.which(args.java) is None and not os.path.exists(args.java):
+        print(f"Error: Java executable '{args.java}' not found.")
+        return 1
+    if not os.path.exists(args.jar):
+        print(f"Error: MARS jar '{args.jar}' not found.")
+        return 1
+
+    test_folders = [f for f in sorted(glob.glob(args.tests)) if os.path.isdir(f)]
+    if not test_folders:
+        print(f"No test folders found matching '{args.tests}'.")
+        return 1
+
+    command = mars_command(args.java, args.jar, args.asm, args.max_steps)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    print(f"Running {len(test_folders)} cases in MARS with {workers} workers: {' '.join(command)}")
+
+    # MARS runs in its own JVM, so threads are enough to keep the cores busy
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda f: run_mars_case(f, command, args.M, args.timeout), test_folders))
+    wall_time = time.perf_counter() - start
+
+    print(f"\n{'Case':<12}{'Status':<8}{'Wall (s)':>10}{'Instructions':>14}{'Max diff':>10}")
+    for r in results:
+        wall = f"{r['wall_time']:.3f}" if r['wall_time'] is not None else "-"
+        count = str(r['instructions']) if r['instructions'] is not None else "-"
+        diff = f"{r['max_diff']:.2f}" if r['max_diff'] is not None else "-"
+        print(f"{r['name']:<12}{r['status']:<8}{wall:>10}{count:>14}{diff:>10}  {r['message']}")
+
+    counts = {}
+    for r in results:
+        counts[r['status']] = counts.get(r['status'], 0) + 1
+    print(f"\n {', '.join(f'{k}: {v}' for k, v in sorted(counts.items()))}")
+    print(f" Wall time: {wall_time:.2f} s")
+
+    failed = any(r['status'] in FAILED_STATUSES for r in results)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,971 @@
+import numpy as np
+import os
+import re
+import sys
+import glob
+import math
+import time
+import struct
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from mars_runner import ASM_FILE, FAILED_STATUSES, MAX_STEPS, check_output, mars_stdin
+from signal_io import load_signal, signal_path
+from test import M
+from wiener32 import java_float_str, wiener32
+
+# MARS default memory layout (compact configurations are not supported)
+TEXT_BASE = 0x00400000
+DATA_BASE = 0x10010000
+HEAP_BASE = 0x10040000
+GP_INIT = 0x10008000
+SP_INIT = 0x7fffeffc
+STACK_SIZE = 1 << 20
+
+REGISTERS = {name: i for i, name in enumerate(
+    ["zero", "at", "v0", "v1", "a0", "a1", "a2", "a3",
+     "t0", "t1", "t2", "t3", "t4", "t5", "t6", "t7",
+     "s0", "s1", "s2", "s3", "s4", "s5", "s6", "s7",
+     "t8", "t9", "k0", "k1", "gp", "sp", "fp", "ra"])}
+
+_WORD = struct.Struct('<i')
+_UWORD = struct.Struct('<I')
+_FLOAT = struct.Struct('<f')
+
+
+class MipsError(Exception):
+    """Assembly or runtime error, reported with the offending source line."""
+
+
+def _s32(value):
+    """Wraps a Python int to a signed 32-bit register value."""
+    return ((value + 0x80000000) & 0xffffffff) - 0x80000000
+
+
+def _f32(value):
+    """Rounds a Python float to single precision."""
+    try:
+        return _FLOAT.unpack(_FLOAT.pack(value))[0]
+    except OverflowError:
+        return math.copysign(math.inf, value)
+
+
+def _bits_to_float(word):
+    return _FLOAT.unpack(_WORD.pack(word))[0]
+
+
+def _float_to_bits(value):
+    return _WORD.unpack(_FLOAT.pack(value))[0]
+
+
+def _fdiv(a, b):
+    if b == 0.0:
+        if a == 0.0 or a != a:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return _f32(a / b)
+
+
+# --- Memory ---
+
+class Memory:
+    """
+    Little-endian memory: one growable bytearray from DATA_BASE (static
+    data, then the sbrk heap at HEAP_BASE) and one for the stack below
+    SP_INIT. Word accesses must be aligned, as in MARS.
+    """
+
+    def __init__(self, image):
+        self.image = bytes(image)
+        self.data = bytearray(max(len(image), HEAP_BASE - DATA_BASE))
+        self.stack = bytearray(STACK_SIZE)
+        self.stack_base = (SP_INIT + 4) - STACK_SIZE
+        self.reset()
+
+    def reset(self):
+        """Restores the initial data image and empties heap and stack."""
+        self.data[HEAP_BASE - DATA_BASE:] = b''
+        self.data[:] = bytes(HEAP_BASE - DATA_BASE)
+        self.data[:len(self.image)] = self.image
+        self.stack[:] = bytes(STACK_SIZE)
+        self.heap_end = HEAP_BASE
+
+    def _locate(self, addr, size):
+        if addr >= self.stack_base:
+            offset = addr - self.stack_base
+            if offset + size <= STACK_SIZE:
+                return self.stack, offset
+        else:
+            offset = addr - DATA_BASE
+            if offset >= 0 and offset + size <= len(self.data):
+                return self.data, offset
+        raise MipsError(f"address 0x{addr & 0xffffffff:08x} out of range")
+
+    def _aligned(self, addr, size):
+        if addr % size:
+            raise MipsError(f"address 0x{addr & 0xffffffff:08x} not aligned on a {size}-byte boundary")
+        return self._locate(addr, size)
+
+    def load_word(self, addr):
+        buf, offset = self._aligned(addr, 4)
+        return _WORD.unpack_from(buf, offset)[0]
+
+    def store_word(self, addr, value):
+        buf, offset = self._aligned(addr, 4)
+        _UWORD.pack_into(buf, offset, value & 0xffffffff)
+
+    def load_float(self, addr):
+        buf, offset = self._aligned(addr, 4)
+        return _FLOAT.unpack_from(buf, offset)[0]
+
+    def store_float(self, addr, value):
+        buf, offset = self._aligned(addr, 4)
+        if value.__class__ is int:
+            _UWORD.pack_into(buf, offset, value & 0xffffffff)
+        else:
+            _FLOAT.pack_into(buf, offset, value)
+
+    def load_byte(self, addr):
+        buf, offset = self._locate(addr, 1)
+        return buf[offset]
+
+    def store_byte(self, addr, value):
+        buf, offset = self._locate(addr, 1)
+        buf[offset] = value & 0xff
+
+    def load_string(self, addr):
+        buf, offset = self._locate(addr, 1)
+        end = buf.index(0, offset)
+        return buf[offset:end].decode('latin-1')
+
+    def sbrk(self, size):
+        """Grows the heap by size bytes (word aligned) and returns its old end."""
+        start = self.heap_end
+        self.heap_end += (size + 3) & ~3
+        needed = self.heap_end - DATA_BASE
+        if needed > len(self.data):
+            self.data.extend(bytes(needed - len(self.data)))
+        return start
+
+
+# --- Assembler ---
+
+class Statement:
+    """One source instruction: mnemonic, operand strings and location."""
+
+    def __init__(self, mnemonic, args, line):
+        self.mnemonic = mnemonic
+        self.args = args
+        self.line = line
+
+
+def _strip_comment(line):
+    in_string = False
+    for i, c in enumerate(line):
+        if c == '"' and (i == 0 or line[i - 1] != '\\'):
+            in_string = not in_string
+        elif c == '#' and not in_string:
+            return line[:i]
+    return line
+
+
+def _split_args(text):
+    return [a.strip() for a in text.split(',')] if text.strip() else []
+
+
+def _unescape(text):
+    return text.encode('latin-1').decode('unicode_escape').encode('latin-1')
+
+
+def _reg(token):
+    name = token.strip().lstrip('$')
+    if name in REGISTERS:
+        return REGISTERS[name]
+    if name.isdigit() and int(name) < 32:
+        return int(name)
+    raise MipsError(f"bad register '{token}'")
+
+
+def _freg(token):
+    name = token.strip().lstrip('$')
+    if name.startswith('f') and name[1:].isdigit() and int(name[1:]) < 32:
+        return int(name[1:])
+    raise MipsError(f"bad FPU register '{token}'")
+
+
+def _is_reg(token):
+    return token.strip().startswith('$')
+
+
+def _imm(token):
+    token = token.strip()
+    if len(token) == 3 and token[0] == token[2] == "'":
+        return ord(token[1])
+    return int(token, 0)
+
+
+def _fits16(value):
+    return -0x8000 <= value < 0x8000
+
+
+def assemble(source):
+    """
+    Parses MIPS source into (statements, data image, symbols).
+    symbols maps data labels to addresses and text labels to statement
+    indices (tagged ('text', index)).
+    """
+    data = bytearray()
+    symbols = {}
+    data_fixups = []
+    statements = []
+    segment = 'text'
+    # Data labels bind after the directive's alignment, as in MARS
+    pending = []
+
+    for lineno, raw in enumerate(source.splitlines(), 1):
+        line = _strip_comment(raw).strip()
+        while True:
+            match = re.match(r'^([A-Za-z_.$][\w.$]*)\s*:(.*)$', line)
+            if not match:
+                break
+            label, line = match.group(1), match.group(2).strip()
+            if label in symbols:
+                raise MipsError(f"line {lineno}: label '{label}' defined twice")
+            symbols[label] = None
+            if segment == 'data':
+                pending.append(label)
+            else:
+                symbols[label] = ('text', len(statements))
+        if not line:
+            continue
+
+        parts = line.split(None, 1)
+        head = parts[0]
+        rest = parts[1].strip() if len(parts) > 1 else ""
+
+        if pending and not (head in ('.word', '.float', '.half', '.align')):
+            for label in pending:
+                symbols[label] = DATA_BASE + len(data)
+            pending = []
+
+        if head.startswith('.'):
+            if head == '.data':
+                segment = 'data'
+            elif head == '.text':
+                segment = 'text'
+            elif head in ('.globl', '.global', '.extern', '.eqv', '.set'):
+                pass
+            elif segment != 'data':
+                raise MipsError(f"line {lineno}: directive {head} outside .data")
+            elif head == '.align':
+                size = 1 << int(rest, 0)
+                data.extend(bytes(-len(data) % size))
+            elif head == '.space':
+                data.extend(bytes(int(rest, 0)))
+            elif head in ('.asciiz', '.ascii'):
+                text = re.fullmatch(r'"(.*)"', rest)
+                if not text:
+                    raise MipsError(f"line {lineno}: bad string {rest}")
+                data.extend(_unescape(text.group(1)))
+                if head == '.asciiz':
+                    data.append(0)
+            elif head in ('.word', '.float', '.byte', '.half'):
+                size = {'.word': 4, '.float': 4, '.byte': 1, '.half': 2}[head]
+                data.extend(bytes(-len(data) % size))
+                for label in pending:
+                    symbols[label] = DATA_BASE + len(data)
+                pending = []
+                for value in _split_args(rest):
+                    if head == '.float':
+                        data.extend(_FLOAT.pack(float(value)))
+                    elif head == '.word' and not re.match(r"^[-+]?(\d|'|0x)", value):
+                        data_fixups.append((len(data), value, lineno))
+                        data.extend(bytes(4))
+                    else:
+                        fmt = {1: '<B', 2: '<H', 4: '<I'}[size]
+                        data.extend(struct.pack(fmt, _imm(value) & ((1 << 8 * size) - 1)))
+            else:
+                raise MipsError(f"line {lineno}: unsupported directive {head}")
+            continue
+
+        if segment != 'text':
+            raise MipsError(f"line {lineno}: instruction in .data")
+        statements.append(Statement(head, _split_args(rest), lineno))
+
+    for label in pending:
+        symbols[label] = DATA_BASE + len(data)
+
+    for offset, label, lineno in data_fixups:
+        if label not in symbols:
+            raise MipsError(f"line {lineno}: undefined label '{label}'")
+        target = symbols[label]
+        address = TEXT_BASE + 4 * target[1] if isinstance(target, tuple) else target
+        data[offset:offset + 4] = _UWORD.pack(address)
+    return statements, data, symbols
+
+
+# --- Instruction table ---
+
+# Integer ALU operations: (register-form function, MARS basic instructions
+# when the last operand is an immediate that fits / needs 32 bits)
+_ALU = {
+    'add': (lambda a, b: _s32(a + b), 1, 3), 'addu': (lambda a, b: _s32(a + b), 1, 3),
+    'sub': (lambda a, b: _s32(a - b), 2, 3), 'subu': (lambda a, b: _s32(a - b), 2, 3),
+    'mul': (lambda a, b: _s32(a * b), 2, 3),
+    'and': (lambda a, b: a & b, 1, 3), 'or': (lambda a, b: a | b, 1, 3),
+    'xor': (lambda a, b: a ^ b, 1, 3), 'nor': (lambda a, b: ~(a | b), 1, 3),
+    'slt': (lambda a, b: int(a < b), 1, 3),
+    'sltu': (lambda a, b: int((a & 0xffffffff) < (b & 0xffffffff)), 1, 3),
+    'sllv': (lambda a, b: _s32(a << (b & 31)), 1, 1),
+    'srlv': (lambda a, b: _s32((a & 0xffffffff) >> (b & 31)), 1, 1),
+    'srav': (lambda a, b: a >> (b & 31), 1, 1),
+}
+_ALU_IMM = {'addi': 'add', 'addiu': 'addu', 'andi': 'and', 'ori': 'or', 'xori': 'xor',
+            'slti': 'slt', 'sltiu': 'sltu'}
+_SHIFT = {'sll': 'sllv', 'srl': 'srlv', 'sra': 'srav'}
+
+_BRANCH = {
+    'beq': lambda a, b: a == b, 'bne': lambda a, b: a != b,
+    'blt': lambda a, b: a < b, 'bge': lambda a, b: a >= b,
+    'bgt': lambda a, b: a > b, 'ble': lambda a, b: a <= b,
+    'bltu': lambda a, b: (a & 0xffffffff) < (b & 0xffffffff),
+    'bgeu': lambda a, b: (a & 0xffffffff) >= (b & 0xffffffff),
+}
+_BRANCH_ZERO = {'beqz': 'beq', 'bnez': 'bne', 'bltz': 'blt', 'bgez': 'bge',
+                'bgtz': 'bgt', 'blez': 'ble'}
+
+_FPU = {
+    'add.s': lambda a, b: _f32(a + b), 'sub.s': lambda a, b: _f32(a - b),
+    'mul.s': lambda a, b: _f32(a * b), 'div.s': _fdiv,
+}
+_FPU_UNARY = {
+    'mov.s': lambda a: a, 'neg.s': lambda a: -a, 'abs.s': abs,
+    'sqrt.s': lambda a: _f32(math.sqrt(a)) if a >= 0 else math.nan,
+}
+_FPU_COMPARE = {'c.eq.s': lambda a, b: a == b, 'c.lt.s': lambda a, b: a < b,
+                'c.le.s': lambda a, b: a <= b}
+
+
+class Program:
+    """
+    main.asm (or any program in the supported subset) decoded once into a
+    table of Python closures, one per source statement. run() resets the
+    machine state in place, so one Program serves any number of cases.
+
+    Supported: MIPS32 integer ALU/shift/branch/jump/load/store, the common
+    pseudo-instructions (li, la, move, bge, blt, mul with an immediate,
+    ...), the single-precision FPU subset (l.s, s.s, add/sub/mul/div/mov/
+    neg/abs/sqrt.s, cvt.s.w, cvt.w.s, mtc1, mfc1, c.eq/lt/le.s, bc1t/f)
+    and syscalls 1, 2, 4, 5, 6, 9, 10, 11.
+    """
+
+    def __init__(self, source, filename="<asm>"):
+        self.filename = filename
+        self.statements, image, self.symbols = assemble(source)
+        self.memory = Memory(image)
+        self.regs = [0] * 32
+        self.fregs = [0.0] * 32
+        self.flag = [False]
+        self.io = {'stdin': [], 'pos': 0, 'out': []}
+
+        self.table = []
+        self.weights = []      # MARS basic instructions per statement
+        self.loads = []        # memory reads per execution
+        self.stores = []       # memory writes per execution
+        for index, stmt in enumerate(self.statements):
+            try:
+                op, weight, loads, stores = self._compile(stmt, index)
+            except MipsError as e:
+                raise MipsError(f"{filename}:{stmt.line}: {e}") from None
+            except (ValueError, IndexError):
+                raise MipsError(f"{filename}:{stmt.line}: bad operands for "
+                                f"{stmt.mnemonic} {', '.join(stmt.args)}") from None
+            self.table.append(op)
+            self.weights.append(weight)
+            self.loads.append(loads)
+            self.stores.append(stores)
+
+        entry = self.symbols.get('main', ('text', 0))
+        self.entry = entry[1] if isinstance(entry, tuple) else 0
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r') as f:
+            return cls(f.read(), path)
+
+    # Operand helpers used while compiling
+
+    def _target(self, label):
+        target = self.symbols.get(label)
+        if not isinstance(target, tuple):
+            raise MipsError(f"undefined text label '{label}'")
+        return target[1]
+
+    def _address(self, token):
+        """Address of a data label, 'label+off' or a text label."""
+        match = re.fullmatch(r'([A-Za-z_.$][\w.$]*)\s*(?:([+-])\s*(\w+))?', token.strip())
+        if not match or match.group(1) not in self.symbols:
+            raise MipsError(f"undefined label '{token}'")
+        target = self.symbols[match.group(1)]
+        address = TEXT_BASE + 4 * target[1] if isinstance(target, tuple) else target
+        if match.group(2):
+            offset = _imm(match.group(3))
+            address += offset if match.group(2) == '+' else -offset
+        return address
+
+    def _mem_operand(self, token):
+        """(base register or None, offset, basic instructions) of a load/store operand."""
+        match = re.fullmatch(r'(.*?)\(\s*(\$\w+)\s*\)', token.strip())
+        if match:
+            offset_text = match.group(1).strip()
+            base = _reg(match.group(2))
+            if not offset_text:
+                return base, 0, 1
+            try:
+                offset = _imm(offset_text)
+            except ValueError:
+                return base, self._address(offset_text), 3
+            return base, offset, 1 if _fits16(offset) else 3
+        try:
+            return None, _imm(token), 2
+        except ValueError:
+            return None, self._address(token), 2
+
+    def _compile(self, stmt, index):
+        """Returns (closure, basic instruction count, loads, stores) for a statement."""
+        r = self.regs
+        f = self.fregs
+        flag = self.flag
+        mem = self.memory
+        op = stmt.mnemonic
+        a = stmt.args
+        nxt = index + 1
+
+        if op == 'nop':
+            return (lambda pc: pc + 1), 1, 0, 0
+
+        if op == 'syscall':
+            return self._syscall, 1, 0, 0
+
+        # Integer loads and stores
+        if op in ('lw', 'sw', 'lb', 'lbu', 'sb', 'l.s', 's.s', 'lwc1', 'swc1'):
+            base, offset, weight = self._mem_operand(a[1])
+            fpu = op in ('l.s', 's.s', 'lwc1', 'swc1')
+            rt = _freg(a[0]) if fpu else _reg(a[0])
+            if base is None:
+                base = 0            # r[0] is always zero
+            if op == 'lw':
+                load = mem.load_word
+                def lw(pc):
+                    if rt:
+                        r[rt] = load(r[base] + offset)
+                    return pc + 1
+                return lw, weight, 1, 0
+            if op in ('lb', 'lbu'):
+                load = mem.load_byte
+                signed = op == 'lb'
+                def lb(pc):
+                    value = load(r[base] + offset)
+                    if signed and value > 127:
+                        value -= 256
+                    if rt:
+                        r[rt] = value
+                    return pc + 1
+                return lb, weight, 1, 0
+            if op == 'sw':
+                store = mem.store_word
+                def sw(pc):
+                    store(r[base] + offset, r[rt])
+                    return pc + 1
+                return sw, weight, 0, 1
+            if op == 'sb':
+                store = mem.store_byte
+                def sb(pc):
+                    store(r[base] + offset, r[rt])
+                    return pc + 1
+                return sb, weight, 0, 1
+            if op in ('l.s', 'lwc1'):
+                load = mem.load_float
+                def ls(pc):
+                    f[rt] = load(r[base] + offset)
+                    return pc + 1
+                return ls, weight, 1, 0
+            store = mem.store_float
+            def ss(pc):
+                store(r[base] + offset, f[rt])
+                return pc + 1
+            return ss, weight, 0, 1
+
+        # Pseudo-instructions
+        if op == 'li':
+            rd, value = _reg(a[0]), _s32(_imm(a[1]))
+            def li(pc):
+                if rd:
+                    r[rd] = value
+                return pc + 1
+            return li, 1 if _fits16(value) or 0 <= value < 0x10000 else 2, 0, 0
+        if op == 'la':
+            rd = _reg(a[0])
+            base, value, _ = self._mem_operand(a[1])
+            if base is None:
+                def la(pc):
+                    if rd:
+                        r[rd] = value
+                    return pc + 1
+            else:
+                def la(pc):
+                    if rd:
+                        r[rd] = _s32(r[base] + value)
+                    return pc + 1
+            return la, 2, 0, 0
+        if op == 'lui':
+            rd, value = _reg(a[0]), _s32(_imm(a[1]) << 16)
+            def lui(pc):
+                if rd:
+                    r[rd] = value
+                return pc + 1
+            return lui, 1, 0, 0
+        if op in ('move', 'neg', 'negu', 'not'):
+            rd, rs = _reg(a[0]), _reg(a[1])
+            fn = {'move': lambda v: v, 'neg': lambda v: _s32(-v),
+                  'negu': lambda v: _s32(-v), 'not': lambda v: ~v}[op]
+            def unary(pc):
+                if rd:
+                    r[rd] = fn(r[rs])
+                return pc + 1
+            return unary, 1, 0, 0
+
+        # Integer ALU, register or immediate forms
+        if op in _ALU_IMM or op in _SHIFT or op in _ALU:
+            name = _ALU_IMM.get(op) or _SHIFT.get(op) or op
+            fn, imm_weight, wide_weight = _ALU[name]
+            if len(a) == 2:
+                a = [a[0]] + a         # 'add $t0, $t1' means add $t0, $t0, $t1
+            rd, rs = _reg(a[0]), _reg(a[1])
+            if _is_reg(a[2]):
+                rt = _reg(a[2])
+                if op == 'mul' or name == 'mul':
+                    def alu(pc):
+                        if rd:
+                            r[rd] = _s32(r[rs] * r[rt])
+                        return pc + 1
+                elif name in ('add', 'addu'):
+                    def alu(pc):
+                        if rd:
+                            r[rd] = _s32(r[rs] + r[rt])
+                        return pc + 1
+                else:
+                    def alu(pc):
+                        if rd:
+                            r[rd] = fn(r[rs], r[rt])
+                        return pc + 1
+                return alu, 1, 0, 0
+            value = _imm(a[2])
+            if op in _SHIFT:
+                value &= 31
+                weight = 1
+            elif op in _ALU_IMM:
+                weight = 1 if _fits16(value) or (name in ('and', 'or', 'xor') and 0 <= value < 0x10000) else 3
+            else:
+                weight = imm_weight if _fits16(value) else wide_weight
+            value = _s32(value)
+            if name in ('add', 'addu'):
+                def alui(pc):
+                    if rd:
+                        r[rd] = _s32(r[rs] + value)
+                    return pc + 1
+            else:
+                def alui(pc):
+                    if rd:
+                        r[rd] = fn(r[rs], value)
+                    return pc + 1
+            return alui, weight, 0, 0
+
+        if op in ('mult', 'multu', 'div', 'divu') and len(a) == 2:
+            rs, rt = _reg(a[0]), _reg(a[1])
+            hilo = self.io.setdefault('hilo', [0, 0])
+            unsigned = op.endswith('u')
+            def muldiv(pc):
+                x, y = r[rs], r[rt]
+                if unsigned:
+                    x, y = x & 0xffffffff, y & 0xffffffff
+                if op.startswith('mult'):
+                    product = x * y
+                    hilo[0], hilo[1] = _s32(product >> 32), _s32(product)
+                elif y != 0:
+                    q = abs(x) // abs(y) * (1 if (x < 0) == (y < 0) else -1)
+                    hilo[0], hilo[1] = _s32(x - q * y), _s32(q)
+                return pc + 1
+            return muldiv, 1, 0, 0
+        if op in ('mfhi', 'mflo'):
+            rd = _reg(a[0])
+            hilo = self.io.setdefault('hilo', [0, 0])
+            slot = 0 if op == 'mfhi' else 1
+            def mf(pc):
+                if rd:
+                    r[rd] = hilo[slot]
+                return pc + 1
+            return mf, 1, 0, 0
+
+        # Branches and jumps
+        if op in _BRANCH or op in _BRANCH_ZERO:
+            cond = _BRANCH[_BRANCH_ZERO.get(op, op)]
+            if op in _BRANCH_ZERO:
+                a = [a[0], '$zero', a[1]]
+            rs, target = _reg(a[0]), self._target(a[2])
+            if _is_reg(a[1]):
+                rt = _reg(a[1])
+                weight = 1 if op in ('beq', 'bne') or op in _BRANCH_ZERO else 2
+                if op == 'bge':
+                    def branch(pc):
+                        return target if r[rs] >= r[rt] else pc + 1
+                elif op == 'blt':
+                    def branch(pc):
+                        return target if r[rs] < r[rt] else pc + 1
+                else:
+                    def branch(pc):
+                        return target if cond(r[rs], r[rt]) else pc + 1
+            else:
+                value = _s32(_imm(a[1]))
+                weight = 2 if op in ('beq', 'bne') else 3
+                def branch(pc):
+                    return target if cond(r[rs], value) else pc + 1
+            return branch, weight, 0, 0
+        if op in ('j', 'b'):
+            target = self._target(a[0])
+            return (lambda pc: target), 1, 0, 0
+        if op == 'jal':
+            target = self._target(a[0])
+            ret = TEXT_BASE + 4 * nxt
+            def jal(pc):
+                r[31] = ret
+                return target
+            return jal, 1, 0, 0
+        if op in ('jr', 'jalr'):
+            rs = _reg(a[-1])
+            link = _reg(a[0]) if op == 'jalr' and len(a) == 2 else (31 if op == 'jalr' else None)
+            ret = TEXT_BASE + 4 * nxt
+            def jr(pc):
+                target = r[rs] - TEXT_BASE
+                if link:
+                    r[link] = ret
+                if target & 3 or not 0 <= target < 4 * len(self.table) + 4:
+                    raise MipsError(f"jump to invalid address 0x{r[rs] & 0xffffffff:08x}")
+                return target >> 2
+            return jr, 1, 0, 0
+
+        # FPU
+        if op in _FPU:
+            fd, fs, ft = _freg(a[0]), _freg(a[1]), _freg(a[2])
+            fn = _FPU[op]
+            def fpu(pc):
+                x, y = f[fs], f[ft]
+                if x.__class__ is int:
+                    x = _bits_to_float(x)
+                if y.__class__ is int:
+                    y = _bits_to_float(y)
+                f[fd] = fn(x, y)
+                return pc + 1
+            return fpu, 1, 0, 0
+        if op in _FPU_UNARY:
+            fd, fs = _freg(a[0]), _freg(a[1])
+            fn = _FPU_UNARY[op]
+            def fpu1(pc):
+                x = f[fs]
+                f[fd] = x if op == 'mov.s' else fn(_bits_to_float(x) if x.__class__ is int else x)
+                return pc + 1
+            return fpu1, 1, 0, 0
+        if op in _FPU_COMPARE:
+            fs, ft = _freg(a[-2]), _freg(a[-1])
+            fn = _FPU_COMPARE[op]
+            def compare(pc):
+                x, y = f[fs], f[ft]
+                if x.__class__ is int:
+                    x = _bits_to_float(x)
+                if y.__class__ is int:
+                    y = _bits_to_float(y)
+                flag[0] = fn(x, y)
+                return pc + 1
+            return compare, 1, 0, 0
+        if op in ('bc1t', 'bc1f'):
+            target = self._target(a[-1])
+            want = op == 'bc1t'
+            def bc1(pc):
+                return target if flag[0] == want else pc + 1
+            return bc1, 1, 0, 0
+        if op == 'cvt.s.w':
+            fd, fs = _freg(a[0]), _freg(a[1])
+            def cvt_s_w(pc):
+                x = f[fs]
+                f[fd] = _f32(float(x if x.__class__ is int else _float_to_bits(x)))
+                return pc + 1
+            return cvt_s_w, 1, 0, 0
+        if op == 'cvt.w.s':
+            fd, fs = _freg(a[0]), _freg(a[1])
+            def cvt_w_s(pc):
+                x = f[fs]
+                if x.__class__ is int:
+                    x = _bits_to_float(x)
+                # Java (int) cast, as MARS does: truncate, NaN -> 0, saturate
+                if x != x:
+                    f[fd] = 0
+                else:
+                    f[fd] = max(-0x80000000, min(0x7fffffff, int(x) if not math.isinf(x)
+                                                 else (0x7fffffff if x > 0 else -0x80000000)))
+                return pc + 1
+            return cvt_w_s, 1, 0, 0
+        if op in ('mtc1', 'mfc1'):
+            rt, fs = _reg(a[0]), _freg(a[1])
+            if op == 'mtc1':
+                def mtc1(pc):
+                    f[fs] = r[rt]
+                    return pc + 1
+                return mtc1, 1, 0, 0
+            def mfc1(pc):
+                x = f[fs]
+                if rt:
+                    r[rt] = x if x.__class__ is int else _float_to_bits(x)
+                return pc + 1
+            return mfc1, 1, 0, 0
+
+        raise MipsError(f"unsupported instruction '{op}'")
+
+    def _syscall(self, pc):
+        r = self.regs
+        f = self.fregs
+        io = self.io
+        service = r[2]
+        if service == 2:
+            x = f[12]
+            io['out'].append(java_float_str(_bits_to_float(x) if x.__class__ is int else x))
+        elif service == 4:
+            io['out'].append(self.memory.load_string(r[4]))
+        elif service == 11:
+            io['out'].append(chr(r[4] & 0xff))
+        elif service == 1:
+            io['out'].append(str(r[4]))
+        elif service in (5, 6):
+            if io['pos'] >= len(io['stdin']):
+                raise MipsError("read past end of stdin")
+            token = io['stdin'][io['pos']].strip()
+            io['pos'] += 1
+            try:
+                if service == 6:
+                    f[0] = _f32(float(token))
+                else:
+                    r[2] = _s32(int(token))
+            except ValueError:
+                raise MipsError(f"invalid {'float' if service == 6 else 'integer'} input '{token}'") from None
+        elif service == 9:
+            r[2] = self.memory.sbrk(r[4])
+        elif service == 10:
+            return -1
+        else:
+            raise MipsError(f"unsupported syscall {service}")
+        return pc + 1
+
+    def run(self, stdin="", max_steps=MAX_STEPS, counts=None):
+        """
+        Runs the program from main with the given stdin text.
+        Returns (stdout, executed statements). Per-statement execution
+        counts are added to counts (a list as long as the table) if given.
+        """
+        self.memory.reset()
+        regs = self.regs
+        regs[:] = [0] * 32
+        regs[28] = GP_INIT
+        regs[29] = SP_INIT
+        self.fregs[:] = [0.0] * 32
+        self.flag[0] = False
+        self.io.update(stdin=stdin.splitlines(), pos=0, out=[])
+        if 'hilo' in self.io:
+            self.io['hilo'][:] = [0, 0]
+
+        table = self.table
+        end = len(table)
+        if counts is None:
+            counts = [0] * end
+        pc = self.entry
+        steps = 0
+        try:
+            # MARS stops silently when execution drops off the end of .text
+            while 0 <= pc < end:
+                counts[pc] += 1
+                steps += 1
+                if steps > max_steps:
+                    raise MipsError(f"exceeded {max_steps} steps")
+                pc = table[pc](pc)
+        except MipsError as e:
+            stmt = self.statements[pc] if 0 <= pc < end else None
+            where = f"{self.filename}:{stmt.line} ({stmt.mnemonic})" if stmt else self.filename
+            raise MipsError(f"{where}: {e}") from None
+        return "".join(self.io['out']), steps
+
+    def read_floats(self, label, count):
+        """
+        count floats of the heap buffer whose address is stored at the .data
+        word `label` (e.g. 'y_out_array' after a run), as a float32 array.
+        """
+        ptr = self.memory.load_word(self.symbols[label])
+        buf, offset = self.memory._aligned(ptr, 4)
+        return np.frombuffer(bytes(buf[offset:offset + 4 * count]), dtype='<f4').copy()
+
+    def profile(self, counts, by='proc'):
+        """
+        Aggregates per-statement counts by procedure (the nearest 'jal'
+        target or main above the statement) or by label ('label').
+        Returns {name: {'statements', 'instructions', 'loads', 'stores'}},
+        where 'instructions' estimates MARS's basic-instruction count.
+        """
+        if by == 'proc':
+            procs = {'main'} | {s.args[0] for s in self.statements if s.mnemonic == 'jal'}
+            starts = sorted((v[1], k) for k, v in self.symbols.items()
+                            if isinstance(v, tuple) and k in procs)
+        else:
+            starts = sorted((v[1], k) for k, v in self.symbols.items() if isinstance(v, tuple))
+        names = ['(start)'] * len(self.table)
+        for i, (start, name) in enumerate(starts):
+            stop = starts[i + 1][0] if i + 1 < len(starts) else len(self.table)
+            names[start:stop] = [name] * (stop - start)
+
+        report = {}
+        for i, n in enumerate(counts):
+            if not n:
+                continue
+            entry = report.setdefault(names[i], {'statements': 0, 'instructions': 0,
+                                                 'loads': 0, 'stores': 0})
+            entry['statements'] += n
+            entry['instructions'] += n * self.weights[i]
+            entry['loads'] += n * self.loads[i]
+            entry['stores'] += n * self.stores[i]
+        return report
+
+
+# --- Test driver ---
+
+_program = None
+
+
+def _init_worker(asm_path):
+    global _program
+    _program = Program.from_file(asm_path)
+
+
+def sim_case(folder_path, M=M, max_steps=MAX_STEPS):
+    """
+    Runs the worker's Program on one test folder and compares its output
+    with the Python model. 'exact32' tells whether h_opt and the output in
+    the program's memory equal the float32 model (wiener32) bit for bit.
+    Returns a result dict including the per-statement execution counts.
+    """
+    result = {'name': os.path.basename(folder_path), 'status': 'ERROR', 'message': '',
+              'wall_time': None, 'instructions': None, 'max_diff': None, 'counts': None,
+              'exact32': None}
+    try:
+        desired_signal = load_signal(signal_path(folder_path, "desired"))
+        input_signal = load_signal(signal_path(folder_path, "input"))
+    except (IOError, ValueError) as e:
+        result['message'] = f"Error loading files: {e}"
+        return result
+    if desired_signal.shape != input_signal.shape:
+        result['status'] = 'SKIP'
+        result['message'] = "size not match"
+        return result
+
+    counts = [0] * len(_program.table)
+    start = time.perf_counter()
+    try:
+        stdout, _ = _program.run(mars_stdin(desired_signal, input_signal, M), max_steps, counts)
+    except MipsError as e:
+        result['message'] = str(e)
+        return result
+    result['wall_time'] = time.perf_counter() - start
+    result['counts'] = counts
+    result['instructions'] = sum(n * w for n, w in zip(counts, _program.weights))
+
+    result.update(check_output(desired_signal, input_signal, stdout, M))
+
+    N = desired_signal.shape[0]
+    h, y, _, _ = wiener32(desired_signal, input_signal, M)
+    result['exact32'] = (np.array_equal(_program.read_floats('h_opt_vector', M).view('<u4'), h.view('<u4'))
+                         and np.array_equal(_program.read_floats('y_out_array', N).view('<u4'), y.view('<u4')))
+    return result
+
+
+def print_profile(program, counts, by='proc'):
+    """Prints the aggregated profile, busiest first."""
+    report = program.profile(counts, by)
+    total = sum(e['instructions'] for e in report.values()) or 1
+    title = 'Procedure' if by == 'proc' else 'Label'
+    print(f"\n{title:<28}{'Instructions':>14}{'%':>7}{'Loads':>12}{'Stores':>12}")
+    for name, e in sorted(report.items(), key=lambda kv: -kv[1]['instructions']):
+        print(f"{name:<28}{e['instructions']:>14}{100.0 * e['instructions'] / total:>7.1f}"
+              f"{e['loads']:>12}{e['stores']:>12}")
+    print(f"{'Total':<28}{total:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run main.asm in the built-in MIPS interpreter on every test case and compare with the Python model.")
+    parser.add_argument("--tests", default=os.path.join("tests", "test_*"),
+                        help="Glob for test folders (default: tests/test_*)")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="Worker processes (0 = all cores, default: 1)")
+    parser.add_argument("-M", type=int, default=M, help=f"Filter length of the reference model (default: {M})")
+    parser.add_argument("--asm", default=ASM_FILE, help="Assembly program to run")
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS,
+                        help="Statement limit per case")
+    parser.add_argument("--profile", choices=["proc", "label"],
+                        help="Print instruction and memory-access counts per procedure or label")
+    args = parser.parse_args()
+
+    try:
+        _init_worker(args.asm)
+    except (OSError, MipsError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    test_folders = [f for f in sorted(glob.glob(args.tests)) if os.path.isdir(f)]
+    if not test_folders:
+        print(f"No test folders found matching '{args.tests}'.")
+        return 1
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    print(f"Running {len(test_folders)} cases of {args.asm} in the interpreter with {workers} workers")
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = [sim_case(f, args.M, args.max_steps) for f in test_folders]
+    else:
+        # Each worker assembles the program once and reuses it for its cases
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(args.asm,)) as pool:
+            results = list(pool.map(sim_case, test_folders, [args.M] * len(test_folders),
+                                    [args.max_steps] * len(test_folders)))
+    wall_time = time.perf_counter() - start
+
+    print(f"\n{'Case':<12}{'Status':<8}{'Wall (s)':>10}{'Instructions':>14}{'Max diff':>10}{'float32':>9}")
+    for r in results:
+        wall = f"{r['wall_time']:.3f}" if r['wall_time'] is not None else "-"
+        count = str(r['instructions']) if r['instructions'] is not None else "-"
+        diff = f"{r['max_diff']:.2f}" if r['max_diff'] is not None else "-"
+        exact = "-" if r['exact32'] is None else ("exact" if r['exact32'] else "DIFF")
+        print(f"{r['name']:<12}{r['status']:<8}{wall:>10}{count:>14}{diff:>10}{exact:>9}  {r['message']}")
+
+    if args.profile:
+        totals = [0] * len(_program.table)
+        for r in results:
+            if r['counts']:
+                totals = [t + n for t, n in zip(totals, r['counts'])]
+        print_profile(_program, totals, args.profile)
+
+    counts = {}
+    for r in results:
+        counts[r['status']] = counts.get(r['status'], 0) + 1
+    print(f"\n {', '.join(f'{k}: {v}' for k, v in sorted(counts.items()))}")
+    print(f" Wall time: {wall_time:.2f} s")
+
+    failed = any(r['status'] in FAILED_STATUSES for r in results)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,154 +1,412 @@
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # headless: figures are only ever saved to PNG
 import matplotlib.pyplot as plt
 import os
-import argparse
+import json
+import time
 import glob
+import struct
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from corpus import is_pack, open_pack
+from downsample import DOWNSAMPLE_METHODS, histogram, plot_trace
+from adaptive import ALGORITHMS, BLOCK, adaptive_filter, learning_curve
+from result_cache import CACHE_DIR, ResultCache, cached_solve
+from signal_io import expected_path, load_expected, load_signal, signal_path
+
+PLOT_FILENAME = "result_plot.png"
+SAVE_DPI = 150
+
+# PNG text entry holding plot_key; bump PLOT_VERSION when plot_signals
+# changes in a way that should re-render every plot
+PLOT_KEY_FIELD = "Wiener-Plot-Key"
+PLOT_VERSION = 2
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# (figure, axes) reused by every plot_signals call in this process
+_FIGURE = None
 
 def parse_expected_file(filepath):
     """
-    Parses expected.txt to extract the signal and MMSE.
+    Parses expected.txt (or expected.npz) to extract the signal and MMSE.
     """
-    output_signal = []
-    mmse = None
-    
     if not os.path.exists(filepath):
         return np.array([]), None
 
     try:
-        with open(filepath, 'r') as f:
-            content = f.readlines()
-            
-        for line in content:
-            if "Filtered output:" in line:
-                numbers_str = line.split("Filtered output:")[1].strip()
-                output_signal = [float(x) for x in numbers_str.split()]
-            
-            if "MMSE:" in line:
-                mmse_str = line.split("MMSE:")[1].strip()
-                mmse = float(mmse_str)
-                
-        return np.array(output_signal), mmse
+        return load_expected(filepath)
     except Exception as e:
         print(f"[Error] Failed to parse {filepath}: {e}")
         return np.array([]), None
 
-def load_data(folder_path):
-    """Loads input.txt, desired.txt, and expected.txt from the folder."""
+def load_data(folder_path, case=None):
+    """
+    Loads the input, desired and expected files (.npy/.npz or .txt) from the
+    folder, or from a PackedCase of a corpus pack (see corpus.py).
+    """
+    if case is not None:
+        data = {name: case.signal(name) if case.has(name) else np.array([]) for name in ('input', 'desired')}
+        data['output'], data['mmse'] = case.expected()
+        return data
+
     data = {}
     try:
-        data['input'] = np.loadtxt(os.path.join(folder_path, "input.txt"))
+        data['input'] = load_signal(signal_path(folder_path, "input"))
     except:
         data['input'] = np.array([])
 
     try:
-        data['desired'] = np.loadtxt(os.path.join(folder_path, "desired.txt"))
+        data['desired'] = load_signal(signal_path(folder_path, "desired"))
     except:
         data['desired'] = np.array([])
 
-    data['output'], data['mmse'] = parse_expected_file(os.path.join(folder_path, "expected.txt"))
+    data['output'], data['mmse'] = parse_expected_file(expected_path(folder_path))
     return data
 
-def plot_signals(data, folder_name, save_path=None):
-    """Generates the 6-subplot analysis grid."""
+def _analysis_figure():
+    """
+    The 3x2 analysis figure, created once per process and cleared on each
+    call, so a batch render does not rebuild figure and axes per case.
+    """
+    global _FIGURE
+    if _FIGURE is None:
+        fig, axes = plt.subplots(3, 2, figsize=(14, 12))
+        _FIGURE = (fig, axes.ravel())
+    fig, axes = _FIGURE
+    for ax in axes:
+        ax.clear()
+    return fig, axes
+
+def plot_signals(data, folder_name, save_path=None, metadata=None, log=print, method="minmax"):
+    """
+    Generates the 6-subplot analysis grid. Traces are downsampled to the
+    axes' pixel width with `method` (see downsample.py) and the histogram
+    is accumulated in chunks, so long signals never reach matplotlib in
+    full. metadata is written into the PNG's text chunks. Returns True if
+    the figure was drawn.
+    """
     desired = data.get('desired')
     input_signal = data.get('input')
     output = data.get('output')
     mmse = data.get('mmse')
 
     if len(desired) == 0 or len(input_signal) == 0:
-        print("[Error] Missing input or desired signal data. Cannot plot.")
-        return
+        log("[Error] Missing input or desired signal data. Cannot plot.")
+        return False
 
     # Setup Figure: 3 Rows, 2 Columns
-    fig = plt.figure(figsize=(14, 12))
-    plt.suptitle(f'Wiener Filter Analysis - {folder_name}', fontsize=16, fontweight='bold')
+    fig, (ax1, ax2, ax3, ax4, ax5, ax6) = _analysis_figure()
+    fig.suptitle(f'Wiener Filter Analysis - {folder_name}', fontsize=16, fontweight='bold')
 
     # 1. Combined: Desired vs Input (Noisy)
-    ax1 = plt.subplot(3, 2, 1)
-    plt.plot(desired, 'b-o', linewidth=1.5, label='Desired (Target)', alpha=0.8)
-    plt.plot(input_signal, 'r--x', linewidth=1, alpha=0.5, label='Input (Noisy)')
-    plt.title('1. Input vs Desired Signal', fontweight='bold')
-    plt.xlabel('Sample Index')
-    plt.ylabel('Amplitude')
-    plt.grid(True, alpha=0.3)
-    plt.legend(loc='upper right')
+    plot_trace(ax1, desired, method=method, dpi=SAVE_DPI, color='b', linestyle='-', marker='o',
+               linewidth=1.5, label='Desired (Target)', alpha=0.8)
+    plot_trace(ax1, input_signal, method=method, dpi=SAVE_DPI, color='r', linestyle='--', marker='x',
+               linewidth=1, alpha=0.5, label='Input (Noisy)')
+    ax1.set_title('1. Input vs Desired Signal', fontweight='bold')
+    ax1.set_xlabel('Sample Index')
+    ax1.set_ylabel('Amplitude')
+    ax1.grid(True, alpha=0.3)
+    ax1.legend(loc='upper right')
 
     # 2. Output Signal
-    ax2 = plt.subplot(3, 2, 2)
     if len(output) > 0:
-        plt.plot(output, 'g-s', linewidth=1.5, label='Output (Filtered)')
-        plt.title('2. Output Signal', fontweight='bold')
+        plot_trace(ax2, output, method=method, dpi=SAVE_DPI, color='g', linestyle='-', marker='s',
+                   linewidth=1.5, label='Output (Filtered)')
+        ax2.set_title('2. Output Signal', fontweight='bold')
+        ax2.legend(loc='upper right')
     else:
-        plt.text(0.5, 0.5, 'No Output Data', ha='center')
-    plt.grid(True, alpha=0.3)
-    plt.legend(loc='upper right')
+        ax2.text(0.5, 0.5, 'No Output Data', ha='center')
+    ax2.grid(True, alpha=0.3)
 
     # 3. Comparison: Desired vs Output
-    ax3 = plt.subplot(3, 2, 3)
     if len(output) > 0:
         min_len = min(len(desired), len(output))
-        plt.plot(input_signal[:min_len], 'r--', linewidth=1.5, label='Input', alpha=0.3)
-        plt.plot(desired[:min_len], 'b-', linewidth=1.5, label='Desired', alpha=0.5)
-        plt.plot(output[:min_len], 'g--', linewidth=1.5, label='Output', alpha=0.9)
-    plt.title('3. Comparison: Input vs Desired vs Output', fontweight='bold')
-    plt.grid(True, alpha=0.3)
-    plt.legend(loc='upper right')
+        plot_trace(ax3, input_signal[:min_len], method=method, dpi=SAVE_DPI, color='r', linestyle='--',
+                   linewidth=1.5, label='Input', alpha=0.3)
+        plot_trace(ax3, desired[:min_len], method=method, dpi=SAVE_DPI, color='b', linestyle='-',
+                   linewidth=1.5, label='Desired', alpha=0.5)
+        plot_trace(ax3, output[:min_len], method=method, dpi=SAVE_DPI, color='g', linestyle='--',
+                   linewidth=1.5, label='Output', alpha=0.9)
+        ax3.legend(loc='upper right')
+    ax3.set_title('3. Comparison: Input vs Desired vs Output', fontweight='bold')
+    ax3.grid(True, alpha=0.3)
 
     # 4. Error Signal
-    ax4 = plt.subplot(3, 2, 4)
     error_signal = []
     if len(output) > 0:
         min_len = min(len(desired), len(output))
         error_signal = desired[:min_len] - output[:min_len]
-        plt.plot(error_signal, 'purple', linewidth=1)
+        plot_trace(ax4, error_signal, method=method, dpi=SAVE_DPI, color='purple', linewidth=1)
         mmse_text = f"(MMSE: {mmse:.4f})" if mmse is not None else ""
-        plt.title(f'4. Error Signal {mmse_text}', fontweight='bold')
-        plt.axhline(y=0, color='k', linestyle='-', linewidth=0.5)
-    plt.grid(True, alpha=0.3)
+        ax4.set_title(f'4. Error Signal {mmse_text}', fontweight='bold')
+        ax4.axhline(y=0, color='k', linestyle='-', linewidth=0.5)
+    ax4.grid(True, alpha=0.3)
 
     # 5. Error Histogram
-    ax5 = plt.subplot(3, 2, 5)
     if len(error_signal) > 0:
-        plt.hist(error_signal, bins=20, color='purple', alpha=0.7, edgecolor='black')
-        plt.title('5. Error Distribution', fontweight='bold')
-        plt.xlabel('Error Magnitude')
-        plt.ylabel('Count')
-    plt.grid(True, alpha=0.3)
+        counts, edges = histogram(error_signal, bins=20)
+        ax5.hist(edges[:-1], bins=edges, weights=counts, color='purple', alpha=0.7, edgecolor='black')
+        ax5.set_title('5. Error Distribution', fontweight='bold')
+        ax5.set_xlabel('Error Magnitude')
+        ax5.set_ylabel('Count')
+    ax5.grid(True, alpha=0.3)
 
     # 6. Frequency Spectrum (FFT)
-    ax6 = plt.subplot(3, 2, 6)
-    
     def plot_fft(sig, color, label, style='-'):
         if len(sig) == 0: return
-        # Plot positive frequencies only
-        freq = np.fft.fftfreq(len(sig))
-        mag = np.abs(np.fft.fft(sig))
-        mask = freq >= 0
-        plt.plot(freq[mask], mag[mask], color=color, linestyle=style, alpha=0.7, label=label)
+        # Real input: rfft gives the non-negative frequencies directly
+        freq = np.fft.rfftfreq(len(sig))
+        mag = np.abs(np.fft.rfft(sig))
+        plot_trace(ax6, mag, x=freq, method=method, dpi=SAVE_DPI, color=color, linestyle=style,
+                   alpha=0.7, label=label)
 
     plot_fft(input_signal, 'r', 'Input')
     plot_fft(desired, 'b', 'Desired')
     if len(output) > 0:
         plot_fft(output, 'g', 'Output', '--')
-    
-    plt.title('6. Frequency Spectrum', fontweight='bold')
+
+    ax6.set_title('6. Frequency Spectrum', fontweight='bold')
+    ax6.set_yscale('log')
+    ax6.grid(True, alpha=0.3)
+    ax6.legend(loc='upper right')
+
+    fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+
+    if save_path:
+        fig.savefig(save_path, dpi=SAVE_DPI, metadata=metadata)
+        log(f"Graph saved to: {save_path}")
+    return True
+
+def plot_key(folder_path, case=None, **params):
+    """
+    Fingerprint of a folder's plot: the plot parameters plus the size and
+    mtime of its input/desired/expected files (a PackedCase's content
+    digest instead). It is stored in the PNG, so a plot is stale exactly
+    when its inputs changed after it was written.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'version': PLOT_VERSION, **params}, sort_keys=True).encode())
+    if case is not None:
+        digest.update(case.digest.encode())
+        return digest.hexdigest()
+    for path in (signal_path(folder_path, "input"), signal_path(folder_path, "desired"),
+                 expected_path(folder_path)):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+def png_text(path, keyword):
+    """
+    Reads one tEXt entry of a PNG without decoding the image (text chunks
+    precede the image data). Returns None if the file or entry is missing.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(8) != PNG_SIGNATURE:
+                return None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                length, kind = struct.unpack(">I4s", header)
+                if kind in (b'IDAT', b'IEND'):
+                    return None
+                body = f.read(length)
+                f.seek(4, os.SEEK_CUR)  # CRC
+                if kind == b'tEXt':
+                    name, _, value = body.partition(b'\0')
+                    if name.decode('latin-1') == keyword:
+                        return value.decode('latin-1')
+    except OSError:
+        return None
+
+def plot_path(folder_path, pack_path=None, out_dir=None):
+    """Where a case's plot goes: result_plot.png in its folder, or <case>.png in out_dir for a pack."""
+    if pack_path is None:
+        return os.path.join(folder_path, PLOT_FILENAME)
+    return os.path.join(out_dir or pack_plot_dir(pack_path), folder_path + ".png")
+
+def pack_plot_dir(pack_path):
+    """Default output directory of a pack's plots: <pack>_plots next to it."""
+    return os.path.splitext(pack_path)[0] + "_plots"
+
+def render_case(folder_path, model=False, M=10, cache_dir=None, force=False, log=print, method="minmax",
+                pack_path=None, out_dir=None):
+    """
+    Renders a folder's result_plot.png unless the key stored in the existing
+    PNG shows its inputs are unchanged. With pack_path, folder_path is a
+    case name of that pack and the plot goes to out_dir. Returns
+    'rendered', 'skipped' or 'failed'.
+    """
+    case = open_pack(pack_path)[folder_path] if pack_path is not None else None
+    save_path = plot_path(folder_path, pack_path, out_dir)
+    key = plot_key(folder_path, case, model=model, M=M if model else None, downsample=method)
+    if not force and png_text(save_path, PLOT_KEY_FIELD) == key:
+        return "skipped"
+
+    data = load_data(folder_path, case)
+    if model:
+        cache = ResultCache(cache_dir) if cache_dir else None
+        try:
+            _, data['output'], data['mmse'] = cached_solve(cache, folder_path, M, case)
+        except ValueError as e:
+            log(f"[Error] Cannot run the model: {e}")
+            return "failed"
+    if not plot_signals(data, os.path.basename(folder_path), save_path=save_path,
+                        metadata={PLOT_KEY_FIELD: key}, log=log, method=method):
+        return "failed"
+    return "rendered"
+
+def _render_case_captured(args):
+    """Process-pool worker: renders one folder and returns (folder, status, log lines)."""
+    folder_path, model, M, cache_dir, force, method, pack_path, out_dir = args
+    lines = []
+    status = render_case(folder_path, model, M, cache_dir, force, log=lines.append, method=method,
+                         pack_path=pack_path, out_dir=out_dir)
+    return folder_path, status, lines
+
+def render_all(folders, model=False, M=10, cache_dir=None, force=False, workers=1, method="minmax",
+               pack_path=None, out_dir=None):
+    """
+    Renders every folder's plot, serially or across a process pool (each
+    worker reuses one figure and memory-maps the pack once). With
+    pack_path, folders are case names of the pack. Returns {status: count}.
+    """
+    if pack_path is not None:
+        os.makedirs(out_dir or pack_plot_dir(pack_path), exist_ok=True)
+    jobs = [(folder, model, M, cache_dir, force, method, pack_path, out_dir) for folder in folders]
+    if workers <= 1:
+        results = map(_render_case_captured, jobs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_render_case_captured, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+
+    counts = {}
+    try:
+        for folder, status, lines in results:
+            for line in lines:
+                print(line)
+            if status == "failed":
+                print(f"[Error] {folder}: not rendered")
+            counts[status] = counts.get(status, 0) + 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return counts
+
+def plot_learning_curve(data, folder_name, M=10, block=BLOCK, save_path=None):
+    """Plots the NLMS and RLS learning curves against the Wiener MMSE."""
+    desired = data.get('desired')
+    input_signal = data.get('input')
+    mmse = data.get('mmse')
+
+    if len(desired) == 0 or len(input_signal) == 0 or len(desired) != len(input_signal):
+        print("[Error] Missing or mismatched input/desired signal data. Cannot plot.")
+        return
+
+    # Smooth over ~2% of the signal so the curve is readable for long inputs
+    window = max(1, len(desired) // 50)
+
+    plt.figure(figsize=(10, 5))
+    ax = plt.gca()
+    for algorithm, color in zip(sorted(ALGORITHMS), ('tab:orange', 'tab:blue')):
+        _, errors, _ = adaptive_filter(np.asarray(input_signal, dtype=float), np.asarray(desired, dtype=float),
+                                       M, algorithm, block)
+        plot_trace(ax, learning_curve(errors, window), dpi=SAVE_DPI, color=color, linewidth=1.2,
+                   label=f'{algorithm.upper()} (block {block})')
+    if mmse is not None:
+        plt.axhline(y=mmse, color='k', linestyle='--', linewidth=1, label=f'Wiener MMSE ({mmse:.4f})')
+
+    plt.title(f'Learning Curve - {folder_name} (M={M}, window {window})', fontweight='bold')
+    plt.xlabel('Sample Index')
+    plt.ylabel('Squared a priori error')
     plt.yscale('log')
     plt.grid(True, alpha=0.3)
     plt.legend(loc='upper right')
+    plt.tight_layout()
 
-    plt.tight_layout(rect=[0, 0.03, 1, 0.95]) 
-    
     if save_path:
-        plt.savefig(save_path, dpi=150)
+        plt.savefig(save_path, dpi=SAVE_DPI)
         print(f"Graph saved to: {save_path}")
 
 def main():
     parser = argparse.ArgumentParser(description="Plot signals for a specific test case.")
     parser.add_argument("folder", nargs='?', help="Path to test folder (e.g. tests/test_001)")
+    parser.add_argument("--model", action="store_true",
+                        help="Plot the Wiener model's output instead of expected.txt")
+    parser.add_argument("-M", type=int, default=10, help="Filter length for --model (default: 10)")
+    parser.add_argument("--cache", nargs='?', const=CACHE_DIR, default=None, metavar="DIR",
+                        help="With --model, reuse the result cache for unchanged cases")
+    parser.add_argument("--learning-curve", action="store_true",
+                        help="Also plot the NLMS/RLS learning curves to learning_curve.png")
+    parser.add_argument("--update-block", type=int, default=BLOCK,
+                        help=f"Samples per adaptive weight update (default: {BLOCK})")
+    parser.add_argument("--all", action="store_true",
+                        help=f"Render {PLOT_FILENAME} for every folder matching --tests, "
+                             "skipping plots whose inputs are unchanged")
+    parser.add_argument("--tests", default=os.path.join("tests", "test_*"),
+                        help="Glob for --all (default: tests/test_*)")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="Worker processes for --all (0 = all cores)")
+    parser.add_argument("--force", action="store_true",
+                        help="With --all, re-render plots even if they are up to date")
+    parser.add_argument("--pack", default=None, metavar="FILE",
+                        help="Read cases from a corpus pack (see corpus.py); folder and --tests "
+                             "then name cases of the pack")
+    parser.add_argument("--out", default=None, metavar="DIR",
+                        help="With --pack, directory of the <case>.png plots (default: <pack>_plots)")
+    parser.add_argument("--downsample", choices=DOWNSAMPLE_METHODS, default="minmax",
+                        help="Trace reduction to the figure's pixel width: 'minmax' envelope (default), "
+                             "'lttb' (Largest-Triangle-Three-Buckets) or 'none'")
     args = parser.parse_args()
 
+    if args.pack and not is_pack(args.pack):
+        print(f"Error: '{args.pack}' is not a corpus pack.")
+        return
+
+    # --- Batch render ---
+    if args.all:
+        if args.pack:
+            folders = open_pack(args.pack).select(args.tests)
+        else:
+            folders = [f for f in sorted(glob.glob(args.tests)) if os.path.isdir(f)]
+        if not folders:
+            print(f"No test folders match '{args.tests}'")
+            return
+        workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+        start = time.perf_counter()
+        counts = render_all(folders, args.model, args.M, args.cache, args.force, workers, args.downsample,
+                            args.pack, args.out)
+        if args.cache:
+            ResultCache(args.cache).prune()
+        print(f"Rendered {counts.get('rendered', 0)}, skipped {counts.get('skipped', 0)} (up to date), "
+              f"failed {counts.get('failed', 0)} of {len(folders)} folders "
+              f"in {time.perf_counter() - start:.2f} s ({workers} worker(s))")
+        return
+
     target_folder = args.folder
 
+    if args.pack:
+        pack = open_pack(args.pack)
+        name = target_folder or pack.names[0]
+        if name not in pack:
+            print(f"Error: no case '{name}' in {args.pack}.")
+            return
+        os.makedirs(args.out or pack_plot_dir(args.pack), exist_ok=True)
+        print(f"Plotting case {name} of {args.pack}")
+        render_case(name, args.model, args.M, args.cache, force=True, method=args.downsample,
+                    pack_path=args.pack, out_dir=args.out)
+        return
+
     # Default to first test if no folder specified
     if not target_folder:
         all_tests = sorted(glob.glob(os.path.join("tests", "test_*")))
@@ -162,8 +420,21 @@ def main():
     if os.path.isdir(target_folder):
         print(f"Plotting data from: {target_folder}")
         data = load_data(target_folder)
-        save_loc = os.path.join(target_folder, "result_plot.png")
-        plot_signals(data, os.path.basename(target_folder), save_path=save_loc)
+        if args.model:
+            cache = ResultCache(args.cache) if args.cache else None
+            try:
+                _, data['output'], data['mmse'] = cached_solve(cache, target_folder, args.M)
+            except ValueError as e:
+                print(f"[Error] Cannot run the model: {e}")
+                return
+        save_loc = os.path.join(target_folder, PLOT_FILENAME)
+        key = plot_key(target_folder, model=args.model, M=args.M if args.model else None,
+                       downsample=args.downsample)
+        plot_signals(data, os.path.basename(target_folder), save_path=save_loc,
+                     metadata={PLOT_KEY_FIELD: key}, method=args.downsample)
+        if args.learning_curve:
+            plot_learning_curve(data, os.path.basename(target_folder), M=args.M, block=args.update_block,
+                                save_path=os.path.join(target_folder, "learning_curve.png"))
     else:
         print(f"Error: Folder '{target_folder}' does not exist.")
 
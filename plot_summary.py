@@ -1,82 +1,178 @@
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # headless: the summary is only ever saved to PNG
 import matplotlib.pyplot as plt
 import os
 import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from corpus import is_pack, open_pack
+from downsample import box_stats
+from result_cache import CACHE_DIR, ResultCache
+from signal_io import expected_path, load_expected, load_signal, signal_path
+from wiener import solve_wiener_batch
 
 # --- CONFIGURATION ---
 TESTS_DIR = "tests"
 OUTPUT_FILENAME = "combined_results.png"
+M = 10
 
 def parse_expected_file(filepath):
     """
-    Parses expected.txt to extract the output signal.
+    Parses expected.txt (or expected.npz) to extract the output signal.
     """
-    output_signal = []
-    mmse = 0.0
-    
     if not os.path.exists(filepath):
         return np.array([]), None
 
     try:
-        with open(filepath, 'r') as f:
-            content = f.readlines()
-            
-        for line in content:
-            if "Filtered output:" in line:
-                parts = line.split("Filtered output:")[1].strip().split()
-                output_signal = [float(x) for x in parts]
-            if "MMSE:" in line:
-                 mmse = float(line.split("MMSE:")[1].strip())
-                
-        return np.array(output_signal), mmse
+        output_signal, mmse = load_expected(filepath)
+        return output_signal, mmse if mmse is not None else 0.0
     except Exception as e:
         print(f"[Error] Failed to parse {filepath}: {e}")
         return np.array([]), None
 
-def collect_data():
+def load_packed_errors(name, pack_path):
+    """load_case_errors for case `name` of a corpus pack."""
+    case = open_pack(pack_path)[name]
+    if not case.has("desired") or not case.has_expected():
+        return None, f"Skipping {name}: Missing desired.txt or expected.txt"
+    output, _ = case.expected()
+    if len(output) == 0:
+        return None, None
+    desired = case.signal("desired")
+    min_len = min(len(desired), len(output))
+    error_signal = desired[:min_len] - output[:min_len]
+    return {'name': name, 'mmse': np.mean(error_signal ** 2), 'box': box_stats(error_signal)}, None
+
+def load_case_errors(folder, pack_path=None):
     """
-    Iterates through all test folders and gathers error data.
+    Loads one folder's (or packed case's) desired and expected signals.
+    Returns (result dict or None, message for a skipped folder).
     """
-    test_folders = sorted(glob.glob(os.path.join(TESTS_DIR, "test_*")))
+    if pack_path is not None:
+        return load_packed_errors(folder, pack_path)
+    test_name = os.path.basename(folder)
+
+    desired_path = signal_path(folder, "desired")
+    expected_file = expected_path(folder)
+
+    # We need both files to calculate specific errors
+    if not (os.path.exists(desired_path) and os.path.exists(expected_file)):
+        return None, f"Skipping {test_name}: Missing desired.txt or expected.txt"
+    try:
+        desired = load_signal(desired_path)
+        output, file_mmse = parse_expected_file(expected_file)
+    except Exception as e:
+        return None, f"Skipping {test_name}: {e}"
+    if len(output) == 0:
+        return None, None
+
+    # Match lengths just in case
+    min_len = min(len(desired), len(output))
+    desired = desired[:min_len]
+    output = output[:min_len]
+
+    # Calculate Error Signal
+    error_signal = desired - output
+    calculated_mmse = np.mean(error_signal ** 2)
+
+    return {
+        'name': test_name,
+        'mmse': calculated_mmse,
+        'box': box_stats(error_signal)
+    }, None
+
+def list_cases(pack_path=None):
+    """Test folders under TESTS_DIR, or every case name of a corpus pack."""
+    if pack_path is not None:
+        return list(open_pack(pack_path).names)
+    return sorted(glob.glob(os.path.join(TESTS_DIR, "test_*")))
+
+def collect_data(workers=1, pack_path=None):
+    """
+    Iterates through all test folders (or the cases of a corpus pack) and
+    gathers error data, loading them across a process pool when
+    workers > 1.
+    """
+    test_folders = list_cases(pack_path)
     results = []
 
     print(f"Found {len(test_folders)} test folders. Processing...")
 
+    packs = [pack_path] * len(test_folders)
+    if workers <= 1:
+        loaded = map(load_case_errors, test_folders, packs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        loaded = pool.map(load_case_errors, test_folders, packs,
+                          chunksize=max(1, len(test_folders) // (workers * 8)))
+    try:
+        for result, message in loaded:
+            if message:
+                print(message)
+            if result is not None:
+                results.append(result)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return results
+
+def collect_model_data(M=M, cache=None, pack_path=None):
+    """
+    Like collect_data, but computes the output with the Wiener model
+    instead of reading expected.txt. Cases of equal length are solved
+    together in one solve_wiener_batch call; with a ResultCache, cases
+    whose signals and M are unchanged reuse the stored output.
+    """
+    test_folders = list_cases(pack_path)
+    pack = open_pack(pack_path) if pack_path is not None else None
+    groups = {}
+    results = []
+
+    print(f"Found {len(test_folders)} test folders. Solving with the model (M={M})...")
+
     for folder in test_folders:
         test_name = os.path.basename(folder)
-        
-        desired_path = os.path.join(folder, "desired.txt")
-        expected_path = os.path.join(folder, "expected.txt")
-
-        # We need both files to calculate specific errors
-        if os.path.exists(desired_path) and os.path.exists(expected_path):
-            try:
-                desired = np.loadtxt(desired_path)
-                output, file_mmse = parse_expected_file(expected_path)
-
-                if len(output) > 0:
-                    # Match lengths just in case
-                    min_len = min(len(desired), len(output))
-                    desired = desired[:min_len]
-                    output = output[:min_len]
-
-                    # Calculate Error Signal
-                    error_signal = desired - output
-                    calculated_mmse = np.mean(error_signal ** 2)
-
-                    results.append({
-                        'name': test_name,
-                        'mmse': calculated_mmse,
-                        'error_signal': error_signal
-                    })
-            except Exception as e:
-                print(f"Skipping {test_name}: {e}")
-        else:
-            print(f"Skipping {test_name}: Missing desired.txt or expected.txt")
-
+        case = pack[folder] if pack is not None else None
+        key = None
+        if cache is not None:
+            key = cache.key_digest(case.digest, M=M) if case is not None else cache.key(folder, M=M)
+        entry = cache.get(key) if key is not None else None
+        try:
+            desired = case.signal("desired") if case is not None else load_signal(signal_path(folder, "desired"))
+            if entry is not None:
+                _, output, mmse = entry
+                results.append({'name': test_name, 'mmse': mmse, 'box': box_stats(desired - output)})
+                continue
+            input_signal = case.signal("input") if case is not None else load_signal(signal_path(folder, "input"))
+        except Exception as e:
+            print(f"Skipping {test_name}: {e}")
+            continue
+        if desired.shape != input_signal.shape:
+            print(f"Skipping {test_name}: size not match")
+            continue
+        groups.setdefault(desired.shape[0], []).append((test_name, input_signal, desired, folder, key))
+
+    for cases in groups.values():
+        X = np.stack([c[1] for c in cases])
+        D = np.stack([c[2] for c in cases])
+        H, Y, mmse, _ = solve_wiener_batch(X, D, M)
+        for b, (test_name, _, _, folder, key) in enumerate(cases):
+            if key is not None:
+                cache.put(key, H[b], Y[b], mmse[b], source=folder)
+            results.append({
+                'name': test_name,
+                'mmse': mmse[b],
+                'box': box_stats(D[b] - Y[b])
+            })
+
+    results.sort(key=lambda r: r['name'])
     return results
 
-def plot_combined_results(results):
+def plot_combined_results(results, save_path=None):
     if not results:
         print("No valid results found to plot.")
         return
@@ -84,7 +180,9 @@ def plot_combined_results(results):
     # Extract data for plotting
     names = [r['name'].replace('test_', '') for r in results] # Shorten names
     mmses = [r['mmse'] for r in results]
-    errors = [r['error_signal'] for r in results]
+    # Box statistics are computed per case while loading (downsample.box_stats),
+    # so the full error signals never reach matplotlib
+    boxes = [dict(r['box'], label=name) for r, name in zip(results, names)]
 
     # Create Figure (2 Subplots)
     fig, axes = plt.subplots(2, 1, figsize=(12, 10))
@@ -106,8 +204,7 @@ def plot_combined_results(results):
 
     # 2. Error Distribution (Box Plot)
     ax2 = axes[1]
-    # Boxplot expects a list of arrays
-    ax2.boxplot(errors, labels=names, patch_artist=True, 
+    ax2.bxp(boxes, patch_artist=True,
                 boxprops=dict(facecolor='lightgreen', alpha=0.6),
                 medianprops=dict(color='red'))
     
@@ -119,11 +216,31 @@ def plot_combined_results(results):
 
     plt.tight_layout(rect=[0, 0.03, 1, 0.95])
     
-    # Save inside the tests/ folder
-    save_path = os.path.join(TESTS_DIR, OUTPUT_FILENAME)
+    # Save inside the tests/ folder unless told otherwise
+    if save_path is None:
+        save_path = os.path.join(TESTS_DIR, OUTPUT_FILENAME)
     plt.savefig(save_path, dpi=150)
     print(f"\n[Success] Combined graph saved to: {save_path}")
 
 if __name__ == "__main__":
-    data = collect_data()
-    plot_combined_results(data)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Plot the combined error summary of all test cases.")
+    parser.add_argument("--model", action="store_true",
+                        help="Compute outputs with the Wiener model instead of reading expected.txt")
+    parser.add_argument("-M", type=int, default=M, help=f"Filter length for --model (default: {M})")
+    parser.add_argument("--cache", nargs='?', const=CACHE_DIR, default=None, metavar="DIR",
+                        help="With --model, reuse results of unchanged cases from the result cache")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="Worker processes loading the test folders (0 = all cores)")
+    parser.add_argument("--pack", default=None, metavar="FILE",
+                        help=f"Summarize the cases of a corpus pack; saves <pack>_{OUTPUT_FILENAME}")
+    args = parser.parse_args()
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    if args.pack and not is_pack(args.pack):
+        parser.error(f"'{args.pack}' is not a corpus pack")
+    save_path = os.path.splitext(args.pack)[0] + "_" + OUTPUT_FILENAME if args.pack else None
+
+    cache = ResultCache(args.cache) if args.cache else None
+    data = collect_model_data(args.M, cache, args.pack) if args.model else collect_data(workers, args.pack)
+    if cache is not None:
+        cache.prune()
+    plot_combined_results(data, save_path)
\ No newline at end of file
@@ -0,0 +1,211 @@
+import numpy as np
+import os
+import json
+import hashlib
+import argparse
+
+from signal_io import load_signal, signal_path
+from wiener import autocorrelation, cross_correlation, fir_filter, solve_wiener
+
+# Default on-disk location and size bound of the cache
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".wiener_cache")
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Bump when the solver changes in a way that alters cached results
+CACHE_VERSION = 1
+
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def _hash_file(digest, path):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+
+
+class ResultCache:
+    """
+    Content-addressed store of Wiener results (h_opt, output, MMSE).
+    Entries are keyed by a SHA-256 of the raw input/desired file bytes plus
+    the filter parameters, so a hit needs no parsing at all. Each entry is
+    one .npz file; its mtime is the LRU clock, refreshed on every hit.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, folder_path, **params):
+        """
+        Cache key of a test folder for the given filter parameters, or
+        None if its input/desired signals are missing.
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps({'version': CACHE_VERSION, **params}, sort_keys=True).encode())
+        for name in ("input", "desired"):
+            path = signal_path(folder_path, name)
+            if not os.path.exists(path):
+                return None
+            digest.update(name.encode())
+            _hash_file(digest, path)
+        return digest.hexdigest()
+
+    def key_digest(self, digest, **params):
+        """
+        Cache key of a case identified by a content digest of its signals
+        (e.g. a PackedCase's), for the given filter parameters.
+        """
+        text = json.dumps({'version': CACHE_VERSION, 'digest': digest, **params}, sort_keys=True)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".npz")
+
+    def get(self, key):
+        """Returns (h_opt, output, mmse) for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                entry = (data['h'], data['output'], float(data['mmse']))
+            os.utime(path)
+        except (OSError, KeyError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key, h, output, mmse, source=""):
+        """Stores a result; the write is atomic so parallel workers can share the cache."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f, h=h, output=output, mmse=mmse, source=source)
+        os.replace(tmp, path)
+
+    def entries(self):
+        """Lists (path, size, mtime) of every entry."""
+        result = []
+        if not os.path.isdir(self.directory):
+            return result
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".npz"):
+                    stat = entry.stat()
+                    result.append((entry.path, stat.st_size, stat.st_mtime))
+        return result
+
+    def prune(self, max_bytes=None):
+        """
+        Evicts least recently used entries until the cache fits max_bytes.
+        Called once after a batch rather than on every put, since it scans
+        the whole directory. Returns the number of entries removed.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(e[1] for e in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def invalidate(self, sources=None):
+        """
+        Removes every entry, or only those computed from the given source
+        folders (matched by folder name). Returns the number removed.
+        """
+        names = None if sources is None else {os.path.basename(os.path.normpath(s)) for s in sources}
+        removed = 0
+        for path, _, _ in self.entries():
+            if names is not None:
+                try:
+                    with np.load(path) as data:
+                        source = str(data['source'])
+                except (OSError, KeyError, ValueError):
+                    source = None
+                if source is not None and os.path.basename(source) not in names:
+                    continue
+            os.remove(path)
+            removed += 1
+        return removed
+
+
+def cached_solve(cache, folder_path, M, case=None):
+    """
+    Returns (h_opt, output, mmse) for a test folder (or a PackedCase, then
+    folder_path is its name), from the cache when its signals and M are
+    unchanged, otherwise computed and stored. cache may be None to always
+    compute.
+    """
+    key = None
+    if cache is not None:
+        key = cache.key_digest(case.digest, M=M) if case is not None else cache.key(folder_path, M=M)
+    if key is not None:
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+
+    if case is not None:
+        input_signal = case.signal("input")
+        desired_signal = case.signal("desired")
+    else:
+        input_signal = load_signal(signal_path(folder_path, "input"))
+        desired_signal = load_signal(signal_path(folder_path, "desired"))
+    if input_signal.shape != desired_signal.shape:
+        raise ValueError("size not match")
+
+    rxx = autocorrelation(input_signal, M)
+    gamma_d = cross_correlation(desired_signal, input_signal, M)
+    h, _ = solve_wiener(rxx, gamma_d)
+    output = fir_filter(input_signal, h)
+    mmse = float(np.mean((desired_signal - output) ** 2))
+
+    if key is not None:
+        cache.put(key, h, output, mmse, source=folder_path)
+    return h, output, mmse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the Wiener result cache.")
+    parser.add_argument("command", choices=["stats", "clear", "invalidate", "prune"],
+                        help="'stats', 'clear' (all entries), 'invalidate' FOLDER..., 'prune' to --max-mb")
+    parser.add_argument("folders", nargs='*', help="Test folders for 'invalidate'")
+    parser.add_argument("--dir", default=CACHE_DIR, help=f"Cache directory (default: {CACHE_DIR})")
+    parser.add_argument("--max-mb", type=float, default=CACHE_MAX_BYTES / 2**20,
+                        help="Size bound for 'prune' in MiB")
+    args = parser.parse_args()
+
+    cache = ResultCache(args.dir, int(args.max_mb * 2**20))
+
+    if args.command == 'stats':
+        entries = cache.entries()
+        total = sum(e[1] for e in entries)
+        print(f"Cache: {cache.directory}")
+        print(f" Entries: {len(entries)}")
+        print(f" Size:    {total / 2**20:.2f} MiB (limit {cache.max_bytes / 2**20:.0f} MiB)")
+    elif args.command == 'clear':
+        print(f"Removed {cache.invalidate()} entries.")
+    elif args.command == 'invalidate':
+        if not args.folders:
+            print("Error: give the test folders to invalidate (or use 'clear').")
+            return
+        print(f"Removed {cache.invalidate(args.folders)} entries.")
+    elif args.command == 'prune':
+        print(f"Evicted {cache.prune()} entries.")
+
+if __name__ == "__main__":
+    main()
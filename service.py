@@ -0,0 +1,487 @@
+import numpy as np
+import os
+import sys
+import json
+import time
+import struct
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from wiener import solve_wiener_batch
+
+# Wire format, both directions: FRAME (header length, payload length), a
+# UTF-8 JSON header, then the payload of raw little-endian float64 arrays.
+#   request   {"id", "op": "filter", "M", "n"}   payload input[n] + desired[n]
+#             {"id", "op": "stats"} / {"id", "op": "ping"}
+#   response  {"id", "status": "ok"|"error", "error", "M", "n", "mmse",
+#              "singular", "batch"}               payload h_opt[M] + output[n]
+#             stats: {"id", "status": "ok", "stats": {...}}, no payload
+# Responses carry the request id; a connection may pipeline requests and
+# receives the answers in completion order.
+FRAME = struct.Struct("<II")
+DTYPE = np.dtype('<f8')
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+# Micro-batching: requests of the same (N, M) arriving within DEADLINE
+# seconds of the first one are solved together, up to MAX_BATCH at a time
+DEADLINE = 0.002
+MAX_BATCH = 256
+
+# Backpressure: at most MAX_PENDING requests are admitted and unanswered;
+# beyond that connections are not read, so clients block in TCP
+MAX_PENDING = 4096
+
+# Largest accepted signal length and header size; bigger frames close the
+# connection before their payload is read
+MAX_SAMPLES = 1 << 24
+MAX_HEADER = 1 << 16
+
+# Latencies kept for the percentiles, completions for the throughput
+METRICS_WINDOW = 10000
+
+
+def parse_address(address):
+    """'host:port', 'unix:PATH' or a path with a '/' -> ('tcp', host, port) or ('unix', path)."""
+    if address.startswith("unix:"):
+        return ("unix", address[5:])
+    if "/" in address:
+        return ("unix", address)
+    host, _, port = address.rpartition(":")
+    return ("tcp", host or "127.0.0.1", int(port))
+
+
+async def read_frame(reader):
+    """(header dict, payload bytes) of the next frame, or None at EOF."""
+    try:
+        head = await reader.readexactly(FRAME.size)
+    except asyncio.IncompleteReadError:
+        return None
+    header_len, payload_len = FRAME.unpack(head)
+    if header_len > MAX_HEADER or payload_len > 2 * MAX_SAMPLES * DTYPE.itemsize:
+        raise ValueError(f"frame too large ({header_len} + {payload_len} bytes)")
+    header = json.loads(await reader.readexactly(header_len))
+    if not isinstance(header, dict):
+        raise ValueError("frame header is not a JSON object")
+    payload = await reader.readexactly(payload_len) if payload_len else b""
+    return header, payload
+
+
+def write_frame(writer, header, *arrays):
+    header = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    payload = b"".join(np.ascontiguousarray(a, dtype=DTYPE).tobytes() for a in arrays)
+    writer.write(FRAME.pack(len(header), len(payload)) + header + payload)
+
+
+def _solve_batch(X, D, M):
+    """Executor job: one stacked solve (module level so processes can run it)."""
+    return solve_wiener_batch(X, D, M)
+
+
+# ---------------------------------------------------------
+# Server
+# ---------------------------------------------------------
+
+class Metrics:
+    """Request counts, batch sizes, latency percentiles and throughput."""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.start = time.perf_counter()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched = 0
+        self.in_flight = 0
+        self.latencies = deque(maxlen=window)
+        self.completions = deque(maxlen=window)
+
+    def done(self, latency, ok=True):
+        self.requests += 1
+        self.errors += 0 if ok else 1
+        self.latencies.append(latency)
+        self.completions.append(time.perf_counter())
+
+    def snapshot(self):
+        now = time.perf_counter()
+        lat = np.array(self.latencies) * 1000
+        span = now - self.completions[0] if self.completions else 0.0
+        stats = {
+            'uptime_s': now - self.start,
+            'requests': self.requests,
+            'errors': self.errors,
+            'in_flight': self.in_flight,
+            'batches': self.batches,
+            'mean_batch': self.batched / self.batches if self.batches else 0.0,
+            'throughput_rps': len(self.completions) / span if span > 0 else 0.0,
+        }
+        if lat.size:
+            p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+            stats['latency_ms'] = {'p50': p50, 'p90': p90, 'p99': p99, 'max': float(lat.max())}
+        return stats
+
+
+class MicroBatcher:
+    """
+    Groups concurrent requests by (N, M). A group is solved with one
+    solve_wiener_batch call on the executor when it reaches max_batch
+    requests or `deadline` seconds after its first request, whichever
+    comes first.
+    """
+
+    def __init__(self, executor, metrics, deadline=DEADLINE, max_batch=MAX_BATCH):
+        self.executor = executor
+        self.metrics = metrics
+        self.deadline = deadline
+        self.max_batch = max_batch
+        self._groups = {}
+        self._timers = {}
+        # asyncio keeps only weak references to running tasks
+        self._tasks = set()
+
+    def submit(self, x, d, M):
+        """Future of (h_opt, output, mmse, singular, batch size) for one signal pair."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (x.shape[0], M)
+        group = self._groups.setdefault(key, [])
+        group.append((x, d, future))
+        if len(group) >= self.max_batch:
+            self._flush(key)
+        elif len(group) == 1:
+            self._timers[key] = loop.call_later(self.deadline, self._flush, key)
+        return future
+
+    def _flush(self, key):
+        group = self._groups.pop(key, None)
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        if group:
+            task = asyncio.ensure_future(self._solve(group, key[1]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _solve(self, group, M):
+        loop = asyncio.get_running_loop()
+        self.metrics.batches += 1
+        self.metrics.batched += len(group)
+        try:
+            X = np.stack([g[0] for g in group])
+            D = np.stack([g[1] for g in group])
+            H, Y, mmse, singular = await loop.run_in_executor(self.executor, _solve_batch, X, D, M)
+        except Exception as e:
+            for _, _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for b, (_, _, future) in enumerate(group):
+            if not future.done():
+                future.set_result((H[b], Y[b], float(mmse[b]), bool(singular[b]), len(group)))
+
+
+class FilterService:
+    """
+    asyncio server answering filter requests through a MicroBatcher.
+    Backpressure comes from a semaphore of max_pending admitted requests:
+    a connection waits for a slot before reading its next frame, and for
+    writer.drain() before sending, so slow clients are not buffered
+    without bound.
+    """
+
+    def __init__(self, executor, deadline=DEADLINE, max_batch=MAX_BATCH, max_pending=MAX_PENDING,
+                 log=print):
+        self.metrics = Metrics()
+        self.batcher = MicroBatcher(executor, self.metrics, deadline, max_batch)
+        self.max_pending = max_pending
+        self.log = log
+        self._slots = None
+
+    async def handle(self, reader, writer):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                await self._slots.acquire()
+                frame = None
+                try:
+                    frame = await read_frame(reader)
+                except (ValueError, ConnectionError, asyncio.IncompleteReadError) as e:
+                    # IncompleteReadError: the client went away mid-frame
+                    self.log(f" [Warning] Dropping connection: {e}")
+                finally:
+                    # The slot passes to _answer only with a complete frame
+                    if frame is None:
+                        self._slots.release()
+                if frame is None:
+                    break
+                task = asyncio.ensure_future(self._answer(frame, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def _answer(self, frame, writer, lock):
+        start = time.perf_counter()
+        header, payload = frame
+        reply = {}
+        arrays = ()
+        op = None
+        ok = False
+        self.metrics.in_flight += 1
+        try:
+            # Inside the try so a bad header still gets a reply and frees its slot
+            reply['id'] = header.get('id')
+            op = header.get('op', 'filter')
+            if op == 'ping':
+                reply['status'] = 'ok'
+            elif op == 'stats':
+                reply.update(status='ok', stats=self.metrics.snapshot())
+            elif op == 'filter':
+                h, y, mmse, singular, batch = await self._filter(header, payload)
+                reply.update(status='ok', M=h.shape[0], n=y.shape[0], mmse=mmse, singular=singular,
+                             batch=batch)
+                arrays = (h, y)
+                ok = True
+            else:
+                raise ValueError(f"unknown op: {op}")
+        except Exception as e:
+            reply.update(status='error', error=str(e))
+        finally:
+            self.metrics.in_flight -= 1
+            self._slots.release()
+        if op == 'filter':
+            self.metrics.done(time.perf_counter() - start, ok)
+
+        async with lock:
+            try:
+                write_frame(writer, reply, *arrays)
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def _filter(self, header, payload):
+        M = int(header['M'])
+        n = int(header['n'])
+        signals = np.frombuffer(payload, dtype=DTYPE)
+        if signals.shape[0] != 2 * n:
+            raise ValueError("size not match")
+        if not 1 <= M <= n:
+            raise ValueError(f"M must be in 1..{n}, got {M}")
+        return await self.batcher.submit(signals[:n], signals[n:], M)
+
+    async def report(self, interval):
+        """Logs a metrics line every interval seconds."""
+        while True:
+            await asyncio.sleep(interval)
+            s = self.metrics.snapshot()
+            lat = s.get('latency_ms', {})
+            self.log(f" requests={s['requests']} errors={s['errors']} in_flight={s['in_flight']} "
+                     f"rps={s['throughput_rps']:.0f} mean_batch={s['mean_batch']:.1f} "
+                     f"p50={lat.get('p50', 0):.2f} ms p99={lat.get('p99', 0):.2f} ms")
+
+
+async def serve(address=DEFAULT_ADDRESS, workers=1, executor_kind="process", deadline=DEADLINE,
+                max_batch=MAX_BATCH, max_pending=MAX_PENDING, report=10.0, log=print):
+    """Runs the service until cancelled."""
+    pool = ProcessPoolExecutor if executor_kind == "process" else ThreadPoolExecutor
+    with pool(max_workers=workers) as executor:
+        service = FilterService(executor, deadline, max_batch, max_pending, log)
+        kind, *where = parse_address(address)
+        if kind == "unix":
+            if os.path.exists(where[0]):
+                os.remove(where[0])
+            server = await asyncio.start_unix_server(service.handle, path=where[0])
+        else:
+            server = await asyncio.start_server(service.handle, host=where[0], port=where[1])
+        log(f"Serving on {address} ({workers} {executor_kind} worker(s), deadline {deadline * 1000:g} ms, "
+            f"max batch {max_batch}, max pending {max_pending})")
+        reporter = asyncio.ensure_future(service.report(report)) if report > 0 else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+            if kind == "unix" and os.path.exists(where[0]):
+                os.remove(where[0])
+
+
+# ---------------------------------------------------------
+# Client
+# ---------------------------------------------------------
+
+class FilterClient:
+    """
+    Pipelining asyncio client: any number of filter() calls may be in
+    flight on one connection; a reader task routes replies by id.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._next_id = 0
+        self._waiting = {}
+        self._receiver = asyncio.ensure_future(self._receive())
+
+    @classmethod
+    async def connect(cls, address=DEFAULT_ADDRESS):
+        kind, *where = parse_address(address)
+        if kind == "unix":
+            reader, writer = await asyncio.open_unix_connection(where[0])
+        else:
+            reader, writer = await asyncio.open_connection(where[0], where[1])
+        return cls(reader, writer)
+
+    async def _receive(self):
+        error = ConnectionError("connection closed")
+        try:
+            while True:
+                frame = await read_frame(self.reader)
+                if frame is None:
+                    break
+                header, payload = frame
+                future = self._waiting.pop(header.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result((header, payload))
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError) as e:
+            error = e
+        finally:
+            # Also on close(): no caller is left waiting for a reply
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._waiting.clear()
+
+    async def _call(self, header, *arrays):
+        self._next_id += 1
+        header = dict(header, id=self._next_id)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[self._next_id] = future
+        write_frame(self.writer, header, *arrays)
+        await self.writer.drain()
+        return await future
+
+    async def filter(self, input_signal, desired_signal, M):
+        """
+        h_opt, output and MMSE of one signal pair, as a dict with 'h',
+        'output', 'mmse', 'singular' and 'batch' (requests solved together).
+        Raises ValueError with the server's message on errors.
+        """
+        input_signal = np.asarray(input_signal, dtype=DTYPE)
+        desired_signal = np.asarray(desired_signal, dtype=DTYPE)
+        header, payload = await self._call({'op': 'filter', 'M': int(M), 'n': int(input_signal.shape[0])},
+                                           input_signal, desired_signal)
+        if header['status'] != 'ok':
+            raise ValueError(header.get('error', 'request failed'))
+        values = np.frombuffer(payload, dtype=DTYPE)
+        M = header['M']
+        return {'h': values[:M], 'output': values[M:], 'mmse': header['mmse'],
+                'singular': header['singular'], 'batch': header['batch']}
+
+    async def stats(self):
+        header, _ = await self._call({'op': 'stats'})
+        return header['stats']
+
+    async def close(self):
+        self.writer.close()
+        self._receiver.cancel()
+
+
+async def load_test(address, clients=16, requests=1000, N=1000, M=10, seed=0, log=print):
+    """
+    Sends `requests` filter calls from each of `clients` connections, one
+    outstanding call per connection, and reports client-side latency and
+    throughput plus the server's batching statistics.
+    """
+    rng = np.random.default_rng(seed)
+    desired = rng.standard_normal(N)
+    input_signal = desired + 0.5 * rng.standard_normal(N)
+    latencies = []
+
+    async def run_client():
+        client = await FilterClient.connect(address)
+        try:
+            for _ in range(requests):
+                t = time.perf_counter()
+                await client.filter(input_signal, desired, M)
+                latencies.append(time.perf_counter() - t)
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    lat = np.array(latencies) * 1000
+    p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+    log(f" {lat.size} requests (N={N}, M={M}) from {clients} client(s) in {elapsed:.2f} s: "
+        f"{lat.size / elapsed:.0f} req/s")
+    log(f" Latency p50 {p50:.2f} ms, p90 {p90:.2f} ms, p99 {p99:.2f} ms, max {lat.max():.2f} ms")
+    client = await FilterClient.connect(address)
+    stats = await client.stats()
+    await client.close()
+    log(f" Server: {stats['requests']} requests, {stats['batches']} batches, "
+        f"mean batch {stats['mean_batch']:.1f}, {stats['errors']} errors")
+    return lat.size / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Wiener filter service with request micro-batching.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("serve", help="Run the service")
+    s.add_argument("--listen", default=DEFAULT_ADDRESS,
+                   help=f"'host:port' or 'unix:PATH' (default: {DEFAULT_ADDRESS})")
+    s.add_argument("-j", "--workers", type=int, default=0, help="Solver workers (default: 0 = all cores)")
+    s.add_argument("--executor", choices=["process", "thread"], default="process",
+                   help="Run solves in worker processes (default) or threads")
+    s.add_argument("--deadline-ms", type=float, default=DEADLINE * 1000,
+                   help=f"Longest wait for a batch to fill (default: {DEADLINE * 1000:g} ms)")
+    s.add_argument("--max-batch", type=int, default=MAX_BATCH,
+                   help=f"Requests per batched solve (default: {MAX_BATCH})")
+    s.add_argument("--max-pending", type=int, default=MAX_PENDING,
+                   help=f"Admitted, unanswered requests before reads pause (default: {MAX_PENDING})")
+    s.add_argument("--report", type=float, default=10.0,
+                   help="Seconds between metrics lines (0 = off, default: 10)")
+
+    b = sub.add_parser("bench", help="Load-test a running service")
+    b.add_argument("--connect", default=DEFAULT_ADDRESS, help=f"Service address (default: {DEFAULT_ADDRESS})")
+    b.add_argument("-c", "--clients", type=int, default=16, help="Concurrent connections (default: 16)")
+    b.add_argument("-n", "--requests", type=int, default=1000, help="Requests per connection (default: 1000)")
+    b.add_argument("-N", type=int, default=1000, help="Signal length (default: 1000)")
+    b.add_argument("-M", type=int, default=10, help="Filter length (default: 10)")
+
+    t = sub.add_parser("stats", help="Print the metrics of a running service")
+    t.add_argument("--connect", default=DEFAULT_ADDRESS, help=f"Service address (default: {DEFAULT_ADDRESS})")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "serve":
+            workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+            asyncio.run(serve(args.listen, workers, args.executor, args.deadline_ms / 1000, args.max_batch,
+                              args.max_pending, args.report))
+        elif args.command == "bench":
+            asyncio.run(load_test(args.connect, args.clients, args.requests, args.N, args.M))
+        else:
+            async def fetch():
+                client = await FilterClient.connect(args.connect)
+                try:
+                    return await client.stats()
+                finally:
+                    await client.close()
+            print(json.dumps(asyncio.run(fetch()), indent=1))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import numpy as np
+import os
+import glob
+import argparse
+
+# Binary layout: signals are .npy files (opened with np.memmap through
+# np.load(mmap_mode='r')), expected results are expected.npz holding the
+# 'output' array and the scalar 'mmse'. Text files stay supported.
+NPY_MAGIC = b'\x93NUMPY'
+ZIP_MAGIC = b'PK\x03\x04'
+
+SIGNAL_NAMES = ("input", "desired")
+
+# Bytes read from a text signal file per read() call
+READ_CHUNK_BYTES = 1 << 20
+
+
+def _magic(path, size=6):
+    with open(path, 'rb') as f:
+        return f.read(size)
+
+
+def is_npy(path):
+    """True if path is a .npy file, whatever its extension."""
+    return _magic(path) == NPY_MAGIC
+
+
+def signal_path(folder, name):
+    """
+    Path of signal `name` ('input', 'desired') in folder, preferring the
+    binary name.npy over name.txt when both exist.
+    """
+    npy = os.path.join(folder, name + ".npy")
+    if os.path.exists(npy):
+        return npy
+    return os.path.join(folder, name + ".txt")
+
+
+def expected_path(folder):
+    """Path of the folder's expected results, preferring expected.npz."""
+    npz = os.path.join(folder, "expected.npz")
+    if os.path.exists(npz):
+        return npz
+    return os.path.join(folder, "expected.txt")
+
+
+def load_signal(path, mmap=True):
+    """
+    Loads a 1-D signal, detecting the format from the file contents.
+    .npy files are memory-mapped (read-only) unless mmap is False; text
+    files are parsed as whitespace-separated floats.
+    """
+    if is_npy(path):
+        return np.load(path, mmap_mode='r' if mmap else None)
+    with open(path, 'r') as f:
+        return np.array(f.read().split(), dtype=float)
+
+
+def load_expected(path):
+    """
+    Loads expected results as (output array, mmse).
+    Returns (empty array, None) for files without numeric results, such
+    as an expected error message.
+    """
+    if _magic(path, 4) == ZIP_MAGIC:
+        with np.load(path) as data:
+            return np.array(data['output']), float(data['mmse'])
+
+    with open(path, 'r') as f:
+        return parse_expected_text(f.read())
+
+
+def parse_expected_text(text):
+    """(output array, mmse) from the text of an expected.txt file."""
+    output_signal = np.array([])
+    mmse = None
+    for line in text.splitlines():
+        if "Filtered output:" in line:
+            numbers_str = line.split("Filtered output:")[1].strip()
+            output_signal = np.array(numbers_str.split(), dtype=float)
+        if "MMSE:" in line:
+            mmse = float(line.split("MMSE:")[1].strip())
+    return output_signal, mmse
+
+
+def read_blocks(path, block_size, read_chunk=READ_CHUNK_BYTES):
+    """
+    Yields float64 arrays of block_size samples (the last one may be
+    shorter) from a signal file without loading it whole: .npy files are
+    sliced from a memory map, text files are read read_chunk bytes at a
+    time.
+    """
+    if is_npy(path):
+        data = np.load(path, mmap_mode='r')
+        for start in range(0, data.shape[0], block_size):
+            yield np.array(data[start:start + block_size], dtype=float)
+        return
+
+    pending = np.zeros(0)
+    carry = ""
+    with open(path, 'r') as f:
+        while True:
+            text = f.read(read_chunk)
+            if not text:
+                break
+            text = carry + text
+            # The last token may continue in the next chunk
+            cut = len(text)
+            while cut > 0 and not text[cut - 1].isspace():
+                cut -= 1
+            carry = text[cut:]
+            values = np.array(text[:cut].split(), dtype=float)
+
+            pending = np.concatenate((pending, values)) if pending.size else values
+            while pending.shape[0] >= block_size:
+                yield pending[:block_size]
+                pending = pending[block_size:]
+
+    if carry.strip():
+        pending = np.concatenate((pending, np.array(carry.split(), dtype=float)))
+    while pending.shape[0] > 0:
+        yield pending[:block_size]
+        pending = pending[block_size:]
+
+
+def convert_text_signal(txt_path, npy_path, dtype=np.float64):
+    """Converts a whitespace text signal to .npy, streaming it block by block."""
+    count = 0
+    for block in read_blocks(txt_path, 1 << 20):
+        count += block.shape[0]
+
+    out = np.lib.format.open_memmap(npy_path, mode='w+', dtype=dtype, shape=(count,))
+    pos = 0
+    for block in read_blocks(txt_path, 1 << 20):
+        out[pos:pos + block.shape[0]] = block
+        pos += block.shape[0]
+    out.flush()
+    del out
+    return count
+
+
+def convert_folder(folder, dtype=np.float64):
+    """
+    Writes input.npy, desired.npy and expected.npz next to the text files
+    of one test folder. Expected files without numeric results (e.g. an
+    expected error) are left as text only. Returns the files written.
+    """
+    written = []
+    for name in SIGNAL_NAMES:
+        txt = os.path.join(folder, name + ".txt")
+        if os.path.exists(txt):
+            npy = os.path.join(folder, name + ".npy")
+            convert_text_signal(txt, npy, dtype)
+            written.append(npy)
+
+    txt = os.path.join(folder, "expected.txt")
+    if os.path.exists(txt):
+        output_signal, mmse = load_expected(txt)
+        if output_signal.size and mmse is not None:
+            npz = os.path.join(folder, "expected.npz")
+            np.savez(npz, output=output_signal.astype(dtype), mmse=mmse)
+            written.append(npz)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert text signals to the binary .npy/.npz layout.")
+    parser.add_argument("paths", nargs='*', default=[os.path.join("tests", "test_*")],
+                        help="Test folders, folder globs or single .txt signals (default: tests/test_*)")
+    parser.add_argument("--dtype", choices=["float64", "float32"], default="float64",
+                        help="Sample type of the binary files (default: float64)")
+    args = parser.parse_args()
+    dtype = np.dtype(args.dtype)
+
+    targets = []
+    for pattern in args.paths:
+        targets.extend(sorted(glob.glob(pattern)) or [pattern])
+
+    for target in targets:
+        if os.path.isdir(target):
+            written = convert_folder(target, dtype)
+            print(f"{target}: {', '.join(os.path.basename(w) for w in written) or 'nothing to convert'}")
+        elif os.path.isfile(target):
+            npy = os.path.splitext(target)[0] + ".npy"
+            count = convert_text_signal(target, npy, dtype)
+            print(f"{target} -> {npy} ({count} samples)")
+        else:
+            print(f"Error: '{target}' does not exist.")
+
+if __name__ == "__main__":
+    main()
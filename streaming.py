@@ -0,0 +1,89 @@
+import numpy as np
+
+from signal_io import read_blocks
+from wiener import solve_wiener
+
+
+class StreamingWiener:
+    """
+    Block-adaptive Wiener filter with O(M) state.
+    Keeps running autocorrelation / cross-correlation lags 0..M-1 and the
+    last M-1 input samples. Each update() folds one block into the lags
+    (optionally with exponential forgetting per sample), re-solves h_opt
+    and returns that block's filtered output.
+    """
+
+    def __init__(self, M, forgetting=1.0):
+        if not 0.0 < forgetting <= 1.0:
+            raise ValueError(f"forgetting factor must be in (0, 1], got {forgetting}")
+        self.M = M
+        self.forgetting = forgetting
+        self.rxx = np.zeros(M)
+        self.gamma_d = np.zeros(M)
+        self.h = np.zeros(M)
+        self.history = np.zeros(M - 1)
+        self.samples = 0
+        self.squared_error = 0.0
+        self.singular_solves = 0
+
+    @property
+    def mmse(self):
+        """Mean squared error of all output emitted so far."""
+        return self.squared_error / self.samples if self.samples else 0.0
+
+    def update(self, x_block, d_block):
+        """Consumes one block of input/desired samples, returns y for it."""
+        if x_block.shape != d_block.shape:
+            raise ValueError("input and desired blocks differ in length")
+        L = x_block.shape[0]
+        M = self.M
+
+        # ext[j + M-1] is the j-th new sample, earlier entries are history
+        ext = np.concatenate((self.history, x_block))
+
+        # Sample j of the block is weighted lambda^(L-1-j)
+        if self.forgetting < 1.0:
+            weights = self.forgetting ** np.arange(L - 1, -1, -1)
+            decay = self.forgetting ** L
+            self.rxx *= decay
+            self.gamma_d *= decay
+            xw = x_block * weights
+            dw = d_block * weights
+        else:
+            xw = x_block
+            dw = d_block
+
+        # correlate(ext, v, 'valid')[m] = sum_j ext[j+m] * v[j], lag = M-1-m
+        self.rxx += np.correlate(ext, xw, mode='valid')[::-1]
+        self.gamma_d += np.correlate(ext, dw, mode='valid')[::-1]
+
+        self.h, method = solve_wiener(self.rxx, self.gamma_d)
+        if method != 'levinson':
+            self.singular_solves += 1
+
+        # y[j] = sum_k h[k] * ext[j + M-1 - k]
+        y = np.convolve(ext, self.h, mode='valid')
+
+        self.history = ext[ext.shape[0] - (M - 1):].copy()
+        self.samples += L
+        self.squared_error += float(np.dot(d_block - y, d_block - y))
+        return y
+
+
+def stream_filter(input_path, desired_path, M, block_size=4096, forgetting=1.0):
+    """
+    Generator running StreamingWiener over two signal files (text or
+    .npy, see signal_io.read_blocks) in lock-step blocks of block_size samples. Memory use is O(M + block).
+    Yields (y_block, filt) after each block; filt exposes h, mmse, samples.
+    """
+    filt = StreamingWiener(M, forgetting)
+    x_blocks = read_blocks(input_path, block_size)
+    d_blocks = read_blocks(desired_path, block_size)
+    for x_block, d_block in zip(x_blocks, d_blocks):
+        if x_block.shape != d_block.shape:
+            raise ValueError("size not match")
+        yield filt.update(x_block, d_block), filt
+
+    # zip stops at the shorter stream; any leftover means a length mismatch
+    if next(x_blocks, None) is not None or next(d_blocks, None) is not None:
+        raise ValueError("size not match")
@@ -0,0 +1,233 @@
+import numpy as np
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from corpus import EXPECTED_TEXT_LIMIT, PackWriter
+from test import compute_case, format_output
+from wiener import fir_filter
+
+# Signal models and noise colours a case can be drawn from ('mixed' picks
+# one per case)
+KINDS = ("sinusoid", "ar")
+NOISES = ("white", "pink", "brown")
+
+# Spectral slope of each noise colour: power ~ 1 / f^alpha
+NOISE_ALPHA = {"white": 0.0, "pink": 1.0, "brown": 2.0}
+
+# Length of the truncated AR impulse response (poles have radius <= AR_RADIUS,
+# so AR_RADIUS^AR_TAPS is negligible)
+AR_TAPS = 256
+AR_RADIUS = 0.95
+
+# Cases generated per worker task, fewer when they are long so a task's
+# arrays stay around CHUNK_SAMPLES samples
+CHUNK_CASES = 256
+CHUNK_SAMPLES = 1 << 22
+
+FORMATS = ("txt", "npy", "pack")
+
+
+def parse_range(text, kind=float):
+    """'A' or 'A:B' as a (lo, hi) pair of kind."""
+    lo, _, hi = str(text).partition(":")
+    return kind(lo), kind(hi or lo)
+
+
+def _draw(rng, bounds, kind=float):
+    lo, hi = bounds
+    if lo == hi:
+        return lo
+    return int(rng.integers(lo, hi + 1)) if kind is int else float(rng.uniform(lo, hi))
+
+
+def sinusoid_signal(rng, N):
+    """Sum of 1-3 sinusoids with random frequencies, amplitudes and phases."""
+    n = np.arange(N)
+    signal = np.zeros(N)
+    for _ in range(int(rng.integers(1, 4))):
+        freq = rng.uniform(0.005, 0.45)
+        signal += rng.uniform(0.5, 5.0) * np.sin(2 * np.pi * freq * n + rng.uniform(0, 2 * np.pi))
+    return signal
+
+
+def ar_signal(rng, N):
+    """
+    AR(2)-AR(4) process with random stable poles, generated like
+    benchmark.make_signals: white noise through the process's truncated
+    impulse response with fir_filter.
+    """
+    order = int(rng.integers(2, 5))
+    poles = []
+    while len(poles) < order:
+        radius = rng.uniform(0.3, AR_RADIUS)
+        if order - len(poles) >= 2 and rng.random() < 0.5:
+            angle = rng.uniform(0.05, np.pi - 0.05)
+            poles += [radius * np.exp(1j * angle), radius * np.exp(-1j * angle)]
+        else:
+            poles.append(radius * rng.choice((-1.0, 1.0)))
+    a = np.real(np.poly(poles))
+
+    # h[k] = -sum_j a[j] h[k - j]: AR_TAPS steps, independent of N
+    h = np.zeros(min(AR_TAPS, N))
+    h[0] = 1.0
+    for k in range(1, h.shape[0]):
+        j = min(k, order)
+        h[k] = -np.dot(a[1:j + 1], h[k - 1::-1][:j])
+    return fir_filter(rng.standard_normal(N), h)
+
+
+def colored_noise(rng, N, color):
+    """Unit-power noise with a 1/f^alpha spectrum, shaped in the frequency domain."""
+    noise = rng.standard_normal(N)
+    alpha = NOISE_ALPHA[color]
+    if alpha and N > 2:
+        spectrum = np.fft.rfft(noise)
+        f = np.fft.rfftfreq(N)
+        f[0] = f[1]
+        noise = np.fft.irfft(spectrum / f ** (alpha / 2), N)
+    return noise / (np.std(noise) or 1.0)
+
+
+def make_case(seed, index, N, M, snr_db, kind, noise):
+    """
+    One reproducible case: the generator is seeded from (seed, index) so
+    the corpus does not depend on how it was split across workers.
+    N and snr_db are (lo, hi) ranges; kind and noise may be 'mixed'. The
+    expected results use M taps even when N < M, exactly as test.py -M M.
+    Returns (desired, input, h_opt, output, mmse, params).
+    """
+    rng = np.random.default_rng([seed, index])
+    N = _draw(rng, N, int)
+    snr = _draw(rng, snr_db)
+    kind = KINDS[int(rng.integers(len(KINDS)))] if kind == "mixed" else kind
+    noise = NOISES[int(rng.integers(len(NOISES)))] if noise == "mixed" else noise
+
+    desired = sinusoid_signal(rng, N) if kind == "sinusoid" else ar_signal(rng, N)
+    power = np.mean(desired ** 2)
+    input_signal = desired + np.sqrt(power / 10 ** (snr / 10)) * colored_noise(rng, N, noise)
+
+    # Expected results from the same pipeline run_test_case checks with
+    h, output, mmse = compute_case(desired, input_signal, M, quiet=True, log=lambda *a: None)
+    params = {'N': N, 'M': M, 'snr_db': snr, 'kind': kind, 'noise': noise}
+    return desired, input_signal, h, output, float(mmse), params
+
+
+def expected_text(output, mmse):
+    """expected.txt content in the format main.asm prints."""
+    return f"Filtered output: {format_output(output)}\nMMSE: {mmse:.1f}"
+
+
+def write_folder(folder, desired, input_signal, output, mmse, binary=False):
+    """Writes one case folder: .txt files, or .npy signals and expected.npz."""
+    os.makedirs(folder, exist_ok=True)
+    if binary:
+        np.save(os.path.join(folder, "desired.npy"), desired)
+        np.save(os.path.join(folder, "input.npy"), input_signal)
+        np.savez(os.path.join(folder, "expected.npz"), output=output, mmse=mmse)
+        return
+    # %.17g round-trips float64 exactly, so the text case reproduces expected
+    for name, signal in (("desired", desired), ("input", input_signal)):
+        with open(os.path.join(folder, name + ".txt"), 'w') as f:
+            f.write(" ".join(f"{v:.17g}" for v in signal))
+    with open(os.path.join(folder, "expected.txt"), 'w') as f:
+        f.write(expected_text(output, mmse))
+
+
+def case_name(index, count):
+    return f"test_{index:0{max(len(str(count - 1)), 3)}d}"
+
+
+def _generate_chunk(args):
+    """
+    Process-pool worker: generates cases [start, stop). Folder formats are
+    written here in parallel; for a pack the arrays go back to the parent,
+    which appends them in order (long expected outputs as arrays, like
+    corpus.read_folder). Returns (count, pack entries).
+    """
+    start, stop, count, seed, N, M, snr_db, kind, noise, fmt, dest = args
+    entries = []
+    for index in range(start, stop):
+        desired, input_signal, _, output, mmse, _ = make_case(seed, index, N, M, snr_db, kind, noise)
+        name = case_name(index, count)
+        if fmt == "pack":
+            parts = {'input_signal': input_signal, 'desired_signal': desired}
+            text = expected_text(output, mmse)
+            if len(text) <= EXPECTED_TEXT_LIMIT:
+                parts['expected_text'] = text
+            else:
+                parts.update(expected_output=output, mmse=mmse)
+            entries.append((name, parts))
+        else:
+            write_folder(os.path.join(dest, name), desired, input_signal, output, mmse, binary=(fmt == "npy"))
+    return stop - start, entries
+
+
+def generate(dest, count, seed=0, N=(1000, 1000), M=10, snr_db=(10.0, 10.0), kind="mixed",
+             noise="white", fmt="txt", workers=1, log=print):
+    """
+    Generates `count` cases into dest (a directory, or a pack file for
+    fmt='pack') across `workers` processes. Returns the elapsed seconds.
+    """
+    start = time.perf_counter()
+    if fmt != "pack":
+        os.makedirs(dest, exist_ok=True)
+    per_task = max(min(CHUNK_CASES, CHUNK_SAMPLES // max(N)), 1)
+    jobs = [(lo, min(lo + per_task, count), count, seed, N, M, snr_db, kind, noise, fmt, dest)
+            for lo in range(0, count, per_task)]
+
+    done = 0
+    # The pack is only renamed into place if every case was written
+    with PackWriter(dest) if fmt == "pack" else nullcontext() as writer:
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            results = pool.map(_generate_chunk, jobs) if pool is not None else map(_generate_chunk, jobs)
+            for n, entries in results:
+                for name, parts in entries:
+                    writer.add(name, **parts)
+                done += n
+                if log is not None and (done == count or done // per_task % 64 == 0):
+                    log(f" {done}/{count} cases ({time.perf_counter() - start:.1f} s)")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic test corpus with expected results.")
+    parser.add_argument("dest", help="Output directory (txt/npy) or pack file (--format pack)")
+    parser.add_argument("-n", "--count", type=int, default=100, help="Number of cases (default: 100)")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed (default: 0)")
+    parser.add_argument("-N", default="1000", help="Samples per case, 'N' or 'LO:HI' (default: 1000)")
+    parser.add_argument("-M", type=int, default=10, help="Filter length of the expected results (default: 10); "
+                             "test.py must run with the same -M")
+    parser.add_argument("--snr", default="10", help="Input SNR in dB, 'S' or 'LO:HI' (default: 10)")
+    parser.add_argument("--kind", choices=KINDS + ("mixed",), default="mixed",
+                        help="Desired signal model (default: mixed)")
+    parser.add_argument("--noise", choices=NOISES + ("mixed",), default="white",
+                        help="Noise colour (default: white)")
+    parser.add_argument("--format", choices=FORMATS, default="txt",
+                        help="'txt' folders like tests/, 'npy' binary folders, or one corpus 'pack' file")
+    parser.add_argument("-j", "--workers", type=int, default=0,
+                        help="Worker processes (default: 0 = all cores)")
+    args = parser.parse_args()
+
+    N = parse_range(args.N, int)
+    if min(N) < 1 or args.M < 1:
+        print("Error: N and M must be positive.")
+        return 1
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    print(f"Generating {args.count} cases (N={args.N}, M={args.M}, SNR={args.snr} dB, {args.kind}, "
+          f"{args.noise} noise, seed {args.seed}) into {args.dest} [{args.format}, {workers} worker(s)]")
+    elapsed = generate(args.dest, args.count, args.seed, N, args.M, parse_range(args.snr), args.kind,
+                       args.noise, args.format, workers)
+    print(f"Done in {elapsed:.2f} s ({args.count / max(elapsed, 1e-9):.0f} cases/s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,174 +1,827 @@
 import numpy as np
 import os
+import sys
 import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 
-# Filter length M 
+from adaptive import ALGORITHMS, BLOCK, NLMS_MU, adaptive_filter, learning_curve
+from corpus import is_pack, open_pack
+from instrument import Tracer, print_trace_summary, profiled, stage, write_trace
+from result_cache import CACHE_DIR, CACHE_MAX_BYTES, ResultCache
+from signal_io import expected_path, load_expected, load_signal, signal_path
+from spectral import SEGMENT, spectral_wiener
+from streaming import stream_filter
+from wiener import (autocorrelation, cross_correlation, fir_filter, solve_wiener, solve_wiener_batch,
+                    solve_wiener_multi)
+from wiener32 import (autocorrelation32, cross_correlation32, error_report, fir_filter32, format_mmse32,
+                      format_output32, levinson32, mmse32, to_float32)
+
+# Filter length M
 M = 10
 
-def run_test_case(folder_path):
-    # Print separator for clarity
-    print(f"\n{'-'*20} {os.path.basename(folder_path)} {'-'*20}")
+# Case status values reported by run_test_case
+STATUS_PASS = "PASS"
+STATUS_FAIL = "FAIL"
+STATUS_ERROR = "ERROR"
+STATUS_NO_EXPECTED = "NO_EXPECTED"
+# Non-FIR engines: results are reported next to expected.txt's FIR values
+STATUS_COMPARED = "COMPARED"
 
-    # Construct paths
-    desired_file = os.path.join(folder_path, "desired.txt")
-    input_file = os.path.join(folder_path, "input.txt")
-    expected_file = os.path.join(folder_path, "expected.txt")
+# Filter engines of compute_case
+ENGINES = ("fir", "spectral", "fir32", "asm32")
 
-    # Load Data
-    try:
-        desired_signal = np.loadtxt(desired_file)
-        input_signal = np.loadtxt(input_file)
-    except IOError as e:
-        print(f"Error loading files: {e}")
-        return
+# Single-precision engines and the summation order they use (see wiener32.py)
+FLOAT32_ENGINES = {"fir32": "fast", "asm32": "asm"}
 
-    N = desired_signal.shape[0]
+SIZE_MISMATCH_MSG = "Error: size not match"
 
-    # --- ORIGINAL PRINT FORMAT ---
-    print(f"\nDesired signal (N={N}): {desired_signal}")
-    print(f"Input signal (N={N}):   {input_signal}")
 
-    # Check for size mismatch
-    if desired_signal.shape[0] != input_signal.shape[0]:
-        print("\nError: size not match")
-        return
+def read_expected(expected_file):
+    """
+    Parses expected.txt (or the binary expected.npz) into
+    (output string, MMSE string, raw content).
+    """
+    if expected_file.endswith(".npz"):
+        output_signal, mmse = load_expected(expected_file)
+        return format_output(output_signal), f"{mmse:.1f}", ""
 
-    # --- CALCULATIONS ---
-    # calculate Autocorrelation Matrix R_M
-    rxx_full = np.correlate(input_signal, input_signal, mode='full')
-    zero_lag_index = N - 1
+    with open(expected_file, 'r') as f:
+        return parse_expected(f.read())
 
-    R_M = np.zeros((M, M))
-    for l in range(M):
-        for k in range(M):
-            lag = l - k
-            R_M[l, k] = rxx_full[zero_lag_index + lag]
 
-    # calculate Cross-Correlation Vector gamma_d
-    rdx_full = np.correlate(desired_signal, input_signal, mode='full')
-    gamma_d = rdx_full[zero_lag_index : zero_lag_index + M]
+def parse_expected(content):
+    """(output string, MMSE string, raw content) from expected.txt's text."""
+    # Parse 'Filtered output' from file
+    expected_output_line = [line for line in content.split('\n') if "Filtered output:" in line]
+    expected_out_str = ""
+    if expected_output_line:
+         # Split by ':' and strip whitespace
+        expected_out_str = expected_output_line[0].split(":")[1].strip()
+
+    # Parse 'MMSE' from file
+    expected_mmse_line = [line for line in content.split('\n') if "MMSE:" in line]
+    expected_mmse_val = ""
+    if expected_mmse_line:
+        expected_mmse_val = expected_mmse_line[0].split(":")[1].strip()
+
+    return expected_out_str, expected_mmse_val, content
+
+
+def case_expected(folder_path, case=None):
+    """
+    (output string, MMSE string, raw content) of a case's expected results,
+    or None if it has none. case is the PackedCase of a packed corpus
+    (see corpus.py), otherwise folder_path's expected file is read.
+    """
+    if case is None:
+        expected_file = expected_path(folder_path)
+        return read_expected(expected_file) if os.path.exists(expected_file) else None
+    if not case.has_expected():
+        return None
+    if case.expected_text() is not None:
+        return parse_expected(case.expected_text())
+    output_signal, mmse = case.expected()
+    return format_output(output_signal), f"{mmse:.1f}", ""
+
 
-    # solve for optimized Filter Coefficients h_opt
+def load_case(folder_path, quiet=False, log=print, case=None, tracer=None):
+    """
+    Loads the desired and input signals (.npy or .txt) from a test folder,
+    or from a PackedCase's memory-mapped payload when case is given.
+    Returns (desired, input, status): status is None when the signals are
+    usable, otherwise the case's final status (load error, size mismatch).
+    """
+    # Load Data (format detected from the file contents)
     try:
-        optimize_coefficient = np.linalg.solve(R_M, gamma_d)
-        print(f"h_opt: {optimize_coefficient}")
-    except np.linalg.LinAlgError:
-        print("Error: cannot solve for coefficients.")
-        return
+        with stage(tracer, "load") as info:
+            if case is not None:
+                desired_signal = case.signal("desired")
+                input_signal = case.signal("input")
+            else:
+                desired_signal = load_signal(signal_path(folder_path, "desired"))
+                input_signal = load_signal(signal_path(folder_path, "input"))
+            info.update(N=desired_signal.shape[0], desired=desired_signal, input=input_signal)
+    except (IOError, ValueError) as e:
+        log(f"Error loading files: {e}")
+        return None, None, STATUS_ERROR
+    except KeyError as e:
+        log(f"Error loading files: {e} is missing from the pack")
+        return None, None, STATUS_ERROR
 
-    # apply the Filter to Get Output y(n) (output_signal)
-    output_signal_full = np.convolve(input_signal, optimize_coefficient, mode='full')
-    output_signal = output_signal_full[:N]
+    N = desired_signal.shape[0]
 
-    # calculate MMSE
-    error = desired_signal - output_signal
-    mmse = np.mean(error ** 2)         
-    print(f" MMSE = {mmse:.4f}")
+    # --- ORIGINAL PRINT FORMAT ---
+    if not quiet:
+        log(f"\nDesired signal (N={N}): {desired_signal}")
+        log(f"Input signal (N={N}):   {input_signal}")
 
+    # Check for size mismatch
+    if desired_signal.shape[0] != input_signal.shape[0]:
+        log(f"\n{SIZE_MISMATCH_MSG}")
+        # Some cases expect exactly this error
+        expected = case_expected(folder_path, case)
+        if expected is not None:
+            _, _, content = expected
+            if content.strip() == SIZE_MISMATCH_MSG:
+                log(" [PASS] Error matches expected.txt.")
+                return desired_signal, input_signal, STATUS_PASS
+        return desired_signal, input_signal, STATUS_ERROR
 
-    # --- RESULTS & CHECKING ---
-    print("\n Results:")
-    
+    return desired_signal, input_signal, None
+
+
+def format_output(values):
+    """Formats samples to 1 decimal place like main.asm, space separated."""
     # --- Handle -0.0 rounding issue ---
     formatted_vals = []
-    for val in output_signal:
+    for val in values:
         # Format to 1 decimal place first
         s = f"{val:.1f}"
         # Check if it resulted in negative zero and fix it
         if s == "-0.0":
             s = "0.0"
         formatted_vals.append(s)
-    
-    output_str = " ".join(formatted_vals)
-    my_mmse_str = f"{mmse:.1f}"
-    
+
+    return " ".join(formatted_vals)
+
+
+def verify_output(folder_path, output_signal, mmse, quiet=False, log=print, engine="fir", case=None,
+                  tracer=None):
+    """
+    Formats the filtered output and MMSE like main.asm and compares them
+    with the folder's expected.txt (or the PackedCase's). Returns the case
+    status. expected.txt holds FIR results, so the spectral engine only
+    reports the MMSE next to it; the float32 engines print the way main.asm
+    does and are verified like fir.
+    """
+    try:
+        with stage(tracer, "verify", N=output_signal.shape[0]):
+            expected = case_expected(folder_path, case)
+    except Exception as e:
+        log(f" [Warning] Could not parse expected.txt: {e}")
+        return STATUS_ERROR
+
+    # --- RESULTS & CHECKING ---
+    if not quiet:
+        log("\n Results:")
+
+    with stage(tracer, "format", N=output_signal.shape[0]):
+        if engine in FLOAT32_ENGINES:
+            output_str = format_output32(output_signal)
+            my_mmse_str = format_mmse32(mmse)
+        else:
+            output_str = format_output(output_signal)
+            my_mmse_str = f"{mmse:.1f}"
+
     # 2. Print them (Original Format)
-    print(f"Filtered output: {output_str}")
-    print(f"MMSE: {my_mmse_str}")
+    if not quiet:
+        log(f"Filtered output: {output_str}")
+        log(f"MMSE: {my_mmse_str}")
 
     # 3. Verify against expected.txt
-    if os.path.exists(expected_file):
-        print("\n Verification:")
+    if expected is not None and engine == "spectral":
+        _, expected_mmse_val, _ = expected
+        log(f"\n [{engine}] MMSE {my_mmse_str} vs FIR (expected.txt) {expected_mmse_val or '-'}")
+        return STATUS_COMPARED
+    if expected is not None:
+        log("\n Verification:")
         try:
-            with open(expected_file, 'r') as f:
-                content = f.read()
-                
-            # Parse 'Filtered output' from file
-            expected_output_line = [line for line in content.split('\n') if "Filtered output:" in line]
-            expected_out_str = ""
-            if expected_output_line:
-                 # Split by ':' and strip whitespace
-                expected_out_str = expected_output_line[0].split(":")[1].strip()
-
-            # Parse 'MMSE' from file
-            expected_mmse_line = [line for line in content.split('\n') if "MMSE:" in line]
-            expected_mmse_val = ""
-            if expected_mmse_line:
-                expected_mmse_val = expected_mmse_line[0].split(":")[1].strip()
+            expected_out_str, expected_mmse_val, _ = expected
 
             # Perform the check
             output_match = (output_str == expected_out_str)
             mmse_match = (my_mmse_str == expected_mmse_val)
 
             if output_match and mmse_match:
-                print(" [PASS] Output matches expected.txt exactly.")
+                log(" [PASS] Output matches expected.txt exactly.")
+                return STATUS_PASS
             else:
-                print(" [FAIL] Output mismatch.")
+                log(" [FAIL] Output mismatch.")
                 if not output_match:
-                    print(f"  Expected output: {expected_out_str}")
-                    print(f"  Actual output:   {output_str}")
+                    log(f"  Expected output: {expected_out_str}")
+                    log(f"  Actual output:   {output_str}")
                 if not mmse_match:
-                    print(f"  Expected MMSE:   {expected_mmse_val}")
-                    print(f"  Actual MMSE:     {my_mmse_str}")
+                    log(f"  Expected MMSE:   {expected_mmse_val}")
+                    log(f"  Actual MMSE:     {my_mmse_str}")
+                return STATUS_FAIL
 
         except Exception as e:
-            print(f" [Warning] Could not parse expected.txt: {e}")
+            log(f" [Warning] Could not parse expected.txt: {e}")
+            return STATUS_ERROR
     else:
-        print(" [Info] No expected.txt found for verification.")
+        log(" [Info] No expected.txt found for verification.")
+        return STATUS_NO_EXPECTED
 
 
-def main():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
+def case_header(folder_path):
+    """Separator line printed before each case."""
+    return f"\n{'-'*20} {os.path.basename(folder_path)} {'-'*20}"
+
+
+def case_key(cache, folder_path, params, case=None):
+    """Result-cache key of a folder, or of a PackedCase from its stored digest."""
+    if cache is None:
+        return None
+    if case is not None:
+        return cache.key_digest(case.digest, **params)
+    return cache.key(folder_path, **params)
+
+
+def run_test_case(folder_path, M=M, quiet=False, log=print, cache=None, engine="fir", segment=SEGMENT,
+                  case=None, tracer=None):
+    """
+    Runs the Wiener filter on one test folder and checks it against
+    expected.txt. With case (a PackedCase), folder_path is the case name
+    and the data comes from the pack. Progress goes through log(); quiet
+    skips the signal dumps.
+    With a ResultCache, unchanged cases reuse the stored h_opt/output/MMSE.
+    engine and segment select the filter (see compute_case). With a Tracer
+    (see instrument.py) every stage is recorded under the case's name.
+    Returns a dict with 'name', 'status', 'mmse', 'cached' and 'time' (seconds).
+    """
+    start = time.perf_counter()
+    result = {'name': os.path.basename(folder_path), 'status': STATUS_ERROR, 'mmse': None,
+              'cached': False}
+
+    if tracer is not None:
+        tracer.context.update(case=result['name'], M=M)
+
+    # Print separator for clarity
+    log(case_header(folder_path))
+
+    # Hashing the signals for the key reads them, so it is a stage of its own
+    with stage(tracer if cache is not None else None, "cache"):
+        key = case_key(cache, folder_path, engine_params(engine, M, segment), case)
+        entry = cache.get(key) if key is not None else None
+
+    # A cached quiet run never needs to parse the signals
+    if entry is None or not quiet:
+        desired_signal, input_signal, status = load_case(folder_path, quiet, log, case, tracer)
+        if status is not None:
+            result['status'] = status
+            result['time'] = time.perf_counter() - start
+            return result
+
+    if entry is not None:
+        optimize_coefficient, output_signal, mmse = entry
+        result['cached'] = True
+        if not quiet:
+            log(f"h_opt: {optimize_coefficient}")
+        log(f" MMSE = {mmse:.4f} (cached)")
+    else:
+        optimize_coefficient, output_signal, mmse = compute_case(desired_signal, input_signal, M, quiet, log,
+                                                                 engine, segment, tracer)
+        if key is not None:
+            cache.put(key, optimize_coefficient, output_signal, mmse, source=folder_path)
+
+    result['mmse'] = float(mmse)
+    result['status'] = verify_output(folder_path, output_signal, mmse, quiet, log, engine, case, tracer)
+    result['time'] = time.perf_counter() - start
+    return result
+
+
+def engine_params(engine, M, segment):
+    """Parameters that determine a result, used as the cache key."""
+    # The FIR key is unchanged from before engines existed
+    if engine == "fir":
+        return {'M': M}
+    if engine in FLOAT32_ENGINES:
+        return {'engine': engine, 'M': M}
+    return {'engine': engine, 'segment': segment}
+
+
+def compute_case(desired_signal, input_signal, M=M, quiet=False, log=print, engine="fir", segment=SEGMENT,
+                 tracer=None):
+    """
+    The Wiener filter pipeline for one signal pair.
+    engine 'fir' solves the causal M-tap filter; 'spectral' estimates the
+    non-causal filter H(f) = S_dx / S_xx from Welch spectra with segments
+    of `segment` samples (M is unused); 'fir32' and 'asm32' run the fir
+    pipeline in single precision (see compute_case32). Each stage is timed
+    into tracer when one is given.
+    Returns (h_opt, output signal, MMSE).
+    """
+    if engine == "spectral":
+        with stage(tracer, "spectral", N=input_signal.shape[0], segment=segment) as info:
+            optimize_coefficient, output_signal, mmse = spectral_wiener(input_signal, desired_signal, segment)
+            info['h'] = optimize_coefficient
+        if not quiet:
+            log(f"h (lags -{optimize_coefficient.shape[0] // 2}..): {optimize_coefficient}")
+        log(f" MMSE = {mmse:.4f}")
+        return optimize_coefficient, output_signal, mmse
+    if engine in FLOAT32_ENGINES:
+        return compute_case32(desired_signal, input_signal, M, quiet, log, engine, tracer)
+    if engine != "fir":
+        raise ValueError(f"Unknown engine: {engine}")
+
+    N = input_signal.shape[0]
+
+    # --- CALCULATIONS ---
+    # calculate Autocorrelation lags r_xx(0..M-1) (first column of Toeplitz R_M)
+    with stage(tracer, "autocorrelation", N=N):
+        rxx = autocorrelation(input_signal, M)
+
+    # calculate Cross-Correlation Vector gamma_d
+    with stage(tracer, "cross_correlation", N=N):
+        gamma_d = cross_correlation(desired_signal, input_signal, M)
+
+    # solve for optimized Filter Coefficients h_opt (Levinson-Durbin, O(M^2),
+    # works on the lags directly, so R_M is never built)
+    with stage(tracer, "solve", N=N) as info:
+        optimize_coefficient, method = solve_wiener(rxx, gamma_d)
+        info['method'] = method
+    if method != 'levinson':
+        log("Warning: R_M is singular, using least-squares solution.")
+    if not quiet:
+        log(f"h_opt: {optimize_coefficient}")
+
+    # apply the Filter to Get Output y(n) (direct or FFT overlap-add, picked from N and M)
+    with stage(tracer, "convolution", N=N) as info:
+        output_signal = fir_filter(input_signal, optimize_coefficient)
+        info['output'] = output_signal
+
+    # calculate MMSE
+    with stage(tracer, "mmse", N=N):
+        error = desired_signal - output_signal
+        mmse = np.mean(error ** 2)
+    log(f" MMSE = {mmse:.4f}")
+
+    return optimize_coefficient, output_signal, mmse
+
+
+def compute_case32(desired_signal, input_signal, M=M, quiet=False, log=print, engine="asm32", tracer=None):
+    """
+    The fir pipeline in float32, like main.asm (half the memory and
+    bandwidth of float64). 'asm32' sums in the assembly's order and
+    reproduces its h_opt and output bit for bit; 'fir32' lets BLAS/SIMD
+    order the sums. Levinson stops at a singular R_M as main.asm does.
+    Unless quiet, the deviation from the float64 pipeline is logged next
+    to its bound (see wiener32.error_report).
+    Returns (h_opt, output signal, MMSE) in float32.
+    """
+    order = FLOAT32_ENGINES[engine]
+    N = input_signal.shape[0]
+
+    # float32 .npy signals are used in place, others are rounded once
+    with stage(tracer, "convert", N=N) as info:
+        x = to_float32(input_signal)
+        d = to_float32(desired_signal)
+        info.update(input=x, desired=d)
+
+    with stage(tracer, "autocorrelation", N=N):
+        rxx = autocorrelation32(x, M, order)
+    with stage(tracer, "cross_correlation", N=N):
+        gamma_d = cross_correlation32(d, x, M, order)
+
+    with stage(tracer, "solve", N=N) as info:
+        optimize_coefficient, reached = levinson32(rxx, gamma_d)
+        info['order'] = reached
+    if reached < M:
+        log(f"Warning: R_M is singular, Levinson stopped at order {reached} (remaining taps 0, like main.asm).")
+    if not quiet:
+        log(f"h_opt: {optimize_coefficient}")
+
+    with stage(tracer, "convolution", N=N) as info:
+        output_signal = fir_filter32(x, optimize_coefficient, order)
+        info['output'] = output_signal
+
+    with stage(tracer, "mmse", N=N):
+        mmse = mmse32(d, output_signal, order)
+    log(f" MMSE = {mmse:.4f}")
+
+    if not quiet:
+        r = error_report(desired_signal, input_signal, M, optimize_coefficient, output_signal, mmse)
+        log(f" float32 vs float64: max|dh| = {r['h_err']:.2e}, max|dy| = {r['y_err']:.2e} "
+            f"(bound {r['y_bound']:.2e}), |dMMSE| = {r['mmse_err']:.2e} (bound {r['mmse_bound']:.2e}), "
+            f"{r['printed_diff']} printed value(s) differ")
+
+    return optimize_coefficient, output_signal, mmse
+
+
+def run_vectorized(test_folders, M=M, quiet=False, cache=None, pack=None, tracer=None):
+    """
+    Batch mode that solves all cases of equal length N together with
+    solve_wiener_batch instead of one solve per folder. Logs are printed
+    in folder order; each case is charged its share of its group's time.
+    Cached cases skip the solve. With a CorpusPack, test_folders are its
+    case names. A Tracer records per-case stages and one 'batch_solve'
+    per group. Returns the list of result dicts.
+    """
+    cases = [pack[name] if pack is not None else None for name in test_folders]
+    results = []
+    logs = []
+    keys = []
+    groups = {}
+
+    for i, folder in enumerate(test_folders):
+        start = time.perf_counter()
+        lines = [case_header(folder)]
+        if tracer is not None:
+            tracer.context.update(case=os.path.basename(folder), M=M)
+        with stage(tracer if cache is not None else None, "cache"):
+            key = case_key(cache, folder, {'M': M}, cases[i])
+            entry = cache.get(key) if key is not None else None
+        status = None
+        if entry is None or not quiet:
+            desired_signal, input_signal, status = load_case(folder, quiet, lines.append, cases[i], tracer)
+
+        results.append({'name': os.path.basename(folder), 'status': status, 'mmse': None,
+                        'cached': False, 'time': time.perf_counter() - start})
+        logs.append(lines)
+        keys.append(key)
+        if status is not None:
+            continue
+
+        if entry is not None:
+            h, output_signal, mmse = entry
+            if not quiet:
+                lines.append(f"h_opt: {h}")
+            lines.append(f" MMSE = {mmse:.4f} (cached)")
+            results[i]['mmse'] = mmse
+            results[i]['cached'] = True
+            results[i]['status'] = verify_output(folder, output_signal, mmse, quiet, lines.append,
+                                                 case=cases[i], tracer=tracer)
+            results[i]['time'] = time.perf_counter() - start
+        else:
+            groups.setdefault(input_signal.shape[0], []).append((i, input_signal, desired_signal))
+
+    for N, group in groups.items():
+        start = time.perf_counter()
+        if tracer is not None:
+            tracer.context.update(case=None, M=M)
+        with stage(tracer, "batch_solve", N=N, batch=len(group)) as info:
+            X = np.stack([c[1] for c in group])
+            D = np.stack([c[2] for c in group])
+            H, Y, mmse, singular = solve_wiener_batch(X, D, M)
+            info.update(X=X, Y=Y)
+        share = (time.perf_counter() - start) / len(group)
+
+        for b, (i, _, _) in enumerate(group):
+            start = time.perf_counter()
+            log = logs[i].append
+            if tracer is not None:
+                tracer.context['case'] = results[i]['name']
+            if singular[b]:
+                log("Warning: R_M is singular, using least-squares solution.")
+            if not quiet:
+                log(f"h_opt: {H[b]}")
+            log(f" MMSE = {mmse[b]:.4f}")
+            results[i]['mmse'] = float(mmse[b])
+            results[i]['status'] = verify_output(test_folders[i], Y[b], mmse[b], quiet, log, case=cases[i],
+                                                 tracer=tracer)
+            if keys[i] is not None:
+                cache.put(keys[i], H[b], Y[b], mmse[b], source=test_folders[i])
+            results[i]['time'] += share + time.perf_counter() - start
+
+    for lines in logs:
+        print("\n".join(lines))
+    return results
+
+
+# Tracer of the current process for traced batch runs, created on first use
+_TRACER = None
+
+
+def _run_case_captured(args):
+    """
+    Process-pool worker: runs one case and returns (result, log lines).
+    When trace is not None (True also traces memory) the case's stage
+    records come back in result['trace'].
+    """
+    global _TRACER
+    folder_path, M, quiet, cache_dir, engine, segment, pack_path, trace = args
+    cache = ResultCache(cache_dir) if cache_dir is not None else None
+    case = open_pack(pack_path)[folder_path] if pack_path is not None else None
+    tracer = None
+    if trace is not None:
+        if _TRACER is None or _TRACER.memory != trace:
+            _TRACER = Tracer(memory=trace)
+        tracer = _TRACER
+    lines = []
+    result = run_test_case(folder_path, M=M, quiet=quiet, log=lines.append, cache=cache,
+                           engine=engine, segment=segment, case=case, tracer=tracer)
+    if tracer is not None:
+        result['trace'] = tracer.take()
+    return result, lines
+
+
+def run_batch(test_folders, M=M, workers=1, quiet=False, cache_dir=None, engine="fir", segment=SEGMENT,
+              pack_path=None, trace=None):
+    """
+    Runs every folder, serially or across a process pool, printing each
+    case's log in folder order. With pack_path, test_folders are case names
+    of that pack and each worker memory-maps it once. trace (False: time
+    only, True: time and memory) adds each case's stage records as
+    result['trace']. Returns the list of result dicts.
+    """
+    jobs = [(folder, M, quiet, cache_dir, engine, segment, pack_path, trace) for folder in test_folders]
+    results = []
+
+    if workers <= 1:
+        for job in jobs:
+            result, lines = _run_case_captured(job)
+            print("\n".join(lines))
+            results.append(result)
+        return results
+
+    # Large chunks keep IPC overhead low for the tiny N=10 cases
+    chunksize = max(1, len(jobs) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result, lines in pool.map(_run_case_captured, jobs, chunksize=chunksize):
+            print("\n".join(lines))
+            results.append(result)
+    return results
+
+
+def run_stream(input_file, desired_file, M=M, block_size=4096, forgetting=1.0, quiet=False):
+    """
+    Streaming mode: filters the two signal files block by block with
+    StreamingWiener, printing each block's output as it is produced.
+    Memory stays O(M + block) however long the files are.
+    """
+    print(f"\n[Mode] Streaming {input_file} / {desired_file} (M={M}, block={block_size}, forgetting={forgetting})")
+
+    filt = None
+    if not quiet:
+        print("Filtered output: ", end="")
+    try:
+        for i, (y_block, filt) in enumerate(stream_filter(input_file, desired_file, M, block_size, forgetting)):
+            if not quiet:
+                print((" " if i else "") + format_output(y_block), end="", flush=True)
+    except ValueError as e:
+        print(f"\nError: {e}")
+        return 1
+    except IOError as e:
+        print(f"\nError loading files: {e}")
+        return 1
+
+    if filt is None:
+        print("\nError: empty signal")
+        return 1
+    if not quiet:
+        print(f"\nMMSE: {filt.mmse:.1f}")
+        print(f"h_opt: {filt.h}")
+    print(f" Samples = {filt.samples}, MMSE = {filt.mmse:.4f}, singular re-solves = {filt.singular_solves}")
+    return 0
+
+
+def run_multi(input_file, target_files, M=M, quiet=False):
+    """
+    Multi-target mode: one input signal against many desired signals
+    (each target file holds one signal, or a 2-D .npy holds one per row).
+    R_M is factored once and every channel is solved and filtered in one
+    batched pass (see wiener.solve_wiener_multi).
+    """
+    print(f"\n[Mode] Multi-target {input_file} against {len(target_files)} target file(s) (M={M})")
+    try:
+        input_signal = np.array(load_signal(input_file), dtype=float)
+        names = []
+        rows = []
+        for path in target_files:
+            data = np.atleast_2d(np.array(load_signal(path), dtype=float))
+            names.extend([path] if data.shape[0] == 1 else [f"{path}[{i}]" for i in range(data.shape[0])])
+            rows.append(data)
+    except (IOError, ValueError) as e:
+        print(f"Error loading files: {e}")
+        return 1
+    if any(r.shape[1] != input_signal.shape[0] for r in rows):
+        print("Error: size not match")
+        return 1
+
+    start = time.perf_counter()
+    H, Y, mmse, method = solve_wiener_multi(input_signal, np.concatenate(rows), M)
+    elapsed = time.perf_counter() - start
+
+    width = max(len(n) for n in names) + 2
+    for name, h, y, e in zip(names, H, Y, mmse):
+        print(f"{name:<{width}}MMSE: {e:.1f}")
+        if not quiet:
+            print(f"{'':<{width}}Filtered output: {format_output(y)}")
+            print(f"{'':<{width}}h_opt: {h}")
+    print(f" Channels = {len(names)}, samples = {input_signal.shape[0]}, solver = {method}, "
+          f"time = {elapsed*1000:.2f} ms")
+    return 0
+
+
+def run_adaptive(input_file, desired_file, M=M, algorithm="nlms", block_size=BLOCK, mu=NLMS_MU,
+                 forgetting=1.0, quiet=False):
+    """
+    Adaptive mode: NLMS or RLS over --input/--desired, weights updated once
+    per block of samples (see adaptive.py). Prints the output and final
+    weights like the other modes, then the learning curve as the mean
+    squared a priori error of ten equal spans of the signal.
+    """
+    print(f"\n[Mode] Adaptive {algorithm.upper()} {input_file} / {desired_file} (M={M}, block={block_size})")
+    try:
+        input_signal = np.array(load_signal(input_file), dtype=float)
+        desired_signal = np.array(load_signal(desired_file), dtype=float)
+    except (IOError, ValueError) as e:
+        print(f"Error loading files: {e}")
+        return 1
+    if input_signal.shape != desired_signal.shape:
+        print(SIZE_MISMATCH_MSG)
+        return 1
+
+    params = {'mu': mu} if algorithm == 'nlms' else {'forgetting': forgetting}
+    start = time.perf_counter()
+    try:
+        output_signal, errors, filt = adaptive_filter(input_signal, desired_signal, M, algorithm,
+                                                      block_size, **params)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    if not quiet:
+        print(f"Filtered output: {format_output(output_signal)}")
+        print(f"MMSE: {filt.mmse:.1f}")
+        print(f"h_opt: {filt.h}")
+    spans = np.array_split(learning_curve(errors), min(10, errors.shape[0]))
+    print(" Learning curve: " + " ".join(f"{np.mean(s):.4g}" for s in spans))
+    print(f" Samples = {filt.samples}, MMSE = {filt.mmse:.4f}, time = {elapsed*1000:.2f} ms")
+    return 0
+
+
+def print_summary(results, wall_time):
+    """Prints pass/fail counts and timing for a batch run."""
+    counts = {}
+    for r in results:
+        counts[r['status']] = counts.get(r['status'], 0) + 1
+    case_time = sum(r['time'] for r in results)
+
+    statuses = (STATUS_PASS, STATUS_FAIL, STATUS_ERROR, STATUS_NO_EXPECTED, STATUS_COMPARED)
+    # Label column wide enough for the longest status (and 'Wall time:')
+    width = max(len(s) for s in statuses + ("Wall time",)) + 2
+
+    def row(label, value):
+        print(f" {label + ':':<{width}}{value}")
 
     print(f"\n{'='*30}")
-    print(" SELECT TEST MODE")
-    print(f"{'='*30}")
-    print(" 1. Run LOCAL files (input.txt & desired.txt in this folder)")
-    print(" 2. Run BATCH tests (all folders inside tests/ directory)")
+    print(" SUMMARY")
     print(f"{'='*30}")
-    
-    choice = input("Enter option (1 or 2): ").strip()
+    row("Cases", len(results))
+    for status in statuses:
+        if counts.get(status):
+            row(status, counts[status])
+    cached = sum(1 for r in results if r.get('cached'))
+    if cached:
+        row("Cached", f"{cached} of {len(results)}")
+    row("Wall time", f"{wall_time:.3f} s (case time {case_time:.3f} s)")
 
-    # --- OPTION 1: Local Files ---
-    if choice == '1':
+    failed = [r['name'] for r in results if r['status'] in (STATUS_FAIL, STATUS_ERROR)]
+    if failed:
+        row("Failed", ", ".join(failed))
+
+    slowest = sorted(results, key=lambda r: r['time'], reverse=True)[:5]
+    if slowest:
+        row("Slowest", ", ".join(f"{r['name']} ({r['time']*1000:.1f} ms)" for r in slowest))
+
+def main():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Run the Wiener filter model against test cases.")
+    parser.add_argument("--mode", choices=["local", "batch", "stream", "multi", "adaptive"], default="batch",
+                        help="'local': input.txt & desired.txt in this folder, "
+                             "'batch': all folders matching --tests (default), "
+                             "'stream': block-adaptive filter over --input/--desired, "
+                             "'multi': one --input against every --targets signal, "
+                             "'adaptive': NLMS/RLS over --input/--desired with a learning curve")
+    parser.add_argument("--tests", default=os.path.join("tests", "test_*"),
+                        help="Glob for batch test folders (default: tests/test_*); with --pack, "
+                             "matched against the case names")
+    parser.add_argument("--pack", default=None, metavar="FILE",
+                        help="Batch mode: run the cases of a corpus pack (see corpus.py) instead of folders")
+    parser.add_argument("-M", type=int, default=M, help=f"Filter length (default: {M})")
+    parser.add_argument("--engine", choices=ENGINES, default="fir",
+                        help="'fir': causal M-tap Wiener filter (default), "
+                             "'spectral': non-causal H(f) = S_dx/S_xx from Welch spectra, "
+                             "'asm32': fir in float32 with main.asm's summation order (bit-exact), "
+                             "'fir32': fir in float32 with SIMD summation order (fastest)")
+    parser.add_argument("--segment", type=int, default=SEGMENT,
+                        help=f"Spectral engine: Welch segment length (default: {SEGMENT}, clipped to N)")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="Worker processes for batch mode (0 = all cores)")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="Do not print signal arrays and coefficients")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="Solve equal-length cases together in one batched solve")
+    parser.add_argument("--cache", nargs='?', const=CACHE_DIR, default=None, metavar="DIR",
+                        help=f"Reuse results of unchanged cases from a result cache (default dir: {CACHE_DIR})")
+    parser.add_argument("--cache-max-mb", type=float, default=CACHE_MAX_BYTES / 2**20,
+                        help="Size bound of the result cache, LRU entries are evicted after the run")
+    parser.add_argument("--trace", nargs='?', const="trace.jsonl", default=None, metavar="FILE",
+                        help="Time every pipeline stage of the batch, write a JSON-lines trace "
+                             "(default file: trace.jsonl) and print a per-stage summary")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="With --trace, also record each stage's peak allocation (tracemalloc, slower)")
+    parser.add_argument("--profile", nargs='?', const="batch.prof", default=None, metavar="FILE",
+                        help="Run the batch under cProfile and save the stats (default file: batch.prof); "
+                             "with -j > 1 the cases run in workers and are not profiled")
+    parser.add_argument("--input", default=signal_path(current_dir, "input"),
+                        help="Input signal file (.txt or .npy) for stream, multi and adaptive mode")
+    parser.add_argument("--desired", default=signal_path(current_dir, "desired"),
+                        help="Desired signal file (.txt or .npy) for stream and adaptive mode")
+    parser.add_argument("--targets", nargs='+', default=[],
+                        help="Multi mode: desired signal files (2-D .npy files hold one signal per row)")
+    parser.add_argument("--block", type=int, default=4096,
+                        help="Stream mode: samples per block, h_opt is re-solved every block")
+    parser.add_argument("--forgetting", type=float, default=1.0,
+                        help="Stream mode and RLS: exponential forgetting factor in (0, 1]")
+    parser.add_argument("--algorithm", choices=sorted(ALGORITHMS), default="nlms",
+                        help="Adaptive mode: 'nlms' (O(M) per sample) or 'rls' (O(M^2) per sample)")
+    parser.add_argument("--update-block", type=int, default=BLOCK,
+                        help=f"Adaptive mode: samples per weight update (default: {BLOCK}, 1 = per sample)")
+    parser.add_argument("--mu", type=float, default=NLMS_MU,
+                        help=f"Adaptive mode: NLMS step size in (0, 2) (default: {NLMS_MU})")
+    args = parser.parse_args()
+
+    # --- Streaming ---
+    if args.mode == 'stream':
+        return run_stream(args.input, args.desired, M=args.M, block_size=args.block,
+                          forgetting=args.forgetting, quiet=args.quiet)
+
+    # --- Adaptive ---
+    if args.mode == 'adaptive':
+        return run_adaptive(args.input, args.desired, M=args.M, algorithm=args.algorithm,
+                            block_size=args.update_block, mu=args.mu, forgetting=args.forgetting,
+                            quiet=args.quiet)
+
+    # --- Multi-target ---
+    if args.mode == 'multi':
+        if not args.targets:
+            print("Error: multi mode needs --targets")
+            return 1
+        return run_multi(args.input, args.targets, M=args.M, quiet=args.quiet)
+
+    # --- Local Files ---
+    if args.mode == 'local':
         print(f"\n[Mode] Running local files in: {current_dir}")
-        
+
         # Check if files exist
-        local_input = os.path.join(current_dir, "input.txt")
-        local_desired = os.path.join(current_dir, "desired.txt")
+        local_input = signal_path(current_dir, "input")
+        local_desired = signal_path(current_dir, "desired")
 
         if os.path.exists(local_input) and os.path.exists(local_desired):
-            # Pass current directory to your existing function
-            run_test_case(current_dir) 
+            cache = ResultCache(args.cache, int(args.cache_max_mb * 2**20)) if args.cache else None
+            run_test_case(current_dir, M=args.M, quiet=args.quiet, cache=cache,
+                          engine=args.engine, segment=args.segment)
+            if cache is not None:
+                cache.prune()
         else:
             print(f"Error: Could not find 'input.txt' or 'desired.txt' in {current_dir}")
+            return 1
+        return 0
 
-    # --- OPTION 2: Batch Tests ---
-    elif choice == '2':
-        print("\n[Mode] Running batch tests from 'tests/' folder...")
-        
-        test_folders = sorted(glob.glob(os.path.join("tests", "test_*")))
-        
-        if not test_folders:
-            print("No test folders found in 'tests/' directory.")
-            return
-
-        for folder in test_folders:
-            if os.path.isdir(folder):
-                run_test_case(folder)
-                
+    # --- Batch Tests ---
+    pack = None
+    if args.pack:
+        if not is_pack(args.pack):
+            print(f"Error: '{args.pack}' is not a corpus pack.")
+            return 1
+        pack = open_pack(args.pack)
+        test_folders = pack.select(args.tests)
+        print(f"\n[Mode] Running {len(test_folders)} cases of {args.pack} matching '{args.tests}'...")
     else:
-        print("\nInvalid selection. Please run the script again and choose 1 or 2.")
+        print(f"\n[Mode] Running batch tests matching '{args.tests}'...")
+        test_folders = [f for f in sorted(glob.glob(args.tests)) if os.path.isdir(f)]
+
+    if not test_folders:
+        print(f"No test folders found matching '{args.tests}'.")
+        return 1
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    start = time.perf_counter()
+    cache = ResultCache(args.cache, int(args.cache_max_mb * 2**20)) if args.cache else None
+    if args.vectorized and args.engine != "fir":
+        print("Error: --vectorized only supports the fir engine.")
+        return 1
+    trace = args.trace_memory if (args.trace or args.trace_memory) else None
+
+    with profiled(args.profile) if args.profile else nullcontext():
+        if args.vectorized:
+            tracer = Tracer(memory=trace) if trace is not None else None
+            results = run_vectorized(test_folders, M=args.M, quiet=args.quiet, cache=cache, pack=pack,
+                                     tracer=tracer)
+            records = tracer.take() if tracer is not None else []
+        else:
+            results = run_batch(test_folders, M=args.M, workers=workers, quiet=args.quiet,
+                                cache_dir=args.cache, engine=args.engine, segment=args.segment,
+                                pack_path=args.pack, trace=trace)
+            records = [record for r in results for record in r.pop('trace', [])]
+    print_summary(results, time.perf_counter() - start)
+    if trace is not None:
+        print_trace_summary(records)
+        path = args.trace or "trace.jsonl"
+        write_trace(records, path)
+        print(f"\n Trace ({len(records)} stage records) saved to: {os.path.abspath(path)}")
+    if cache is not None:
+        cache.prune()
+
+    failed = any(r['status'] in (STATUS_FAIL, STATUS_ERROR) for r in results)
+    return 1 if failed else 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import asyncio
+import unittest
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from service import FRAME, FilterClient, FilterService
+
+# Protocol robustness of service.py: run with `py -m unittest test_service`
+
+
+class TruncatedFrameTest(unittest.IsolatedAsyncioTestCase):
+    """Clients that vanish mid-frame must not leak max_pending slots."""
+
+    async def asyncSetUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.service = FilterService(self.executor, max_pending=2, log=lambda *args: None)
+        self.server = await asyncio.start_server(self.service.handle, host="127.0.0.1", port=0)
+        self.address = "127.0.0.1:%d" % self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.executor.shutdown()
+
+    async def _send_and_close(self, data):
+        reader, writer = await asyncio.open_connection(*self.address.split(":"))
+        writer.write(data)
+        await writer.drain()
+        writer.close()
+        # The server drops the connection once it sees the frame is cut short
+        self.assertEqual(await asyncio.wait_for(reader.read(), 5), b"")
+
+    async def test_truncated_frames_release_slots(self):
+        header = b'{"op":"ping","id":1}'
+        await self._send_and_close(FRAME.pack(len(header), 0) + header[:5])
+        await self._send_and_close(FRAME.pack(len(header), 16) + header)
+        await self._send_and_close(FRAME.pack(len(header), 0)[:3])
+        await self._send_and_close(FRAME.pack(5, 0) + b"[1,2]")
+        self.assertEqual(self.service._slots._value, 2)
+
+        client = await FilterClient.connect(self.address)
+        try:
+            x = np.random.default_rng(0).standard_normal(64)
+            result = await asyncio.wait_for(client.filter(x, x, 4), 5)
+            self.assertEqual(result['h'].shape, (4,))
+        finally:
+            await client.close()
+
+    async def test_client_fails_pending_calls_on_truncated_reply(self):
+        async def cut_reply(reader, writer):
+            await reader.read(FRAME.size)
+            writer.write(FRAME.pack(100, 0) + b'{"id":1')
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(cut_reply, host="127.0.0.1", port=0)
+        try:
+            port = server.sockets[0].getsockname()[1]
+            client = await FilterClient.connect("127.0.0.1:%d" % port)
+            with self.assertRaises(asyncio.IncompleteReadError):
+                await asyncio.wait_for(client.stats(), 5)
+            await client.close()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+
+if __name__ == "__main__":
+    unittest.main()
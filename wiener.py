@@ -0,0 +1,472 @@
+import numpy as np
+
+# Relative floor on the Levinson prediction error. Below this the Toeplitz
+# system is treated as singular / ill-conditioned and we fall back to lstsq.
+SINGULAR_TOL = 1e-12
+
+# Cost factor of one FFT-based pass relative to a direct multiply-add. The
+# engines switch to FFT once N*M exceeds FFT_COST * L*log2(L).
+FFT_COST = 4.0
+
+# Elements of the (N, M) input window matrix materialized at a time by the
+# shared-input engine's direct path
+WINDOW_CHUNK = 1 << 22
+
+
+def _next_pow2(n):
+    """Smallest power of two >= n."""
+    return 1 << max(int(n) - 1, 0).bit_length()
+
+
+def _prefer_fft(direct_ops, fft_len, n_ffts):
+    """Cost model used by the 'auto' method of the engines below."""
+    return direct_ops > FFT_COST * n_ffts * fft_len * np.log2(max(fft_len, 2))
+
+
+def autocorrelation(x, M, method='auto'):
+    """
+    Returns lags 0..M-1 of sum(x[n] * x[n+k]).
+    Lags at or beyond len(x) are zero.
+    """
+    return cross_correlation(x, x, M, method=method)
+
+
+def cross_correlation(d, x, M, method='auto'):
+    """
+    Returns lags 0..M-1 of sum(d[n+k] * x[n]), i.e. gamma_d.
+    Lags at or beyond len(x) are zero. Only the M requested lags are
+    computed; method is 'direct', 'fft' or 'auto' (picked from N and M).
+    """
+    N = x.shape[0]
+    count = min(M, N)
+    lags = np.zeros(M)
+    if count == 0:
+        return lags
+
+    L = _next_pow2(N + count - 1)
+    if method == 'auto':
+        method = 'fft' if _prefer_fft(N * count, L, 3) else 'direct'
+
+    if method == 'fft':
+        # Zero padding to N + M - 1 keeps lags 0..M-1 free of circular wrap
+        spec = np.fft.rfft(d, L) * np.conj(np.fft.rfft(x, L))
+        lags[:count] = np.fft.irfft(spec, L)[:count]
+    elif method == 'direct':
+        # 'valid' over d padded with M-1 zeros yields exactly lags 0..M-1
+        padded = np.concatenate((d, np.zeros(count - 1)))
+        lags[:count] = np.correlate(padded, x, mode='valid')
+    else:
+        raise ValueError(f"Unknown correlation method: {method}")
+    return lags
+
+
+def fir_filter(x, h, method='auto', block_size=None):
+    """
+    Applies the FIR filter h to x and returns the first len(x) outputs,
+    i.e. np.convolve(x, h)[:N]. The 'fft' method uses overlap-add with
+    blocks of block_size samples (default: picked from len(h)).
+    """
+    N = x.shape[0]
+    M = h.shape[0]
+    if N == 0 or M == 0:
+        return np.zeros(N)
+
+    if block_size is None:
+        # FFT length of ~8*M keeps the per-output cost close to minimal
+        nfft = _next_pow2(max(8 * M, 256))
+        block_size = nfft - M + 1
+    else:
+        # Blocks shorter than the filter tail would overlap more than once
+        block_size = max(block_size, M - 1, 1)
+        nfft = _next_pow2(block_size + M - 1)
+    n_blocks = -(-N // block_size)
+
+    if method == 'auto':
+        method = 'fft' if _prefer_fft(N * M, nfft, 2 * n_blocks) else 'direct'
+
+    if method == 'direct':
+        return np.convolve(x, h, mode='full')[:N]
+    if method != 'fft':
+        raise ValueError(f"Unknown filter method: {method}")
+
+    # --- Overlap-add ---
+    blocks = np.zeros((n_blocks, block_size))
+    blocks.ravel()[:N] = x
+    H = np.fft.rfft(h, nfft)
+    seg = np.fft.irfft(np.fft.rfft(blocks, nfft, axis=1) * H, nfft, axis=1)
+
+    # Each block's M-1 sample tail overlaps the start of the next block
+    y = np.zeros((n_blocks + 1) * block_size)
+    y[:n_blocks * block_size] += seg[:, :block_size].ravel()
+    tails = np.zeros((n_blocks, block_size))
+    tails[:, :M - 1] = seg[:, block_size : block_size + M - 1]
+    y[block_size:] += tails.ravel()
+    return y[:N]
+
+
+def toeplitz_matrix(r):
+    """Expands the lag vector r into the symmetric Toeplitz matrix R_M."""
+    M = r.shape[0]
+    idx = np.arange(M)
+    return r[np.abs(idx[:, None] - idx[None, :])]
+
+
+def levinson_orders(r, gamma):
+    """
+    Order-recursive Levinson-Durbin solve of R_M * h = gamma, where R_M is
+    the symmetric Toeplitz matrix whose first column is r.
+    Yields (m, h_m, gain) for every order m = 1..M, where h_m solves the
+    order-m system and gain = gamma[:m] . h_m - gamma[:m-1] . h_(m-1) is
+    the drop in squared error from adding the m-th tap. h_m is a view
+    that the next step overwrites; copy it to keep it.
+    Raises np.linalg.LinAlgError if the recursion breaks down.
+    """
+    r = np.asarray(r, dtype=float)
+    gamma = np.asarray(gamma, dtype=float)
+    M = gamma.shape[0]
+
+    if r[0] <= 0:
+        raise np.linalg.LinAlgError("R_M is singular (zero-energy input)")
+
+    floor = SINGULAR_TOL * r[0]
+
+    # a: forward predictor [1, a_1, ..., a_m], err: its prediction error
+    a = np.zeros(M)
+    a[0] = 1.0
+    err = r[0]
+    h = np.zeros(M)
+    h[0] = gamma[0] / r[0]
+    yield 1, h[:1], gamma[0] * h[0]
+
+    for m in range(1, M):
+        # Reflection coefficient for order m
+        delta = np.dot(r[m:0:-1], a[:m])
+        k = -delta / err
+        a[:m + 1] = a[:m + 1] + k * a[m::-1]
+        err = err * (1.0 - k * k)
+        if err <= floor:
+            raise np.linalg.LinAlgError(f"R_M is singular at order {m + 1}")
+
+        # Extend the solution with the backward predictor (a reversed)
+        eps = np.dot(r[m:0:-1], h[:m])
+        mu = (gamma[m] - eps) / err
+        h[:m + 1] = h[:m + 1] + mu * a[m::-1]
+        yield m + 1, h[:m + 1], mu * mu * err
+
+
+def levinson_durbin(r, gamma):
+    """
+    Solves R_M * h = gamma in O(M^2), where R_M is the symmetric Toeplitz
+    matrix whose first column is r. R_M is never built.
+    Raises np.linalg.LinAlgError if the recursion breaks down.
+    """
+    h = None
+    for _, h, _ in levinson_orders(r, gamma):
+        pass
+    return h.copy()
+
+
+def mmse_sweep(input_signal, desired_signal, max_M):
+    """
+    MMSE for every filter length M = 1..max_M from one Levinson pass.
+    The correlation lags are computed once for max_M and each MMSE comes
+    from the recursion's error terms, so the signal is never re-filtered:
+        mmse(M) = (sum(d^2) - gamma_d . h_M - sum(y[N:]^2)) / N
+    sum(d^2) - gamma_d . h_M is the autocorrelation-method error, which also
+    counts the M-1 output samples past N-1 that fir_filter truncates; their
+    energy only depends on the last M-1 input samples and is subtracted, so
+    the result equals mean((d - y[:N])^2).
+    Returns (orders, mmse); the sweep stops early if R_M turns singular.
+    """
+    N = input_signal.shape[0]
+    rxx = autocorrelation(input_signal, max_M)
+    gamma_d = cross_correlation(desired_signal, input_signal, max_M)
+
+    # Last max_M-1 input samples, zero-padded in front when N is shorter
+    tail = np.zeros(max(max_M - 1, 0))
+    count = min(N, tail.shape[0])
+    if count:
+        tail[-count:] = input_signal[N - count:]
+
+    orders = []
+    mmse = []
+    error = float(np.dot(desired_signal, desired_signal))
+    try:
+        for m, h, gain in levinson_orders(rxx, gamma_d):
+            error -= gain
+            # y[N..N+m-2]: the last m-1 outputs of the full convolution
+            y_tail = np.convolve(tail[tail.shape[0] - (m - 1):], h)[m - 1:] if m > 1 else h[:0]
+            orders.append(m)
+            mmse.append((error - float(np.dot(y_tail, y_tail))) / N)
+    except np.linalg.LinAlgError:
+        pass
+    return np.array(orders, dtype=int), np.array(mmse)
+
+
+def solve_wiener(r, gamma):
+    """
+    Solves for h_opt from the autocorrelation lags r and gamma_d.
+    Uses Levinson-Durbin, falling back to a least-squares solve of the
+    dense R_M when the recursion detects a singular matrix.
+    Returns (h_opt, method) with method 'levinson' or 'lstsq'.
+    """
+    try:
+        return levinson_durbin(r, gamma), 'levinson'
+    except np.linalg.LinAlgError:
+        R_M = toeplitz_matrix(np.asarray(r, dtype=float))
+        h, _, _, _ = np.linalg.lstsq(R_M, gamma, rcond=None)
+        return h, 'lstsq'
+
+
+# --- Batched engine: B cases of equal length N in one set of array ops ---
+
+def cross_correlation_batch(D, X, M, method='auto'):
+    """
+    Batched cross_correlation for (B, N) stacks: returns (B, M) lags
+    sum(D[b, n+k] * X[b, n]) for k = 0..M-1.
+    """
+    B, N = X.shape
+    count = min(M, N)
+    lags = np.zeros((B, M))
+    if count == 0 or B == 0:
+        return lags
+
+    L = _next_pow2(N + count - 1)
+    if method == 'auto':
+        method = 'fft' if _prefer_fft(N * count, L, 3) else 'direct'
+
+    if method == 'fft':
+        spec = np.fft.rfft(D, L, axis=1) * np.conj(np.fft.rfft(X, L, axis=1))
+        lags[:, :count] = np.fft.irfft(spec, L, axis=1)[:, :count]
+    elif method == 'direct':
+        # windows[b, k, n] = D[b, n+k] (zero past N), a strided view
+        padded = np.concatenate((D, np.zeros((B, count - 1))), axis=1)
+        windows = np.lib.stride_tricks.sliding_window_view(padded, N, axis=1)
+        lags[:, :count] = np.einsum('bkn,bn->bk', windows, X)
+    else:
+        raise ValueError(f"Unknown correlation method: {method}")
+    return lags
+
+
+def fir_filter_batch(X, H, method='auto'):
+    """
+    Batched fir_filter: filters each row of the (B, N) stack X with the
+    matching row of the (B, M) stack H and returns the first N outputs.
+    """
+    B, N = X.shape
+    M = H.shape[1]
+    if N == 0 or M == 0 or B == 0:
+        return np.zeros((B, N))
+
+    L = _next_pow2(N + M - 1)
+    if method == 'auto':
+        method = 'fft' if _prefer_fft(N * M, L, 3) else 'direct'
+
+    if method == 'fft':
+        spec = np.fft.rfft(X, L, axis=1) * np.fft.rfft(H, L, axis=1)
+        return np.fft.irfft(spec, L, axis=1)[:, :N]
+    if method != 'direct':
+        raise ValueError(f"Unknown filter method: {method}")
+
+    # windows[b, n, j] = X[b, n+j-(M-1)] (zero before 0), so tap k = M-1-j
+    padded = np.concatenate((np.zeros((B, M - 1)), X), axis=1)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, M, axis=1)
+    return np.einsum('bnj,bj->bn', windows, H[:, ::-1])
+
+
+def levinson_durbin_batch(R, G):
+    """
+    levinson_durbin over a batch: R holds (B, M) autocorrelation lags and
+    G (B, M) right-hand sides. The recursion runs once over M with every
+    step vectorized across B. Returns (H, singular), where singular flags
+    the cases whose recursion broke down (their rows of H are invalid).
+    """
+    R = np.asarray(R, dtype=float)
+    G = np.asarray(G, dtype=float)
+    B, M = G.shape
+
+    r0 = R[:, 0]
+    singular = ~(r0 > 0)
+    err = np.where(singular, 1.0, r0)
+    floor = SINGULAR_TOL * err
+
+    a = np.zeros((B, M))
+    a[:, 0] = 1.0
+    H = np.zeros((B, M))
+    H[:, 0] = G[:, 0] / err
+
+    for m in range(1, M):
+        r_rev = R[:, m:0:-1]
+        delta = np.einsum('bi,bi->b', r_rev, a[:, :m])
+        k = np.where(singular, 0.0, -delta / err)
+        a[:, :m + 1] = a[:, :m + 1] + k[:, None] * a[:, m::-1]
+        err = err * (1.0 - k * k)
+        singular |= err <= floor
+        err = np.where(singular, 1.0, err)
+
+        eps = np.einsum('bi,bi->b', r_rev, H[:, :m])
+        mu = np.where(singular, 0.0, (G[:, m] - eps) / err)
+        H[:, :m + 1] = H[:, :m + 1] + mu[:, None] * a[:, m::-1]
+
+    return H, singular
+
+
+def solve_wiener_batch(X, D, M):
+    """
+    Solves B Wiener problems at once from (B, N) input and desired stacks.
+    Uses the batched Levinson recursion; cases it flags as singular are
+    solved with the pseudo-inverse of their R_M (minimum-norm least
+    squares), matching solve_wiener's fallback.
+    Returns (H, Y, mmse, singular) with shapes (B, M), (B, N), (B,), (B,).
+    """
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    D = np.atleast_2d(np.asarray(D, dtype=float))
+    if X.shape != D.shape:
+        raise ValueError(f"Input and desired stacks differ in shape: {X.shape} vs {D.shape}")
+
+    rxx = cross_correlation_batch(X, X, M)
+    gamma_d = cross_correlation_batch(D, X, M)
+
+    H, singular = levinson_durbin_batch(rxx, gamma_d)
+    if singular.any():
+        idx = np.arange(M)
+        R_M = rxx[singular][:, np.abs(idx[:, None] - idx[None, :])]
+        H[singular] = np.einsum('bij,bj->bi', np.linalg.pinv(R_M), gamma_d[singular])
+
+    Y = fir_filter_batch(X, H)
+    mmse = np.mean((D - Y) ** 2, axis=1)
+    return H, Y, mmse, singular
+
+
+# --- Shared-input engine: one input, K desired signals ---
+
+def _input_windows(x, M):
+    """
+    Strided (N, M) view W of x with W[n, k] = x[n-k] (zero for n < k), so
+    both gamma_d (D @ W) and the filter outputs (W @ H.T) are matrix products.
+    """
+    padded = np.concatenate((np.zeros(M - 1), x))
+    return np.lib.stride_tricks.sliding_window_view(padded, M)[:, ::-1]
+
+
+def cross_correlation_multi(D, x, M, method='auto'):
+    """
+    cross_correlation of every row of the (K, N) stack D against the one
+    input x: returns (K, M) lags sum(D[j, n+k] * x[n]). The input is
+    transformed (or windowed) once for all K rows.
+    """
+    D = np.atleast_2d(D)
+    K, N = D.shape
+    count = min(M, N)
+    lags = np.zeros((K, M))
+    if count == 0 or K == 0:
+        return lags
+
+    L = _next_pow2(N + count - 1)
+    if method == 'auto':
+        method = 'fft' if _prefer_fft(K * N * count, L, K + 1) else 'direct'
+
+    if method == 'fft':
+        spec = np.fft.rfft(D, L, axis=1) * np.conj(np.fft.rfft(x, L))
+        lags[:, :count] = np.fft.irfft(spec, L, axis=1)[:, :count]
+    elif method == 'direct':
+        W = _input_windows(x, count)
+        step = max(WINDOW_CHUNK // count, 1)
+        for start in range(0, N, step):
+            lags[:, :count] += D[:, start:start + step] @ W[start:start + step]
+    else:
+        raise ValueError(f"Unknown correlation method: {method}")
+    return lags
+
+
+def fir_filter_multi(x, H, method='auto'):
+    """
+    Filters the one input x with each row of the (K, M) stack H and
+    returns the (K, N) first-N outputs, as one batched convolution.
+    """
+    H = np.atleast_2d(H)
+    K, M = H.shape
+    N = x.shape[0]
+    if N == 0 or M == 0 or K == 0:
+        return np.zeros((K, N))
+
+    L = _next_pow2(N + M - 1)
+    if method == 'auto':
+        method = 'fft' if _prefer_fft(K * N * M, L, K + 1) else 'direct'
+
+    if method == 'fft':
+        spec = np.fft.rfft(x, L) * np.fft.rfft(H, L, axis=1)
+        return np.fft.irfft(spec, L, axis=1)[:, :N]
+    if method != 'direct':
+        raise ValueError(f"Unknown filter method: {method}")
+
+    Y = np.empty((K, N))
+    W = _input_windows(x, M)
+    step = max(WINDOW_CHUNK // M, 1)
+    for start in range(0, N, step):
+        Y[:, start:start + step] = (W[start:start + step] @ H.T).T
+    return Y
+
+
+def levinson_durbin_multi(r, G):
+    """
+    levinson_durbin for K right-hand sides sharing one R_M: G is (K, M),
+    returns the (K, M) solutions. The predictor recursion (the
+    factorization of R_M) runs once; each order extends all K solutions
+    with one matrix-vector product, O(K * M^2) in total.
+    Raises np.linalg.LinAlgError if the recursion breaks down.
+    """
+    r = np.asarray(r, dtype=float)
+    G = np.atleast_2d(np.asarray(G, dtype=float))
+    K, M = G.shape
+
+    if r[0] <= 0:
+        raise np.linalg.LinAlgError("R_M is singular (zero-energy input)")
+    floor = SINGULAR_TOL * r[0]
+
+    a = np.zeros(M)
+    a[0] = 1.0
+    err = r[0]
+    H = np.zeros((K, M))
+    H[:, 0] = G[:, 0] / r[0]
+
+    for m in range(1, M):
+        r_rev = r[m:0:-1]
+        k = -np.dot(r_rev, a[:m]) / err
+        a[:m + 1] = a[:m + 1] + k * a[m::-1]
+        err = err * (1.0 - k * k)
+        if err <= floor:
+            raise np.linalg.LinAlgError(f"R_M is singular at order {m + 1}")
+
+        mu = (G[:, m] - H[:, :m] @ r_rev) / err
+        H[:, :m + 1] += mu[:, None] * a[m::-1]
+    return H
+
+
+def solve_wiener_multi(input_signal, D, M):
+    """
+    Solves K Wiener problems that share one input signal, e.g. one sensor
+    and many target channels. The input autocorrelation and the
+    factorization of R_M are computed once, all cross-correlations are
+    solved as one (K, M) right-hand side, and every channel is filtered
+    in one batched convolution. Falls back to a least-squares solve of
+    the dense R_M (all channels at once) like solve_wiener.
+    Returns (H, Y, mmse, method) with shapes (K, M), (K, N), (K,).
+    """
+    x = np.asarray(input_signal, dtype=float)
+    D = np.atleast_2d(np.asarray(D, dtype=float))
+    if D.shape[1] != x.shape[0]:
+        raise ValueError(f"Desired signals have {D.shape[1]} samples, input has {x.shape[0]}")
+
+    rxx = autocorrelation(x, M)
+    gamma_d = cross_correlation_multi(D, x, M)
+
+    try:
+        H, method = levinson_durbin_multi(rxx, gamma_d), 'levinson'
+    except np.linalg.LinAlgError:
+        H = np.linalg.lstsq(toeplitz_matrix(rxx), gamma_d.T, rcond=None)[0].T
+        method = 'lstsq'
+
+    Y = fir_filter_multi(x, H)
+    mmse = np.mean((D - Y) ** 2, axis=1)
+    return H, Y, mmse, method
@@ -0,0 +1,295 @@
+import numpy as np
+import sys
+import glob
+import math
+import os
+import argparse
+
+from signal_io import load_signal, signal_path
+from wiener import autocorrelation, cross_correlation, fir_filter, solve_wiener
+
+# Single-precision pipeline of main.asm (l.s/mul.s/add.s/div.s).
+# order 'asm' reproduces the assembly's arithmetic exactly: every sum is
+# accumulated left to right in float32 with mul.s and add.s rounded
+# separately (no fused multiply-add), which np.add.accumulate does
+# sequentially. order 'fast' keeps float32 data but lets BLAS/SIMD pick
+# the summation order (np.dot, np.convolve), so results may differ from
+# the assembly in the last bits.
+F32 = np.float32
+ORDERS = ("asm", "fast")
+
+# levinson_tol of main.asm: the recursion stops once the prediction error
+# falls below LEVINSON_TOL * r[0]
+LEVINSON_TOL = F32(1.0e-6)
+
+# Unit roundoff of float32
+UNIT_ROUNDOFF = 2.0 ** -24
+
+# Samples per vectorized step of the sequential sums
+CHUNK = 1 << 20
+
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+# Below this magnitude one-decimal float32 values are more than an ulp
+# apart, so Float.toString prints them exactly like '%.1f'
+PLAIN_LIMIT = 1e5
+
+
+def to_float32(signal):
+    """signal as float32, without a copy if it already is (e.g. a float32 .npy memory map)."""
+    return np.asarray(signal, dtype=F32)
+
+
+def load_signal32(path):
+    """
+    Loads a signal in single precision. Text values are parsed to double
+    and rounded once to float32, as mips_sim does for syscall 6.
+    """
+    return to_float32(load_signal(path))
+
+
+def _dot(a, b, order):
+    """sum(a[n] * b[n]) in float32: products rounded, then summed in order."""
+    if a.shape[0] == 0:
+        return F32(0.0)
+    if order == "fast":
+        return F32(np.dot(a, b))
+    total = F32(0.0)
+    for start in range(0, a.shape[0], CHUNK):
+        block = a[start:start + CHUNK] * b[start:start + CHUNK]
+        block[0] = total + block[0]
+        total = np.add.accumulate(block)[-1]
+    return F32(total)
+
+
+def autocorrelation32(x, M, order="asm"):
+    """Lags 0..M-1 of sum(x[n] * x[n+k]) like proc_calc_gamma_xx; lags >= N are 0."""
+    x = to_float32(x)
+    N = x.shape[0]
+    r = np.zeros(M, dtype=F32)
+    for k in range(min(M, N)):
+        r[k] = _dot(x[:N - k], x[k:], order)
+    return r
+
+
+def cross_correlation32(d, x, M, order="asm"):
+    """Lags 0..M-1 of sum(d[n+k] * x[n]) like proc_calc_gamma_dx; lags >= N are 0."""
+    d, x = to_float32(d), to_float32(x)
+    N = x.shape[0]
+    gamma_d = np.zeros(M, dtype=F32)
+    for k in range(min(M, N)):
+        gamma_d[k] = _dot(x[:N - k], d[k:], order)
+    return gamma_d
+
+
+def levinson32(r, gamma):
+    """
+    proc_solve_levinson in float32: Levinson-Durbin on the lags with the
+    assembly's operation order. The recursion stops, leaving the remaining
+    taps 0, once the prediction error drops below LEVINSON_TOL * r[0];
+    a zero-energy input gives h = 0.
+    Returns (h_opt, order reached).
+    """
+    r, gamma = to_float32(r), to_float32(gamma)
+    M = r.shape[0]
+    h = np.zeros(M, dtype=F32)
+    a = np.zeros(M, dtype=F32)
+    err = r[0]
+    if err <= 0:
+        return h, 0
+    floor = LEVINSON_TOL * err
+    a[0] = F32(1.0)
+    h[0] = gamma[0] / err
+
+    for m in range(1, M):
+        # delta and eps accumulate i = 0..m-1 against r[m], r[m-1], ..., r[1]
+        lags = r[m:0:-1]
+        delta = _dot(lags, a[:m], "asm")
+        eps = _dot(lags, h[:m], "asm")
+        k = -(delta / err)
+        a[:m + 1] = a[:m + 1] + k * a[m::-1]
+        err = err * (F32(1.0) - k * k)
+        if err <= floor:
+            return h, m
+        mu = (gamma[m] - eps) / err
+        h[:m + 1] = h[:m + 1] + mu * a[m::-1]
+    return h, M
+
+
+def fir_filter32(x, h, order="asm"):
+    """
+    y[n] = sum(h[k] * x[n-k], k = 0..min(n, M-1)) like proc_convolve_same.
+    'asm' adds the taps in k order, one vectorized pass per tap.
+    """
+    x, h = to_float32(x), to_float32(h)
+    N = x.shape[0]
+    if order == "fast":
+        return np.convolve(x, h)[:N].astype(F32, copy=False)
+    y = np.zeros(N, dtype=F32)
+    for k in range(min(h.shape[0], N)):
+        y[k:] += h[k] * x[:N - k]
+    return y
+
+
+def mmse32(d, y, order="asm"):
+    """proc_calc_mmse: float32 sum of (d[n] - y[n])^2, divided by float32(N)."""
+    d, y = to_float32(d), to_float32(y)
+    N = d.shape[0]
+    if order == "fast":
+        e = d - y
+        return F32(F32(np.dot(e, e)) / F32(N))
+    total = F32(0.0)
+    for start in range(0, N, CHUNK):
+        e = d[start:start + CHUNK] - y[start:start + CHUNK]
+        block = e * e
+        block[0] = total + block[0]
+        total = np.add.accumulate(block)[-1]
+    return F32(total / F32(N))
+
+
+def wiener32(desired_signal, input_signal, M, order="asm"):
+    """
+    The whole main.asm pipeline in float32.
+    Returns (h_opt, output signal, MMSE, order reached by Levinson).
+    """
+    x, d = to_float32(input_signal), to_float32(desired_signal)
+    rxx = autocorrelation32(x, M, order)
+    gamma_d = cross_correlation32(d, x, M, order)
+    h, reached = levinson32(rxx, gamma_d)
+    y = fir_filter32(x, h, order)
+    return h, y, mmse32(d, y, order), reached
+
+
+# ---------------------------------------------------------
+# Printing like proc_write_stdout
+# ---------------------------------------------------------
+
+def asm_round(values):
+    """
+    proc_write_stdout's rounding in float32: v*10, +-0.5 away from zero,
+    truncate to int (saturating like MARS's cvt.w.s), then /10.
+    """
+    v = to_float32(values) * F32(10.0)
+    v = np.where(v < 0, v - F32(0.5), v + F32(0.5))
+    # Through an integer, like cvt.w.s/cvt.s.w: -0.7 becomes +0.0, not -0.0
+    v = np.clip(np.nan_to_num(v.astype(np.float64), nan=0.0), INT32_MIN, INT32_MAX)
+    return v.astype(np.int64).astype(F32) / F32(10.0)
+
+
+def java_float_str(value):
+    """Float.toString as MARS prints it for syscall 2."""
+    if value != value:
+        return "NaN"
+    if math.isinf(value):
+        return "Infinity" if value > 0 else "-Infinity"
+    if value == 0.0:
+        return "-0.0" if math.copysign(1.0, value) < 0 else "0.0"
+    v = np.float32(value)
+    if 1e-3 <= abs(value) < 1e7:
+        return np.format_float_positional(v, unique=True, trim='0')
+    mantissa, exponent = np.format_float_scientific(v, unique=True, trim='0').split('e')
+    return f"{mantissa}E{int(exponent)}"
+
+
+def format_output32(values):
+    """The 'Filtered output:' values exactly as main.asm prints them."""
+    return " ".join(f"{v:.1f}" if abs(v) < PLAIN_LIMIT else java_float_str(v)
+                    for v in asm_round(values).astype(float).tolist())
+
+
+def format_mmse32(mmse):
+    """The MMSE value exactly as main.asm prints it."""
+    return java_float_str(asm_round(np.array([mmse]))[0])
+
+
+# ---------------------------------------------------------
+# Error against float64
+# ---------------------------------------------------------
+
+def gamma(n):
+    """Higham's gamma_n = n*u / (1 - n*u): relative bound of an n-term float32 dot product."""
+    nu = n * UNIT_ROUNDOFF
+    return nu / (1 - nu) if nu < 1 else math.inf
+
+
+def error_report(desired_signal, input_signal, M, h32, y32, mmse):
+    """
+    Compares a float32 result with the float64 pipeline (wiener.py) on the
+    same signals. The output bound is first order in the rounding errors
+    and a posteriori in the coefficients (it uses the observed h32 - h64):
+      |y32 - y64| <= |x| * |h32 - h64| + gamma_M |x32| * |h32| + |x - x32| * |h64|
+    (* is the causal filter, applied to magnitudes): coefficient error,
+    float32 filtering, and input rounding. The MMSE bound propagates it
+    through mean((d - y)^2) plus the float32 accumulation of N terms.
+    Returns a dict of observed errors, bounds and 'printed_diff', the
+    number of samples whose one-decimal printout differs from float64's.
+    """
+    x = np.asarray(input_signal, dtype=float)
+    d = np.asarray(desired_signal, dtype=float)
+    N = x.shape[0]
+    rxx = autocorrelation(x, M)
+    h64, _ = solve_wiener(rxx, cross_correlation(d, x, M))
+    y64 = fir_filter(x, h64)
+    mmse64 = float(np.mean((d - y64) ** 2))
+
+    h = np.asarray(h32, dtype=float)
+    y = np.asarray(y32, dtype=float)
+    x32 = np.asarray(to_float32(input_signal), dtype=float)
+    y_bound = (fir_filter(np.abs(x), np.abs(h - h64)) + gamma(M) * fir_filter(np.abs(x32), np.abs(h))
+               + fir_filter(np.abs(x - x32), np.abs(h64)))
+    e64 = np.abs(d - y64)
+    d_round = np.abs(d - np.asarray(to_float32(desired_signal), dtype=float))
+    dev = y_bound + d_round
+    mmse_bound = float(np.mean(2 * e64 * dev + dev ** 2) + gamma(N + 1) * np.mean((d - y) ** 2))
+
+    printed64 = np.round(y64, 1)
+    printed32 = np.asarray(asm_round(y), dtype=float)
+    return {
+        'h_err': float(np.max(np.abs(h - h64))) if M else 0.0,
+        'y_err': float(np.max(np.abs(y - y64))) if N else 0.0,
+        'y_bound': float(np.max(y_bound)) if N else 0.0,
+        'mmse_err': abs(float(mmse) - mmse64),
+        'mmse_bound': mmse_bound,
+        'printed_diff': int(np.count_nonzero(np.abs(printed32 - printed64) > 0.05)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the float32 (main.asm) pipeline and report its error against float64.")
+    parser.add_argument("tests", nargs='*', default=[os.path.join("tests", "test_*")],
+                        help="Test folders or folder globs (default: tests/test_*)")
+    parser.add_argument("-M", type=int, default=10, help="Filter length (default: 10)")
+    parser.add_argument("--order", choices=ORDERS, default="asm",
+                        help="'asm': main.asm's summation order (default), 'fast': BLAS/SIMD order")
+    args = parser.parse_args()
+
+    folders = []
+    for pattern in args.tests:
+        folders.extend(f for f in sorted(glob.glob(pattern)) if os.path.isdir(f))
+    if not folders:
+        print("Error: no test folders.")
+        return 1
+
+    print(f"{'Case':<14}{'N':>9}{'max|dh|':>11}{'max|dy|':>11}{'bound':>11}{'|dMMSE|':>11}{'bound':>11}"
+          f"{'printed':>9}")
+    within = True
+    for folder in folders:
+        try:
+            d = load_signal(signal_path(folder, "desired"))
+            x = load_signal(signal_path(folder, "input"))
+        except (IOError, ValueError) as e:
+            print(f"{os.path.basename(folder):<14} Error loading files: {e}")
+            continue
+        if d.shape != x.shape:
+            print(f"{os.path.basename(folder):<14} size not match")
+            continue
+        h, y, mmse, _ = wiener32(d, x, args.M, args.order)
+        r = error_report(d, x, args.M, h, y, mmse)
+        within &= r['y_err'] <= r['y_bound'] and r['mmse_err'] <= r['mmse_bound']
+        print(f"{os.path.basename(folder):<14}{x.shape[0]:>9}{r['h_err']:>11.2e}{r['y_err']:>11.2e}"
+              f"{r['y_bound']:>11.2e}{r['mmse_err']:>11.2e}{r['mmse_bound']:>11.2e}{r['printed_diff']:>9}")
+    print(f"\n Observed errors {'within' if within else 'EXCEED'} the bounds.")
+    return 0 if within else 1
+
+if __name__ == "__main__":
+    sys.exit(main())